@@ -1,106 +1,231 @@
+import asyncio
+import hmac
+import json
+import logging
 import uuid
-from fastapi import APIRouter, HTTPException
+from datetime import datetime
+from typing import AsyncIterator, Optional
+from fastapi import APIRouter, Depends, HTTPException, Header, Query
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
 from app.schemas.models import (
-    QueryRequest, AnswerResponse, AbstainResponse, 
-    RetrievalNode, ConfidenceLevel, Outcome
+    QueryRequest, BatchQueryRequest, AnswerResponse,
+    ConfidenceLevel, Outcome, Jurisdiction
 )
 from app.core.retrieval import hybrid_retrieve
-from app.core.confidence import calculate_confidence
-from app.core.abstention import should_abstain, generate_abstain_response
-from app.core.generation import generate_answer
-from app.core.faithfulness import verify_faithfulness
-from app.core.audit_logger import log_query, get_logs
+from app.core.abstention import FAITHFULNESS_REJECTED, QUOTA_EXCEEDED, should_abstain, generate_abstain_response
+from app.core.generation import stream_answer
+from app.core.faithfulness import verify_faithfulness, verification_counts
+from app.core.audit_logger import log_query, audit_sink
+from app.core.audit_store import AuditQuery
 from app.core.cache import query_cache
+from app.core.config import config
+from app.core.context import context_snapshot
+from app.core.llm import llm_gateway
+from app.core.llm_gateway import LLMUnavailableError
+from app.core.metrics import start_trace, timed
+from app.core.pipeline import (
+    cache_key, cache_namespace, cache_response, assess_retrieval, cached_response, grounding_nodes,
+    load_partitions, query_flights, retrieval_options, run_batch_ndjson, run_query
+)
+from app.core.semantic_cache import semantic_cache
+from app.core.stage_cache import stage_caches
 from app.ingestion.index import ingestion_manager
 
+logger = logging.getLogger(__name__)
+
 router = APIRouter()
 
-@router.post("/query", response_model=None)
+async def require_index():
+    """
+    Waits for the background index load (starting it if needed) before serving.
+    """
+    if not await ingestion_manager.wait_ready(config.INDEX_READY_TIMEOUT_SECONDS):
+        raise HTTPException(status_code=503, detail=f"Index is not ready ({ingestion_manager.status}).")
+
+@router.post("/query", response_model=None, dependencies=[Depends(require_index)])
 async def query_compliance(request: QueryRequest):
-    # 0. Cache Check
-    cache_key = f"{request.jurisdiction}:{request.question.strip().lower()}"
-    cached_response = query_cache.get(cache_key)
-    if cached_response:
-        print(f"CACHE HIT: {cache_key}")
-        return cached_response
+    return await run_query(request)
+
+@router.post("/query/batch", dependencies=[Depends(require_index)])
+async def query_compliance_batch(batch: BatchQueryRequest):
+    """
+    Answers many questions in one request. Streams NDJSON in completion order, one
+    line per input question: {"index": i, "response": {...}} or {"index": i, "error": "..."}.
+    """
+    if len(batch.queries) > config.BATCH_MAX_QUESTIONS:
+        raise HTTPException(status_code=413, detail=f"At most {config.BATCH_MAX_QUESTIONS} questions per batch.")
+
+    return StreamingResponse(run_batch_ndjson(batch.queries, batch.concurrency), media_type="application/x-ndjson")
+
+def _sse(event: str, data) -> str:
+    payload = data.model_dump_json() if isinstance(data, BaseModel) else json.dumps(data)
+    return f"event: {event}\ndata: {payload}\n\n"
+
+async def _query_events(request: QueryRequest) -> AsyncIterator[str]:
+    """
+    The /query pipeline as a sequence of SSE events. See `query_compliance_stream`.
+    """
+    start_trace()
+    await load_partitions([request])
+    key = cache_key(request)
+    namespace = cache_namespace(request)
+    cached, query_embedding = await cached_response(request, key, namespace)
+    if cached:
+        yield _sse("retrieval", {"query_id": cached.query_id, "grounding_nodes": [n.model_dump() for n in cached.grounding_nodes]})
+        yield _sse("confidence", {"confidence": cached.confidence.value})
+        yield _sse("token", {"delta": cached.answer})
+        yield _sse("verdict", {"is_faithful": True, "faithfulness_score": cached.faithfulness_score})
+        yield _sse("done", cached)
+        return
 
     query_id = str(uuid.uuid4())
-    
-    # 1. Retrieval
-    nodes = await hybrid_retrieve(request.question)
-    
-    # Needs individual results for confidence scoring
-    vector_retriever = ingestion_manager.get_vector_retriever()
-    keyword_retriever = ingestion_manager.get_keyword_retriever()
-    v_results = vector_retriever.retrieve(request.question) if vector_retriever else []
-    k_results = keyword_retriever.retrieve(request.question) if keyword_retriever else []
-
-    # 2. Confidence Scoring
-    confidence = calculate_confidence(request.question, nodes, v_results, k_results)
-    
-    # 3. Abstention Gate
+    retrieval = await hybrid_retrieve(
+        request.question, **retrieval_options(request), query_embedding=query_embedding
+    )
+    nodes = retrieval.nodes
+    grounding = grounding_nodes(nodes)
+    yield _sse("retrieval", {"query_id": query_id, "grounding_nodes": [n.model_dump() for n in grounding]})
+
+    assessment = assess_retrieval(request, retrieval, query_embedding)
+    confidence = assessment.level
+    yield _sse("confidence", {"confidence": confidence.value, "score": assessment.score, "features": assessment.features})
+
     abstain, reason = should_abstain(confidence, len(nodes))
     if abstain:
         log_query(query_id, request.question, request.jurisdiction, Outcome.ABSTAINED, confidence)
-        return generate_abstain_response(query_id, reason)
-    
-    # 4. Generation & 5. Verification
+        yield _sse("done", generate_abstain_response(query_id, reason))
+        return
+
     try:
-        # 4. Generation
-        answer = await generate_answer(request.question, nodes)
-        
-        # 5. Faithfulness Verification
-        is_faithful, faith_score = await verify_faithfulness(answer, nodes)
-        if not is_faithful:
-            log_query(query_id, request.question, request.jurisdiction, Outcome.ABSTAINED, confidence)
-            return generate_abstain_response(query_id, "Generated answer failed internal faithfulness verification and was rejected to prevent hallucination.", confidence)
+        parts = []
+        # Includes the time the client takes to read the tokens
+        with timed("generation"):
+            async for delta in stream_answer(request.question, nodes):
+                parts.append(delta)
+                yield _sse("token", {"delta": delta})
+        answer = "".join(parts).strip()
+        with timed("verification"):
+            is_faithful, faith_score = await verify_faithfulness(answer, nodes)
     except Exception as e:
-        if "insufficient_quota" in str(e).lower() or "rate_limit" in str(e).lower():
-            log_query(query_id, request.question, request.jurisdiction, Outcome.ERROR, confidence)
-            return generate_abstain_response(
-                query_id, 
-                "System is currently in read-only mode (OpenRouter/OpenAI API Quota Exceeded). Retrieval works, but answer generation is disabled.",
-                confidence
-            )
-        raise e
-    
-    # 6. Audit Logging
+        log_query(query_id, request.question, request.jurisdiction, Outcome.ERROR, confidence)
+        if isinstance(e, LLMUnavailableError):
+            yield _sse("done", generate_abstain_response(query_id, QUOTA_EXCEEDED, confidence))
+        else:
+            logger.error("Stream error (%s): %s", query_id, e)
+            yield _sse("error", {"query_id": query_id, "detail": "Answer generation failed."})
+        return
+
+    yield _sse("verdict", {"is_faithful": is_faithful, "faithfulness_score": faith_score})
+    if not is_faithful:
+        # The client already rendered the tokens; tell it to take them back
+        log_query(query_id, request.question, request.jurisdiction, Outcome.ABSTAINED, confidence)
+        yield _sse("retraction", {"query_id": query_id, "reason": FAITHFULNESS_REJECTED})
+        yield _sse("done", generate_abstain_response(query_id, FAITHFULNESS_REJECTED, confidence))
+        return
+
     log_query(query_id, request.question, request.jurisdiction, Outcome.ANSWERED, confidence)
-    
-    # Mapping nodes for response
-    grounding_nodes = [
-        RetrievalNode(
-            id=n.node.node_id,
-            text=n.node.get_content(),
-            score=n.score or 0.0,
-            metadata=n.node.metadata
-        ) for n in nodes
-    ]
-    
     response = AnswerResponse(
         query_id=query_id,
         answer=answer,
         confidence=confidence,
-        grounding_nodes=grounding_nodes,
+        grounding_nodes=grounding,
         faithfulness_score=faith_score
     )
-    
-    # Save to Cache
-    query_cache.set(cache_key, response)
-    
-    return response
+    cache_response(key, namespace, response, query_embedding)
+    yield _sse("done", response)
+
+@router.post("/query/stream", dependencies=[Depends(require_index)])
+async def query_compliance_stream(request: QueryRequest):
+    """
+    Server-Sent Events version of /query. Events, in order: `retrieval` (grounding
+    nodes), `confidence`, `token` (answer deltas), `verdict` (faithfulness), then
+    `retraction` if verification failed, and finally `done` with the same body
+    /query would return. Abstentions skip straight to `done`; failures send `error`.
+    """
+    return StreamingResponse(
+        _query_events(request),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
-@router.post("/debug/retrieval")
+@router.post("/debug/retrieval", dependencies=[Depends(require_index)])
 async def debug_retrieval(request: QueryRequest):
-    nodes = await hybrid_retrieve(request.question)
-    return [{ "id": n.node.node_id, "text": n.node.get_content(), "score": n.score } for n in nodes]
+    retrieval = await hybrid_retrieve(request.question, **retrieval_options(request))
+    return [{ "id": n.node.node_id, "text": n.node.get_content(), "score": n.score } for n in retrieval.nodes]
 
-@router.post("/debug/faithfulness")
+@router.post("/debug/faithfulness", dependencies=[Depends(require_index)])
 async def debug_faithfulness(query: str, answer: str):
-    nodes = await hybrid_retrieve(query)
-    is_faithful, score = await verify_faithfulness(answer, nodes)
+    retrieval = await hybrid_retrieve(query)
+    is_faithful, score = await verify_faithfulness(answer, retrieval.nodes)
     return { "is_faithful": is_faithful, "score": score }
 
 @router.get("/audit/logs")
-async def audit_logs():
-    return get_logs()
+async def audit_logs(
+    jurisdiction: Optional[Jurisdiction] = None,
+    outcome: Optional[Outcome] = None,
+    confidence: Optional[ConfidenceLevel] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    order: str = Query("desc", pattern="^(asc|desc)$"),
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    format: str = Query("json", pattern="^(json|ndjson)$"),
+):
+    """
+    Filtered audit entries, newest first by default. JSON responses are paginated:
+    pass `next_cursor` back as `cursor`. `format=ndjson` streams the whole range instead.
+    """
+    query = AuditQuery(
+        jurisdiction=jurisdiction.value if jurisdiction else None,
+        outcome=outcome.value if outcome else None,
+        confidence_level=confidence.value if confidence else None,
+        since=since,
+        until=until,
+        descending=order == "desc",
+    )
+    if format == "ndjson":
+        return StreamingResponse(audit_sink.store.export(query), media_type="application/x-ndjson")
+
+    try:
+        entries, next_cursor = await asyncio.to_thread(audit_sink.store.page, query, limit, cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"entries": entries, "next_cursor": next_cursor}
+
+@router.get("/cache/stats")
+async def cache_stats():
+    stats = query_cache.stats()
+    stats["semantic"] = semantic_cache.stats()
+    stats["coalescing"] = query_flights.stats()
+    stats["stages"] = stage_caches.stats()
+    return stats
+
+@router.get("/llm/stats")
+async def llm_stats():
+    """
+    Per-model LLM gateway counters (requests, retries, hedges, fallbacks, errors by kind,
+    tokens, latency percentiles), how faithfulness checks were decided, and prompt context
+    tokens before and after packing.
+    """
+    return {
+        "models": llm_gateway.snapshot(),
+        "verification": dict(verification_counts),
+        "context": context_snapshot(),
+    }
+
+
+@router.post("/admin/ingest")
+async def admin_ingest(full: bool = False, x_admin_token: Optional[str] = Header(None)):
+    """
+    Incrementally re-ingests the corpus directory (or fully with `full=true`).
+    Disabled unless ADMIN_TOKEN is set.
+    """
+    if not config.ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Admin endpoints are disabled; set ADMIN_TOKEN to enable them.")
+    if not hmac.compare_digest((x_admin_token or "").encode(), config.ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=403, detail="Invalid admin token.")
+    try:
+        return await asyncio.to_thread(ingestion_manager.sync, full)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
@@ -0,0 +1,87 @@
+import argparse
+import asyncio
+import csv
+import json
+import sys
+
+def ingest(args):
+    from app.ingestion.index import ingestion_manager
+    summary = ingestion_manager.sync(full=args.full)
+    print(json.dumps(summary, indent=2))
+
+def snapshot(args):
+    from app.ingestion.index import IngestionManager, ingestion_manager
+    states = {}
+    for name in ingestion_manager.discover():
+        manager = IngestionManager(name, snapshots=True)
+        manager.load()
+        states[name] = manager.state()
+    print(json.dumps(states, indent=2))
+
+def audit_backfill(args):
+    from app.core.audit_logger import backfill_store
+    print(json.dumps({"inserted": backfill_store()}, indent=2))
+
+def read_questions(path: str, jurisdiction: str) -> list:
+    """
+    JSONL of QueryRequest objects, or CSV with a `question` column (and optional `jurisdiction`).
+    """
+    from app.schemas.models import QueryRequest
+    with open(path, newline="") as f:
+        if path.endswith(".csv"):
+            rows = [row for row in csv.DictReader(f) if row.get("question", "").strip()]
+        else:
+            rows = [json.loads(line) for line in f if line.strip()]
+    return [QueryRequest(**{"jurisdiction": jurisdiction, **{k: v for k, v in row.items() if v}}) for row in rows]
+
+async def run_batch_file(args):
+    from app.core.pipeline import run_batch_ndjson
+    requests = read_questions(args.file, args.jurisdiction)
+    out = open(args.output, "w") if args.output else sys.stdout
+    try:
+        async for line in run_batch_ndjson(requests, args.concurrency):
+            out.write(line)
+            out.flush()
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+def batch(args):
+    from app.ingestion.index import ingestion_manager
+    ingestion_manager.load()
+    asyncio.run(run_batch_file(args))
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m app.cli", description="Compliance RAG maintenance commands.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    ingest_parser = subparsers.add_parser(
+        "ingest", help="Incrementally ingest new, changed and deleted corpus files."
+    )
+    ingest_parser.add_argument("--full", action="store_true", help="Discard the index and re-ingest everything.")
+    ingest_parser.set_defaults(func=ingest)
+
+    snapshot_parser = subparsers.add_parser(
+        "snapshot", help="Load or build every partition's index and publish it for INDEX_SNAPSHOTS workers."
+    )
+    snapshot_parser.set_defaults(func=snapshot)
+
+    backfill_parser = subparsers.add_parser(
+        "audit-backfill", help="Index the JSONL audit log and its archives into the audit store."
+    )
+    backfill_parser.set_defaults(func=audit_backfill)
+
+    batch_parser = subparsers.add_parser(
+        "batch", help="Answer a file of questions and write NDJSON results in completion order."
+    )
+    batch_parser.add_argument("file", help="JSONL of QueryRequest objects, or CSV with a 'question' column.")
+    batch_parser.add_argument("--jurisdiction", default="DPDP", help="Default for rows without one.")
+    batch_parser.add_argument("--concurrency", type=int, default=None, help="Defaults to BATCH_CONCURRENCY.")
+    batch_parser.add_argument("--output", help="Write NDJSON here instead of stdout.")
+    batch_parser.set_defaults(func=batch)
+
+    args = parser.parse_args()
+    args.func(args)
+
+if __name__ == "__main__":
+    main()
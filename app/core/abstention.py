@@ -1,19 +1,34 @@
+from app.core.metrics import ABSTENTIONS
 from app.schemas.models import ConfidenceLevel, AbstainResponse, Outcome
 
+NO_CLAUSES = "No relevant regulatory clauses found in the corpus."
+LOW_CONFIDENCE = "Confidence in the retrieved information is too low to provide a safe answer."
+FAITHFULNESS_REJECTED = "Generated answer failed internal faithfulness verification and was rejected to prevent hallucination."
+QUOTA_EXCEEDED = "System is currently in read-only mode (no LLM provider is available: quota exceeded, rate limited or unreachable). Retrieval works, but answer generation is disabled."
+
+# Metric label per abstention reason
+REASON_LABELS = {
+    NO_CLAUSES: "no_clauses",
+    LOW_CONFIDENCE: "low_confidence",
+    FAITHFULNESS_REJECTED: "unfaithful",
+    QUOTA_EXCEEDED: "llm_unavailable",
+}
+
 def should_abstain(confidence: ConfidenceLevel, nodes_count: int) -> tuple[bool, str]:
     """
     Decides whether to abstain from generating an answer.
     Returns (should_abstain, reason)
     """
     if nodes_count == 0:
-        return True, "No relevant regulatory clauses found in the corpus."
-    
+        return True, NO_CLAUSES
+
     if confidence == ConfidenceLevel.LOW:
-        return True, "Confidence in the retrieved information is too low to provide a safe answer."
-    
+        return True, LOW_CONFIDENCE
+
     return False, ""
 
 def generate_abstain_response(query_id: str, reason: str, confidence: ConfidenceLevel = ConfidenceLevel.LOW) -> AbstainResponse:
+    ABSTENTIONS.inc(reason=REASON_LABELS.get(reason, "other"))
     return AbstainResponse(
         query_id=query_id,
         reason=reason,
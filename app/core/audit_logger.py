@@ -1,35 +1,317 @@
+import atexit
+import glob
+import gzip
 import json
+import logging
 import os
+import queue
+import re
+import shutil
+import threading
+import time
 from datetime import datetime
+from typing import List, Optional
+from app.core.audit_store import AuditStore
+from app.core.config import config
+from app.core.locks import FileLock
+from app.core.metrics import QUERIES, QUERY_SECONDS, current_trace, timed
 from app.schemas.models import AuditLogEntry, Jurisdiction, Outcome, ConfidenceLevel
 
-LOG_FILE = "audit_logs.jsonl"
+logger = logging.getLogger(__name__)
+
+LOG_FILE = config.AUDIT_LOG_PATH
+
+FSYNC_POLICIES = ("batch", "interval", "never")
+# Suffix of a rotated log before compression: .<timestamp>.<pid>
+ROTATED_SUFFIX = re.compile(r"\.\d{8}T\d{12}\.\d+")
+# Entries on disk but not yet in the store are retried up to this many; `audit-backfill` recovers the rest
+MAX_UNINDEXED = 10000
+
+class AuditSink:
+    """
+    Queues audit entries and appends them in batches from a background thread.
+
+    fsync policy: "batch" fsyncs every batch, "interval" at most every
+    `fsync_interval` seconds, "never" leaves it to the OS. The log rotates to a
+    gzip archive when it exceeds `max_bytes` or its first entry is older than
+    `rotate_seconds`. `close()` drains the queue, so a graceful shutdown loses nothing.
+    Each batch is also indexed into `store`, if given, once it is on disk.
+
+    A batch that cannot be appended is spilled to `<path>.failed` (or, if that fails
+    too, kept in memory and retried every `retry_interval` seconds); the next
+    successful write in any process appends the spilled entries first.
+    """
+    def __init__(
+        self,
+        path: str,
+        batch_size: int = 256,
+        flush_interval: float = 0.5,
+        fsync: str = "batch",
+        fsync_interval: float = 1.0,
+        max_bytes: int = 100 * 1024 * 1024,
+        rotate_seconds: float = 0,
+        store: Optional[AuditStore] = None,
+        retry_interval: float = 1.0,
+    ):
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"fsync must be one of {FSYNC_POLICIES}, got {fsync!r}")
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.fsync = fsync
+        self.fsync_interval = fsync_interval
+        self.max_bytes = max_bytes
+        self.rotate_seconds = rotate_seconds
+        self.store = store
+        self.retry_interval = retry_interval
+        self.spill_path = path + ".failed"
+        self.queue = queue.Queue()
+        self.lock = threading.Lock()
+        self.written = 0
+        self.rotations = 0
+        self.failures = 0
+        # Lines that could be neither appended nor spilled, and lines on disk the store missed
+        self.pending: List[str] = []
+        self.unindexed: List[str] = []
+        self._last_fsync = 0.0
+        self._thread = None
+
+    def write(self, entry: AuditLogEntry):
+        """
+        Non-blocking: the entry is serialized now and written by the background thread.
+        """
+        self.queue.put(entry.model_dump_json())
+        self._ensure_started()
+
+    def _ensure_started(self):
+        if self._thread and self._thread.is_alive():
+            return
+        with self.lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name="audit-writer", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            try:
+                batch = [self.queue.get(timeout=self.retry_interval if self.pending else None)]
+            except queue.Empty:
+                batch = []
+            # Linger up to flush_interval so a trickle of entries still shares one write + fsync
+            deadline = time.monotonic() + self.flush_interval
+            while batch and len(batch) < self.batch_size and batch[-1] is not None:
+                try:
+                    batch.append(self.queue.get(timeout=max(deadline - time.monotonic(), 0)))
+                except queue.Empty:
+                    break
+
+            stop = None in batch
+            lines = self.pending + [line for line in batch if line is not None]
+            self.pending = []
+            try:
+                if lines:
+                    self._write_batch(lines)
+            except Exception as e:
+                self.failures += 1
+                self._set_aside(lines, e)
+            finally:
+                for _ in batch:
+                    self.queue.task_done()
+            if stop:
+                if self.pending:
+                    logger.critical("Lost %d audit entries that could not be written or spilled", len(self.pending))
+                return
+
+    def _write_batch(self, lines: List[str]):
+        """
+        Appends spilled entries, then `lines`. A failed append is truncated away, so
+        retrying never duplicates or splits a line.
+        """
+        with FileLock(self.path + ".lock"):
+            spilled = self._read_spill()
+            lines = spilled + lines
+            data = ("\n".join(lines) + "\n").encode("utf-8")
+            fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                size = os.fstat(fd).st_size
+                try:
+                    view = memoryview(data)
+                    while view:
+                        view = view[os.write(fd, view):]
+                    now = time.monotonic()
+                    if self.fsync == "batch" or (self.fsync == "interval" and now - self._last_fsync >= self.fsync_interval):
+                        os.fsync(fd)
+                        self._last_fsync = now
+                except BaseException:
+                    os.ftruncate(fd, size)
+                    raise
+            finally:
+                os.close(fd)
+            if spilled:
+                os.remove(self.spill_path)
+            self.written += len(lines)
+            # From here on the entries are on disk: later failures must not retry them
+            try:
+                rotated = self._rotate_if_needed()
+            except Exception as e:
+                logger.error("Failed to rotate audit log: %s", e)
+                rotated = None
+        if rotated:
+            try:
+                self._compress(rotated)
+            except Exception as e:
+                # archives() still lists it uncompressed
+                logger.error("Failed to compress %s: %s", rotated, e)
+        if self.store is not None:
+            self._index(lines)
+
+    def _read_spill(self) -> List[str]:
+        # Called with the file lock held
+        try:
+            with open(self.spill_path, "r", encoding="utf-8") as f:
+                return [line.rstrip("\n") for line in f if line.strip()]
+        except FileNotFoundError:
+            return []
+
+    def _set_aside(self, lines: List[str], error: Exception):
+        """
+        Spills a batch that could not be appended, or keeps it for the next attempt.
+        """
+        try:
+            with FileLock(self.path + ".lock"):
+                with open(self.spill_path, "a", encoding="utf-8") as f:
+                    f.write("\n".join(lines) + "\n")
+                    f.flush()
+                    os.fsync(f.fileno())
+            logger.error("Failed to write %d audit entries, spilled to %s: %s", len(lines), self.spill_path, error)
+        except OSError as e:
+            logger.critical("Failed to write or spill %d audit entries, retrying: %s; %s", len(lines), error, e)
+            self.pending = lines
+
+    def _index(self, lines: List[str]):
+        lines = self.unindexed + lines
+        try:
+            self.store.insert_many(lines)
+            self.unindexed = []
+        except Exception as e:
+            logger.error("Failed to index %d audit entries, retrying with the next batch: %s", len(lines), e)
+            self.unindexed = lines[-MAX_UNINDEXED:]
+
+    def _rotate_if_needed(self) -> Optional[str]:
+        """
+        Called with the file lock held. Renames the live log aside and returns the new name.
+        """
+        try:
+            size = os.path.getsize(self.path)
+        except FileNotFoundError:
+            return None
+        too_big = self.max_bytes and size >= self.max_bytes
+        too_old = self.rotate_seconds and self._first_entry_age() >= self.rotate_seconds
+        if not (too_big or too_old):
+            return None
+
+        stamp = datetime.now().strftime("%Y%m%dT%H%M%S%f")
+        rotated = f"{self.path}.{stamp}.{os.getpid()}"
+        os.replace(self.path, rotated)
+        self.rotations += 1
+        return rotated
+
+    def _first_entry_age(self) -> float:
+        with open(self.path, "r") as f:
+            first = f.readline()
+        if not first.strip():
+            return 0.0
+        timestamp = datetime.fromisoformat(json.loads(first)["timestamp"])
+        return (datetime.now() - timestamp).total_seconds()
+
+    def _compress(self, rotated: str):
+        # Outside the lock: other workers keep appending to the new live file. Written
+        # aside and renamed, so a crash never leaves a truncated archive.
+        with open(rotated, "rb") as src, gzip.open(rotated + ".jsonl.gz.tmp", "wb") as dst:
+            shutil.copyfileobj(src, dst)
+            dst.flush()
+        os.replace(rotated + ".jsonl.gz.tmp", rotated + ".jsonl.gz")
+        os.remove(rotated)
+
+    def flush(self):
+        """
+        Blocks until every queued entry has been written, or set aside after a failed
+        write (up to one flush interval).
+        """
+        if self._thread and self._thread.is_alive():
+            self.queue.join()
+
+    def close(self):
+        """
+        Drains the queue and stops the writer thread.
+        """
+        if self._thread and self._thread.is_alive():
+            self.queue.put(None)
+            self._thread.join()
+
+    def archives(self) -> List[str]:
+        """
+        Rotated logs, oldest first: the gzip archives, plus rotated files whose
+        compression never finished (e.g. the process died in between).
+        """
+        archives = set(glob.glob(glob.escape(self.path) + ".*.jsonl.gz"))
+        for path in glob.glob(glob.escape(self.path) + ".*"):
+            if ROTATED_SUFFIX.fullmatch(path[len(self.path):]) and path + ".jsonl.gz" not in archives:
+                archives.add(path)
+        return sorted(archives)
+
+audit_sink = AuditSink(
+    LOG_FILE,
+    batch_size=config.AUDIT_BATCH_SIZE,
+    flush_interval=config.AUDIT_FLUSH_INTERVAL_SECONDS,
+    fsync=config.AUDIT_FSYNC,
+    max_bytes=config.AUDIT_MAX_BYTES,
+    rotate_seconds=config.AUDIT_ROTATE_SECONDS,
+    store=AuditStore(config.AUDIT_DB_PATH),
+)
+# Last resort for CLI use; the app lifespan closes the sink explicitly
+atexit.register(audit_sink.close)
 
 def log_query(
     query_id: str,
     question: str,
     jurisdiction: Jurisdiction,
     outcome: Outcome,
-    confidence_level: ConfidenceLevel
+    confidence_level: ConfidenceLevel,
+    cache_similarity: Optional[float] = None,
+    cached_query_id: Optional[str] = None
 ):
+    """
+    Queues the audit entry, with the current request's stage timings if it is traced.
+    """
+    trace = current_trace.get()
+    stages = None
+    if trace is not None:
+        stages = trace.snapshot()
+        stages["total"] = round(trace.elapsed() * 1000, 3)
+        QUERY_SECONDS.observe(trace.elapsed(), outcome=outcome.value)
+    QUERIES.inc(outcome=outcome.value)
     entry = AuditLogEntry(
         query_id=query_id,
         question=question,
         jurisdiction=jurisdiction,
         outcome=outcome,
         confidence_level=confidence_level,
-        timestamp=datetime.now()
+        timestamp=datetime.now(),
+        cache_similarity=cache_similarity,
+        cached_query_id=cached_query_id,
+        trace=stages,
     )
-    
-    with open(LOG_FILE, "a") as f:
-        f.write(entry.model_dump_json() + "\n")
-
-def get_logs() -> list[dict]:
-    if not os.path.exists(LOG_FILE):
-        return []
-    
-    logs = []
-    with open(LOG_FILE, "r") as f:
-        for line in f:
-            logs.append(json.loads(line))
-    return logs
+    with timed("audit"):
+        audit_sink.write(entry)
+
+def backfill_store(sink: AuditSink = audit_sink, only_if_empty: bool = False) -> int:
+    """
+    Indexes entries written before the store existed (archives, live log and any
+    spilled entries). Idempotent.
+    """
+    if sink.store is None or (only_if_empty and sink.store.count()):
+        return 0
+    sink.flush()
+    return sink.store.backfill(sink.archives() + [sink.path, sink.spill_path])
@@ -0,0 +1,152 @@
+import base64
+import gzip
+import json
+import os
+import sqlite3
+import threading
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Iterator, List, Optional
+
+# Filterable columns; each has an index ending in (ts, seq) for keyset pagination
+FILTER_COLUMNS = ("jurisdiction", "outcome", "confidence_level")
+
+@dataclass
+class AuditQuery:
+    """
+    Filters for an audit log scan. `since` is inclusive, `until` exclusive.
+    """
+    jurisdiction: Optional[str] = None
+    outcome: Optional[str] = None
+    confidence_level: Optional[str] = None
+    since: Optional[datetime] = None
+    until: Optional[datetime] = None
+    descending: bool = True
+
+def encode_cursor(ts: float, seq: int) -> str:
+    return base64.urlsafe_b64encode(f"{ts!r}:{seq}".encode()).decode()
+
+def decode_cursor(cursor: str) -> tuple[float, int]:
+    try:
+        ts, seq = base64.urlsafe_b64decode(cursor.encode()).decode().split(":")
+        return float(ts), int(seq)
+    except Exception:
+        raise ValueError(f"Invalid cursor: {cursor!r}")
+
+class AuditStore:
+    """
+    Indexed SQLite copy of the audit log for filtered, paginated reads. The JSONL
+    log (and its archives) stays the system of record; the store can always be
+    rebuilt from it with `backfill`. WAL mode lets several workers write to it.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False, timeout=10.0)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS audit ("
+            " seq INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " query_id TEXT NOT NULL UNIQUE,"
+            " ts REAL NOT NULL,"
+            " jurisdiction TEXT NOT NULL,"
+            " outcome TEXT NOT NULL,"
+            " confidence_level TEXT NOT NULL,"
+            " entry TEXT NOT NULL)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_audit_ts ON audit (ts, seq)")
+        for column in FILTER_COLUMNS:
+            self.conn.execute(f"CREATE INDEX IF NOT EXISTS idx_audit_{column} ON audit ({column}, ts, seq)")
+        self.conn.commit()
+
+    @staticmethod
+    def _row(line: str) -> tuple:
+        entry = json.loads(line)
+        ts = datetime.fromisoformat(entry["timestamp"]).timestamp()
+        return (entry["query_id"], ts, entry["jurisdiction"], entry["outcome"], entry["confidence_level"], line)
+
+    def insert_many(self, lines: List[str]) -> int:
+        """
+        Inserts serialized AuditLogEntry lines; entries already present (same query_id) are skipped.
+        """
+        rows = [self._row(line) for line in lines]
+        with self.lock:
+            before = self.conn.total_changes
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO audit (query_id, ts, jurisdiction, outcome, confidence_level, entry)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            self.conn.commit()
+            return self.conn.total_changes - before
+
+    def _select(self, query: AuditQuery, limit: int, cursor: Optional[str]) -> tuple[List[str], Optional[str]]:
+        clauses, params = [], []
+        for column in FILTER_COLUMNS:
+            value = getattr(query, column)
+            if value is not None:
+                clauses.append(f"{column} = ?")
+                params.append(value)
+        if query.since is not None:
+            clauses.append("ts >= ?")
+            params.append(query.since.timestamp())
+        if query.until is not None:
+            clauses.append("ts < ?")
+            params.append(query.until.timestamp())
+        if cursor is not None:
+            clauses.append("(ts, seq) < (?, ?)" if query.descending else "(ts, seq) > (?, ?)")
+            params.extend(decode_cursor(cursor))
+
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        order = "DESC" if query.descending else "ASC"
+        sql = f"SELECT ts, seq, entry FROM audit {where} ORDER BY ts {order}, seq {order} LIMIT ?"
+        with self.lock:
+            # One extra row tells us whether another page exists
+            rows = self.conn.execute(sql, (*params, limit + 1)).fetchall()
+
+        next_cursor = encode_cursor(rows[limit - 1][0], rows[limit - 1][1]) if len(rows) > limit else None
+        return [entry for _, _, entry in rows[:limit]], next_cursor
+
+    def page(self, query: AuditQuery, limit: int = 100, cursor: Optional[str] = None) -> tuple[List[dict], Optional[str]]:
+        """
+        Returns up to `limit` entries and the cursor of the next page (None on the last page).
+        """
+        entries, next_cursor = self._select(query, limit, cursor)
+        return [json.loads(entry) for entry in entries], next_cursor
+
+    def export(self, query: AuditQuery, page_size: int = 1000) -> Iterator[str]:
+        """
+        Yields matching entries as NDJSON lines, one page at a time, so memory stays bounded.
+        """
+        cursor = None
+        while True:
+            entries, cursor = self._select(query, page_size, cursor)
+            for entry in entries:
+                yield entry + "\n"
+            if cursor is None:
+                return
+
+    def count(self) -> int:
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM audit").fetchone()[0]
+
+    def backfill(self, paths: List[str], batch_size: int = 5000) -> int:
+        """
+        Loads JSONL (or .jsonl.gz) audit files into the store. Safe to re-run.
+        """
+        inserted = 0
+        for path in paths:
+            if not os.path.exists(path):
+                continue
+            opener = gzip.open if path.endswith(".gz") else open
+            batch = []
+            with opener(path, "rt") as f:
+                for line in f:
+                    if line.strip():
+                        batch.append(line.strip())
+                    if len(batch) >= batch_size:
+                        inserted += self.insert_many(batch)
+                        batch = []
+            if batch:
+                inserted += self.insert_many(batch)
+        return inserted
@@ -1,21 +1,238 @@
+import logging
+import pickle
+import sqlite3
+import threading
 import time
+from collections import OrderedDict
+from typing import Any, Optional, Union
+from pydantic import TypeAdapter, ValidationError
+from app.core.config import config
+from app.core.metrics import metrics
+from app.schemas.models import AbstainResponse, AnswerResponse
+
+logger = logging.getLogger(__name__)
+
+class DiskCache:
+    """
+    SQLite-backed second tier. WAL mode lets several uvicorn workers share one file,
+    and entries survive restarts.
+    """
+    def __init__(self, path: str, ttl_seconds: float, max_entries: int):
+        self.path = path
+        self.ttl = ttl_seconds
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False, timeout=5.0)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value BLOB NOT NULL, created_at REAL NOT NULL)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_cache_created_at ON cache (created_at)")
+        self.conn.commit()
+
+    def get(self, key: str) -> Optional[tuple[bytes, float]]:
+        with self.lock:
+            row = self.conn.execute("SELECT value, created_at FROM cache WHERE key = ?", (key,)).fetchone()
+        if row and time.time() - row[1] < self.ttl:
+            return row[0], row[1]
+        return None
+
+    def set(self, key: str, payload: bytes, created_at: float):
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO cache (key, value, created_at) VALUES (?, ?, ?)",
+                (key, payload, created_at),
+            )
+            self.conn.commit()
+
+    def sweep(self) -> int:
+        with self.lock:
+            expired = self.conn.execute(
+                "DELETE FROM cache WHERE created_at < ?", (time.time() - self.ttl,)
+            ).rowcount
+            # Trim the oldest entries beyond the cap
+            self.conn.execute(
+                "DELETE FROM cache WHERE key IN (SELECT key FROM cache ORDER BY created_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+            self.conn.commit()
+        return expired
+
+    def count(self) -> int:
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+
+    def clear(self):
+        with self.lock:
+            self.conn.execute("DELETE FROM cache")
+            self.conn.commit()
 
 class ResponseCache:
-    def __init__(self, ttl_seconds=3600):
-        self.cache = {}
+    """
+    Bounded LRU cache with TTL expiry, capped by entry count and (serialized) byte size.
+    Expired entries are removed by a background sweep as well as on read.
+
+    The disk tier stores values as JSON of `disk_type` (a pydantic model or union of
+    them) and validates them on the way back; anything that does not validate, such
+    as an entry written before a field changed, is a miss.
+    """
+    def __init__(
+        self,
+        ttl_seconds=3600,
+        max_entries=1000,
+        max_bytes=50 * 1024 * 1024,
+        sweep_interval=60,
+        disk_path: Optional[str] = None,
+        disk_type: Any = None,
+    ):
+        if disk_path and disk_type is None:
+            raise ValueError("A disk tier needs the disk_type of the cached values")
+        self.cache = OrderedDict()  # key -> (value, timestamp, size)
         self.ttl = ttl_seconds
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.sweep_interval = sweep_interval
+        self.total_bytes = 0
+        self.lock = threading.RLock()
+        self.disk = DiskCache(disk_path, ttl_seconds, max_entries * 10) if disk_path else None
+        self.disk_adapter = TypeAdapter(disk_type) if self.disk else None
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self._sweeper = None
+        self._stop = threading.Event()
 
     def get(self, key):
-        if key in self.cache:
-            data, timestamp = self.cache[key]
-            if time.time() - timestamp < self.ttl:
-                return data
+        with self.lock:
+            if key in self.cache:
+                data, timestamp, _ = self.cache[key]
+                if time.time() - timestamp < self.ttl:
+                    self.cache.move_to_end(key)
+                    self.hits += 1
+                    return data
+                self._remove(key)
+                self.expirations += 1
+
+        row = self.disk.get(key) if self.disk else None
+        if row:
+            payload, created_at = row
+            try:
+                data = self.disk_adapter.validate_json(payload)
+            except ValidationError as e:
+                logger.warning("Ignoring unreadable disk cache entry %s: %s", key, e.errors()[0]["msg"])
             else:
-                del self.cache[key]
+                with self.lock:
+                    self._insert(key, data, created_at, len(payload))
+                    self.hits += 1
+                    self.disk_hits += 1
+                return data
+
+        with self.lock:
+            self.misses += 1
         return None
 
     def set(self, key, value):
-        self.cache[key] = (value, time.time())
+        # In memory only, the pickled size is just the footprint estimate; nothing is unpickled
+        payload = self.disk_adapter.dump_json(value) if self.disk else pickle.dumps(value)
+        now = time.time()
+        with self.lock:
+            self._insert(key, value, now, len(payload))
+        if self.disk:
+            self.disk.set(key, payload, now)
+        self._ensure_sweeper()
+
+    def _insert(self, key, value, timestamp, size):
+        if key in self.cache:
+            self._remove(key)
+        if size > self.max_bytes:
+            return
+        self.cache[key] = (value, timestamp, size)
+        self.total_bytes += size
+        while len(self.cache) > self.max_entries or self.total_bytes > self.max_bytes:
+            oldest = next(iter(self.cache))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def _remove(self, key):
+        _, _, size = self.cache.pop(key)
+        self.total_bytes -= size
+
+    def sweep(self) -> int:
+        """
+        Drops every expired entry from memory (and disk). Returns the number removed from memory.
+        """
+        cutoff = time.time() - self.ttl
+        with self.lock:
+            expired = [key for key, (_, timestamp, _) in self.cache.items() if timestamp <= cutoff]
+            for key in expired:
+                self._remove(key)
+            self.expirations += len(expired)
+        if self.disk:
+            self.disk.sweep()
+        return len(expired)
+
+    def _ensure_sweeper(self):
+        if self.sweep_interval <= 0 or (self._sweeper and self._sweeper.is_alive()):
+            return
+        with self.lock:
+            if self._sweeper and self._sweeper.is_alive():
+                return
+            self._stop.clear()
+            self._sweeper = threading.Thread(target=self._sweep_loop, name="cache-sweeper", daemon=True)
+            self._sweeper.start()
+
+    def _sweep_loop(self):
+        while not self._stop.wait(self.sweep_interval):
+            try:
+                self.sweep()
+            except Exception as e:
+                logger.warning("Cache sweep failed: %s", e)
+
+    def stop(self):
+        self._stop.set()
+
+    def clear(self):
+        with self.lock:
+            self.cache.clear()
+            self.total_bytes = 0
+        if self.disk:
+            self.disk.clear()
+
+    def stats(self) -> dict:
+        with self.lock:
+            lookups = self.hits + self.misses
+            stats = {
+                "entries": len(self.cache),
+                "bytes": self.total_bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+        if self.disk:
+            stats["disk_entries"] = self.disk.count()
+        return stats
 
 # Global cache instance
-query_cache = ResponseCache()
+query_cache = ResponseCache(
+    ttl_seconds=config.CACHE_TTL_SECONDS,
+    max_entries=config.CACHE_MAX_ENTRIES,
+    max_bytes=config.CACHE_MAX_BYTES,
+    sweep_interval=config.CACHE_SWEEP_SECONDS,
+    disk_path=config.CACHE_DISK_PATH,
+    disk_type=Union[AnswerResponse, AbstainResponse],
+)
+
+def _cache_metrics():
+    stats = query_cache.stats()
+    yield "rag_response_cache_entries", "gauge", "Answers held in the in-memory response cache.", [({}, stats["entries"])]
+    yield "rag_response_cache_bytes", "gauge", "Approximate size of the in-memory response cache.", [({}, stats["bytes"])]
+    yield "rag_response_cache_evictions_total", "counter", "Answers evicted from the in-memory response cache.", [({}, stats["evictions"])]
+
+metrics.register_collector(_cache_metrics)
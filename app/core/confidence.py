@@ -1,52 +1,144 @@
+import math
 import numpy as np
-from typing import List
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence, Union
 from llama_index.core.schema import NodeWithScore
+from app.ingestion.keyword_index import KeywordIndex, tokenize
 from app.schemas.models import ConfidenceLevel
 
-def calculate_confidence(
-    query: str, 
+# Relative weight of each feature in the confidence score. Features that cannot be
+# computed for a request (no embeddings in keyword-only mode, no keyword index) drop
+# out and the remaining weights are renormalized. Checked with benchmarks/eval_confidence.py.
+FEATURE_WEIGHTS = {
+    "top_similarity": 0.2,
+    "mean_similarity": 0.1,
+    "term_coverage": 0.25,
+    "idf_coverage": 0.25,
+    "best_node_coverage": 0.1,
+    "agreement": 0.1,
+}
+
+# Cosine similarities (bge-small) are rescaled from [floor, ceiling] to [0, 1]
+SIMILARITY_FLOOR = 0.45
+SIMILARITY_CEILING = 0.85
+
+# Scores at or below MEDIUM_THRESHOLD abstain. These are the cut-offs of the previous
+# heuristic; recalibrate with the sweep in benchmarks/eval_confidence.py on the full
+# feature vector (embedding similarity included) before moving them.
+HIGH_THRESHOLD = 0.6
+MEDIUM_THRESHOLD = 0.3
+
+@dataclass
+class ConfidenceAssessment:
+    level: ConfidenceLevel
+    score: float
+    # Feature name -> value in [0, 1]; None when unavailable for this request
+    features: Dict[str, Optional[float]] = field(default_factory=dict)
+
+def _similarity_features(query_embedding, node_embeddings: Optional[np.ndarray]) -> Dict[str, Optional[float]]:
+    if query_embedding is None or node_embeddings is None or not len(node_embeddings):
+        return {"top_similarity": None, "mean_similarity": None}
+    query = np.asarray(query_embedding, dtype=np.float32)
+    # Node embeddings arrive unit-normalized, so this is cosine similarity. The handful of
+    # scores is rescaled in Python: cheaper than more NumPy calls on a 4-element array.
+    norm = max(float(np.dot(query, query)) ** 0.5, 1e-12)
+    span = SIMILARITY_CEILING - SIMILARITY_FLOOR
+    scaled = [min(max((s / norm - SIMILARITY_FLOOR) / span, 0.0), 1.0) for s in (node_embeddings @ query).tolist()]
+    return {"top_similarity": max(scaled), "mean_similarity": sum(scaled) / len(scaled)}
+
+def _coverage_features(query: str, nodes: List[NodeWithScore], keyword_indexes: Sequence[KeywordIndex]) -> Dict[str, Optional[float]]:
+    if not keyword_indexes:
+        return {"term_coverage": None, "idf_coverage": None, "best_node_coverage": None}
+    terms = sorted(set(tokenize(query)))
+    if not terms:
+        return {"term_coverage": 1.0, "idf_coverage": 1.0, "best_node_coverage": 1.0}
+
+    # Each node is matched against its own partition's index, through the index's cached
+    # per-node term sets; IDF is over all searched partitions
+    covered = set()
+    node_matches = [0] * len(nodes)
+    doc_freqs = [0] * len(terms)
+    num_docs = 0
+    node_ids = [n.node.node_id for n in nodes]
+    for keyword_index in keyword_indexes:
+        num_docs += keyword_index.num_docs
+        term_ids = keyword_index.term_ids
+        columns = [(col, term_ids[term]) for col, term in enumerate(terms) if term in term_ids]
+        if not columns:
+            continue
+        for (col, _), doc_freq in zip(columns, keyword_index.doc_freqs([term_id for _, term_id in columns])):
+            doc_freqs[col] += doc_freq
+        for row, node_id in enumerate(node_ids):
+            term_set = keyword_index.node_term_set(node_id)
+            if term_set is None:
+                continue
+            matched = [col for col, term_id in columns if term_id in term_set]
+            node_matches[row] += len(matched)
+            covered.update(matched)
+    # Same BM25 IDF as the keyword index; terms absent from every partition get the highest
+    idf = [math.log1p((num_docs - df + 0.5) / (df + 0.5)) for df in doc_freqs]
+    total_idf = sum(idf)
+    return {
+        "term_coverage": len(covered) / len(terms),
+        "idf_coverage": sum(idf[col] for col in covered) / total_idf if total_idf > 0 else 0.0,
+        "best_node_coverage": max(node_matches) / len(terms) if nodes else 0.0,
+    }
+
+def _agreement(vector_results: List[NodeWithScore], keyword_results: List[NodeWithScore]) -> Optional[float]:
+    if not vector_results or not keyword_results:
+        # One leg is unavailable (e.g. keyword-only mode); no agreement signal either way
+        return None
+    vector_ids = {n.node.node_id for n in vector_results}
+    keyword_ids = {n.node.node_id for n in keyword_results}
+    return len(vector_ids & keyword_ids) / max(len(vector_ids), len(keyword_ids))
+
+def assess_confidence(
+    query: str,
     retrieved_nodes: List[NodeWithScore],
     vector_results: List[NodeWithScore],
-    keyword_results: List[NodeWithScore]
-) -> ConfidenceLevel:
+    keyword_results: List[NodeWithScore],
+    query_embedding: Optional[List[float]] = None,
+    node_embeddings: Optional[np.ndarray] = None,
+    keyword_index: Union[KeywordIndex, Sequence[KeywordIndex], None] = None,
+) -> ConfidenceAssessment:
     """
-    Computes confidence based on score variance, term coverage, and retriever agreement.
+    Scores how well the retrieved nodes support answering `query` from embedding
+    similarity (query vs. the nodes' stored embeddings), token-level term coverage
+    against the keyword index's per-node term sets, and cross-retriever agreement.
+    `node_embeddings` are unit-normalized rows aligned with `retrieved_nodes`.
+    `keyword_index` may be a list, one index per searched partition.
     """
     if not retrieved_nodes:
-        return ConfidenceLevel.LOW
-
-    # 1. Score Variance (how distinct is the top result?)
-    scores = [n.score for n in retrieved_nodes if n.score is not None]
-    top_score = max(scores) if scores else 0
-    # Normalize score influence (assuming BM25 or Vector scores are roughly in 0-10 range)
-    score_strength = min(top_score / 1.0, 1.0) 
-
-    # 2. Term Coverage (Improved: filtered stop words)
-    stop_words = {"what", "are", "the", "for", "is", "a", "an", "does", "do", "of", "in", "on", "to", "with", "and"}
-    query_terms = [term for term in query.lower().split() if term not in stop_words]
-    
-    combined_text = " ".join([n.node.get_content().lower() for n in retrieved_nodes])
-    if not query_terms:
-        coverage = 1.0
-    else:
-        coverage = sum(1 for term in query_terms if term in combined_text) / len(query_terms)
+        return ConfidenceAssessment(ConfidenceLevel.LOW, 0.0)
 
-    # 3. Cross-Retriever Agreement
-    vector_ids = {n.node.node_id for n in vector_results}
-    keyword_ids = {n.node.node_id for n in keyword_results}
-    intersection = vector_ids.intersection(keyword_ids)
-    
-    max_len = max(len(vector_ids), len(keyword_ids))
-    agreement = len(intersection) / max_len if max_len > 0 else 0
-
-    # Heuristic Logic: Coverage is the most important signal for RAG
-    confidence_score = (score_strength * 0.2) + (coverage * 0.6) + (agreement * 0.2)
-    
-    print(f"DEBUG CONFIDENCE: Score Strength: {score_strength:.2f}, Coverage: {coverage:.2f}, Agreement: {agreement:.2f} -> Total: {confidence_score:.2f}")
-
-    if confidence_score > 0.6:
-        return ConfidenceLevel.HIGH
-    elif confidence_score > 0.3:
-        return ConfidenceLevel.MEDIUM
+    keyword_indexes = [keyword_index] if isinstance(keyword_index, KeywordIndex) else list(keyword_index or [])
+    features = {
+        **_similarity_features(query_embedding, node_embeddings),
+        **_coverage_features(query, retrieved_nodes, keyword_indexes),
+        "agreement": _agreement(vector_results, keyword_results),
+    }
+    available = {name: value for name, value in features.items() if value is not None}
+    total_weight = sum(FEATURE_WEIGHTS[name] for name in available)
+    if not total_weight:
+        return ConfidenceAssessment(ConfidenceLevel.LOW, 0.0, features)
+    score = sum(FEATURE_WEIGHTS[name] * value for name, value in available.items()) / total_weight
+
+    if score > HIGH_THRESHOLD:
+        level = ConfidenceLevel.HIGH
+    elif score > MEDIUM_THRESHOLD:
+        level = ConfidenceLevel.MEDIUM
     else:
-        return ConfidenceLevel.LOW
+        level = ConfidenceLevel.LOW
+    return ConfidenceAssessment(level, round(score, 4), features)
+
+def calculate_confidence(
+    query: str,
+    retrieved_nodes: List[NodeWithScore],
+    vector_results: List[NodeWithScore],
+    keyword_results: List[NodeWithScore],
+    **kwargs
+) -> ConfidenceLevel:
+    """
+    Confidence level only; see `assess_confidence`.
+    """
+    return assess_confidence(query, retrieved_nodes, vector_results, keyword_results, **kwargs).level
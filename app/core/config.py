@@ -20,8 +20,126 @@ class Config:
     CORPUS_DIR.mkdir(parents=True, exist_ok=True)
     Path(LLAMA_INDEX_CACHE_DIR).mkdir(parents=True, exist_ok=True)
 
+    # Logging level for the app's own messages (DEBUG | INFO | WARNING | ERROR)
+    LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+
+    # Required in the X-Admin-Token header for admin endpoints; they are disabled when unset
+    ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+
+    # Startup: requests wait this long for the index before getting a 503
+    INDEX_READY_TIMEOUT_SECONDS = float(os.getenv("INDEX_READY_TIMEOUT_SECONDS", "300"))
+    STARTUP_BUDGET_SECONDS = float(os.getenv("STARTUP_BUDGET_SECONDS", "60"))
+    # Questions run once after startup to prime the embedding model and caches ("|"-separated)
+    WARMUP_QUERIES = [q for q in os.getenv(
+        "WARMUP_QUERIES",
+        "What is the time limit for issuing a tax invoice?|What is the interest rate on delayed payment of tax?"
+    ).split("|") if q.strip()]
+
+    # Models
+    LLM_MODEL = os.getenv("LLM_MODEL", "openai/gpt-4o-mini")
+    EMBED_MODEL = os.getenv("EMBED_MODEL", "BAAI/bge-small-en-v1.5")
+
+    # LLM gateway: any OpenAI-compatible endpoint; models in LLM_FALLBACK_MODELS are tried in order after LLM_MODEL
+    LLM_API_BASE = os.getenv("LLM_API_BASE", "https://openrouter.ai/api/v1")
+    LLM_FALLBACK_MODELS = [m.strip() for m in os.getenv("LLM_FALLBACK_MODELS", "").split(",") if m.strip()]
+    LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "16"))
+    LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "32"))
+    LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "30"))
+    LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "2"))
+    LLM_BACKOFF_SECONDS = float(os.getenv("LLM_BACKOFF_SECONDS", "0.5"))
+    # Race a second request against one still running after this long (0 disables hedging)
+    LLM_HEDGE_AFTER_SECONDS = float(os.getenv("LLM_HEDGE_AFTER_SECONDS", "10"))
+    LLM_MAX_TOKENS = int(os.getenv("LLM_MAX_TOKENS", "256"))
+
+    # LLM request rate per provider (prefix of LLM_MODEL); overrides like "openai=5,anthropic=2"
+    LLM_RATE_LIMIT_PER_SECOND = float(os.getenv("LLM_RATE_LIMIT_PER_SECOND", "10"))
+    LLM_RATE_BURST = float(os.getenv("LLM_RATE_BURST", "20"))
+    LLM_RATE_LIMITS = os.getenv("LLM_RATE_LIMITS", "")
+
+    # Local grounding check before the LLM faithfulness verifier; only ambiguous answers reach the LLM
+    LOCAL_VERIFIER_ENABLED = os.getenv("LOCAL_VERIFIER_ENABLED", "true").lower() == "true"
+
+    # Batch queries: questions answered concurrently, and the most accepted per request
+    BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "8"))
+    BATCH_MAX_QUESTIONS = int(os.getenv("BATCH_MAX_QUESTIONS", "500"))
+
     # LlamaIndex Configuration
     CHUNK_SIZE = 512
     CHUNK_OVERLAP = 50
+    # "sentence" or "structural" (rule/section, sub-rule, clause and proviso nodes with citation IDs).
+    # Structural is opt-in until its recall matches: 0.800 vs. 0.933 recall@4 (benchmarks/eval_chunking.py)
+    CHUNKING_MODE = os.getenv("CHUNKING_MODE", "sentence")
+    # Two or more retrieved clauses of one rule or sub-rule are replaced by it when it is at most this long
+    PARENT_EXPANSION_MAX_TOKENS = int(os.getenv("PARENT_EXPANSION_MAX_TOKENS", "1024"))
+
+    # Vector store: embeddings memory-mapped from storage/vectors, stored as float32 | float16 | int8
+    VECTOR_DTYPE = os.getenv("VECTOR_DTYPE", "float32")
+    # Exact search below this many chunks, IVF from there on (0 lists = sqrt(chunks); nprobe lists scanned per query)
+    VECTOR_ANN_THRESHOLD = int(os.getenv("VECTOR_ANN_THRESHOLD", "50000"))
+    VECTOR_IVF_LISTS = int(os.getenv("VECTOR_IVF_LISTS", "0"))
+    VECTOR_IVF_NPROBE = int(os.getenv("VECTOR_IVF_NPROBE", "16"))
+
+    # Partitions: each top-level corpus directory is indexed separately (root files are "shared").
+    # A query searches its jurisdiction's partitions plus "shared"; by default the one named like
+    # the jurisdiction, or as mapped here: "DPDP=dpdp|it_rules;GDPR=gdpr"
+    JURISDICTION_PARTITIONS = os.getenv("JURISDICTION_PARTITIONS", "")
+    # Loaded at startup besides "shared" ("," separated, "*" = all); the rest load on first query
+    PRELOAD_PARTITIONS = [p.strip().lower() for p in os.getenv("PRELOAD_PARTITIONS", "").split(",") if p.strip()]
+
+    # Multi-worker serving: workers attach to a read-only, memory-mapped snapshot of each partition's
+    # index (storage/snapshots) that one loader publishes, instead of each loading its own copy
+    INDEX_SNAPSHOTS = os.getenv("INDEX_SNAPSHOTS", "false").lower() == "true"
+    # How often workers check for a newer snapshot after an ingest run (0 disables)
+    SNAPSHOT_POLL_SECONDS = float(os.getenv("SNAPSHOT_POLL_SECONDS", "5"))
+
+    # Ingestion Pipeline (0 workers = one per CPU)
+    INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "0"))
+    INGEST_EMBED_BATCH_SIZE = int(os.getenv("INGEST_EMBED_BATCH_SIZE", "256"))
+    INGEST_PAGES_PER_TASK = int(os.getenv("INGEST_PAGES_PER_TASK", "16"))
+
+    # Hybrid Retrieval / Fusion
+    FUSION_MODE = os.getenv("FUSION_MODE", "rrf")
+    RETRIEVAL_TOP_K = int(os.getenv("RETRIEVAL_TOP_K", "4"))
+    CANDIDATE_POOL = int(os.getenv("CANDIDATE_POOL", "10"))
+    VECTOR_WEIGHT = float(os.getenv("VECTOR_WEIGHT", "1.0"))
+    KEYWORD_WEIGHT = float(os.getenv("KEYWORD_WEIGHT", "1.0"))
+    RRF_K = int(os.getenv("RRF_K", "60"))
+
+    # Context packing: clause tokens allowed in a generation or verification prompt
+    CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "1500"))
+
+    # Response Cache
+    CACHE_TTL_SECONDS = int(os.getenv("CACHE_TTL_SECONDS", "3600"))
+    CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "1000"))
+    CACHE_MAX_BYTES = int(os.getenv("CACHE_MAX_BYTES", str(50 * 1024 * 1024)))
+    CACHE_SWEEP_SECONDS = int(os.getenv("CACHE_SWEEP_SECONDS", "60"))
+    # Optional SQLite file shared by all workers; unset keeps the cache in memory only
+    CACHE_DISK_PATH = os.getenv("CACHE_DISK_PATH")
+
+    # Semantic Cache (near-duplicate questions reuse a cached answer)
+    SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE_ENABLED", "true").lower() == "true"
+    SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.92"))
+    SEMANTIC_CACHE_MAX_ENTRIES = int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "1000"))
+
+    # Concurrent uncached requests for the same question (same cache key, or a near-duplicate with
+    # the semantic cache on) share one pipeline run; duplicates wait up to the timeout for it
+    COALESCE_ENABLED = os.getenv("COALESCE_ENABLED", "true").lower() == "true"
+    COALESCE_TIMEOUT_SECONDS = float(os.getenv("COALESCE_TIMEOUT_SECONDS", "60"))
+
+    # Per-stage caches (embedding, retrieval, generation, verification); limits apply per stage
+    STAGE_CACHE_TTL_SECONDS = int(os.getenv("STAGE_CACHE_TTL_SECONDS", "86400"))
+    STAGE_CACHE_MAX_ENTRIES = int(os.getenv("STAGE_CACHE_MAX_ENTRIES", "2000"))
+    STAGE_CACHE_MAX_BYTES = int(os.getenv("STAGE_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+
+    # Audit Log (batched background writer; fsync: batch | interval | never)
+    AUDIT_LOG_PATH = os.getenv("AUDIT_LOG_PATH", "audit_logs.jsonl")
+    # Indexed SQLite copy of the log that backs filtered, paginated reads
+    AUDIT_DB_PATH = os.getenv("AUDIT_DB_PATH", "audit_logs.db")
+    AUDIT_BATCH_SIZE = int(os.getenv("AUDIT_BATCH_SIZE", "256"))
+    AUDIT_FLUSH_INTERVAL_SECONDS = float(os.getenv("AUDIT_FLUSH_INTERVAL_SECONDS", "0.5"))
+    AUDIT_FSYNC = os.getenv("AUDIT_FSYNC", "batch")
+    # Rotate to a gzip archive past this size or age (0 disables either trigger)
+    AUDIT_MAX_BYTES = int(os.getenv("AUDIT_MAX_BYTES", str(100 * 1024 * 1024)))
+    AUDIT_ROTATE_SECONDS = float(os.getenv("AUDIT_ROTATE_SECONDS", "86400"))
 
 config = Config()
@@ -0,0 +1,170 @@
+import re
+import threading
+from collections import Counter, OrderedDict
+from dataclasses import dataclass, field
+from typing import List
+from llama_index.core.schema import NodeWithScore
+from llama_index.core.utils import get_tokenizer
+from app.core.config import config
+
+# Shared, identical first part of the generation and verification prompts, so providers
+# that cache prompt prefixes reuse the clauses between the two calls for one request
+CONTEXT_PREFIX = """You are working strictly from the regulatory clauses below.
+
+CLAUSES:
+{context_str}
+"""
+
+# A clause cut shorter than this is dropped rather than included as a fragment
+MIN_CLAUSE_TOKENS = 64
+# Repeated text treated as chunk overlap: CHUNK_OVERLAP (50 tokens) is a few hundred characters
+MIN_OVERLAP_CHARS = 20
+MAX_OVERLAP_CHARS = 2000
+PACK_CACHE_SIZE = 256
+
+WHITESPACE = re.compile(r"[ \t\r\f\v]+")
+BLANK_LINES = re.compile(r"\s*\n\s*")
+
+@dataclass
+class PackedContext:
+    text: str
+    # Clauses that made it into `text`, in prompt order
+    node_ids: List[str] = field(default_factory=list)
+    tokens: int = 0
+    # Tokens the unpacked context (every clause in full, as before) would have used
+    raw_tokens: int = 0
+    deduplicated: int = 0
+    truncated: int = 0
+    dropped: int = 0
+
+# Prompts built and their clause tokens before/after packing, for /api/v1/llm/stats
+context_stats = Counter()
+
+_cache: "OrderedDict[tuple, PackedContext]" = OrderedDict()
+_cache_lock = threading.Lock()
+
+def count_tokens(text: str) -> int:
+    # LlamaIndex's bundled cl100k tokenizer, the same one chunking uses (no download needed)
+    return len(get_tokenizer()(text))
+
+def _compact(text: str) -> str:
+    # PDF extraction leaves runs of spaces and blank lines that cost tokens and carry nothing
+    return BLANK_LINES.sub("\n", WHITESPACE.sub(" ", text)).strip()
+
+def _overlap(a: str, b: str) -> int:
+    """
+    Length of the longest suffix of `a` that is a prefix of `b` (0 if shorter than MIN_OVERLAP_CHARS).
+    """
+    probe = b[:MIN_OVERLAP_CHARS]
+    if len(probe) < MIN_OVERLAP_CHARS:
+        return 0
+    pos = a.find(probe, max(0, len(a) - MAX_OVERLAP_CHARS))
+    while pos != -1:
+        if b.startswith(a[pos:]):
+            return len(a) - pos
+        pos = a.find(probe, pos + 1)
+    return 0
+
+def _deduplicate(text: str, kept: List[str]) -> str:
+    """
+    Strips text already present in a kept clause: the overlap with an adjacent chunk
+    on either side, or the whole clause if it is contained in one.
+    """
+    for other in kept:
+        if text in other:
+            return ""
+        overlap = _overlap(other, text)
+        if overlap:
+            text = text[overlap:].lstrip()
+            continue
+        overlap = _overlap(text, other)
+        if overlap:
+            text = text[:-overlap].rstrip()
+    return text
+
+def _truncate(text: str, tokens: int, budget: int) -> str:
+    """
+    Cuts `text` to roughly `budget` tokens at a sentence (or word) boundary.
+    """
+    for _ in range(3):
+        cut = text[:max(1, int(len(text) * budget / tokens))]
+        boundary = max(cut.rfind(". "), cut.rfind(";"))
+        if boundary < len(cut) // 2:
+            boundary = cut.rfind(" ")
+        text = cut[:boundary + 1].rstrip() + " ..." if boundary > 0 else cut
+        tokens = count_tokens(text)
+        if tokens <= budget:
+            break
+    return text
+
+def _label(n: NodeWithScore) -> str:
+    return n.node.metadata.get("clause_id") or n.node.node_id
+
+def _pack(nodes: List[NodeWithScore], budget: int) -> PackedContext:
+    raw = "\n\n".join(f"Clause ID: {_label(n)}\n{n.node.get_content()}" for n in nodes)
+    packed = PackedContext(text="", raw_tokens=count_tokens(raw))
+
+    # Best fused score first; it is what survives when the budget runs out
+    ordered = sorted(nodes, key=lambda n: n.score or 0.0, reverse=True)
+    kept, blocks, used = [], [], 0
+    for n in ordered:
+        content = _compact(n.node.get_content())
+        text = _deduplicate(content, kept)
+        if not text:
+            packed.deduplicated += 1
+            continue
+        if text != content:
+            packed.deduplicated += 1
+        block = f"[{_label(n)}] {text}"
+        tokens = count_tokens(block)
+        remaining = budget - used
+        if tokens > remaining:
+            if remaining < MIN_CLAUSE_TOKENS:
+                packed.dropped += 1
+                continue
+            block = _truncate(block, tokens, remaining)
+            tokens = count_tokens(block)
+            packed.truncated += 1
+        kept.append(content)
+        blocks.append(block)
+        packed.node_ids.append(n.node.node_id)
+        used += tokens
+
+    packed.text = "\n\n".join(blocks)
+    packed.tokens = count_tokens(packed.text)
+    return packed
+
+def pack_context(nodes: List[NodeWithScore], budget: int = None) -> PackedContext:
+    """
+    Clause context for a prompt: ordered by fused score, chunk overlap removed, whitespace
+    compacted, and cut to `budget` tokens (default CONTEXT_TOKEN_BUDGET). Memoized on the
+    node IDs, so generation and verification for one request share the same packed text.
+    """
+    budget = budget or config.CONTEXT_TOKEN_BUDGET
+    key = (tuple((n.node.node_id, n.score) for n in nodes), budget)
+    with _cache_lock:
+        packed = _cache.get(key)
+        if packed is not None:
+            _cache.move_to_end(key)
+    if packed is None:
+        packed = _pack(nodes, budget)
+        with _cache_lock:
+            _cache[key] = packed
+            if len(_cache) > PACK_CACHE_SIZE:
+                _cache.popitem(last=False)
+
+    context_stats["prompts"] += 1
+    context_stats["raw_tokens"] += packed.raw_tokens
+    context_stats["packed_tokens"] += packed.tokens
+    context_stats["deduplicated_clauses"] += packed.deduplicated
+    context_stats["truncated_clauses"] += packed.truncated
+    context_stats["dropped_clauses"] += packed.dropped
+    return packed
+
+def context_snapshot() -> dict:
+    stats = dict(context_stats)
+    prompts = stats.get("prompts", 0)
+    if prompts:
+        stats["raw_tokens_per_prompt"] = round(stats["raw_tokens"] / prompts, 1)
+        stats["packed_tokens_per_prompt"] = round(stats["packed_tokens"] / prompts, 1)
+    return stats
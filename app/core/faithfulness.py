@@ -1,12 +1,22 @@
+import asyncio
+import logging
+import re
+from collections import Counter
 from typing import List
 from llama_index.core.schema import NodeWithScore
-from app.core.llm import llm
+from app.core.config import config
+from app.core.context import CONTEXT_PREFIX, pack_context
+from app.core.grounding import ACCEPT, ESCALATE, GroundingVerdict, check_grounding, split_claims
+from app.core.llm import get_llm
+from app.core.llm_gateway import LLMUnavailableError
+from app.core.metrics import metrics
+from app.core.semantic_cache import embed_questions
+from app.core.stage_cache import stage_caches, content_key, prompt_version
+from app.ingestion.index import ingestion_manager
 
-VERIFICATION_PROMPT = """
-Task: You are a high-precision legal auditor. Verify if the provided answer is strictly grounded in the regulatory context.
-
-CONTEXT:
-{context_str}
+# Starts with the same CONTEXT_PREFIX as the generation prompt
+VERIFICATION_PROMPT = CONTEXT_PREFIX + """
+Task: You are a high-precision legal auditor. Verify if the provided answer is strictly grounded in the clauses above.
 
 ANSWER TO VERIFY:
 {answer}
@@ -22,39 +32,90 @@ Rules:
 }}
 """
 
+PROMPT_VERSION = prompt_version(VERIFICATION_PROMPT)
+
+# How verifications were decided: "accept"/"reject" locally, "escalate" to the LLM ("cached" LLM verdicts)
+verification_counts = Counter()
+
+logger = logging.getLogger(__name__)
+
+def _verification_metrics():
+    yield "rag_verifications_total", "counter", "Faithfulness checks by how they were decided.", [
+        ({"decision": decision}, count) for decision, count in sorted(verification_counts.items())
+    ]
+
+metrics.register_collector(_verification_metrics)
+
+def local_verdict(answer: str, nodes: List[NodeWithScore]) -> GroundingVerdict:
+    """
+    Grounding check on CPU. Claims are embedded only when the clauses' stored embeddings
+    are available to compare against.
+    """
+    node_embeddings = ingestion_manager.node_embeddings([n.node.node_id for n in nodes])
+    claim_embeddings = None
+    if node_embeddings is not None:
+        try:
+            claim_embeddings = embed_questions(split_claims(answer))
+        except Exception as e:
+            logger.warning("Claim embedding failed, checking lexical grounding only: %s", e)
+    return check_grounding(answer, nodes, claim_embeddings, node_embeddings)
+
 async def verify_faithfulness(answer: str, nodes: List[NodeWithScore]) -> tuple[bool, float]:
     """
-    Optimized: Verifies the entire answer in ONE call to save API quota.
+    Clearly grounded or clearly ungrounded answers are decided locally; the rest are
+    verified in ONE LLM call. Fails closed: an answer that can't be verified is rejected.
     """
     if not answer or answer.strip() == "No information available.":
         return True, 1.0
 
-    context_str = "\n\n".join([n.node.get_content() for n in nodes])
-    
+    if config.LOCAL_VERIFIER_ENABLED:
+        local = await asyncio.to_thread(local_verdict, answer, nodes)
+        verification_counts[local.decision] += 1
+        if local.decision != ESCALATE:
+            return local.decision == ACCEPT, local.score
+    return await llm_verify(answer, nodes)
+
+async def llm_verify(answer: str, nodes: List[NodeWithScore]) -> tuple[bool, float]:
+    """
+    Optimized: Verifies the entire answer in ONE call to save API quota.
+    """
+    # One entry per (answer, nodes) holding a verdict per model that served it; the verdict
+    # of the highest-ranked model in the current chain is reused
+    cache_key = content_key(answer, [n.node.node_id for n in nodes], PROMPT_VERSION, config.CONTEXT_TOKEN_BUDGET)
+    verdicts = stage_caches.get("verification", cache_key) or {}
+
     try:
-        prompt = VERIFICATION_PROMPT.format(context_str=context_str, answer=answer)
+        llm = get_llm()
+        for model in llm.models:
+            if model in verdicts:
+                verification_counts["cached"] += 1
+                return verdicts[model]
+
+        prompt = VERIFICATION_PROMPT.format(context_str=pack_context(nodes).text, answer=answer)
         response = await llm.acomplete(prompt)
         
         # Simple extraction if LLM ignores JSON request or uses markdown
         text = response.text.strip().lower()
         
         # Look for the specific pattern anywhere in the text
-        import re
         is_faithful_match = re.search(r'"is_faithful":\s*(true|false)', text)
         
         if is_faithful_match:
             val = is_faithful_match.group(1)
-            if val == "true":
-                return True, 1.0
-            else:
-                return False, 0.0
-        
+            verdict = (True, 1.0) if val == "true" else (False, 0.0)
         # Fallback for non-json or text-based responses
-        if "is_faithful\": true" in text or "\"is_faithful\":true" in text or "yes" in text[:10]:
-            return True, 1.0
-        
-        return False, 0.0
+        elif "is_faithful\": true" in text or "\"is_faithful\":true" in text or "yes" in text[:10]:
+            verdict = (True, 1.0)
+        else:
+            verdict = (False, 0.0)
+
+        # Only genuine LLM verdicts are cached, never the fallback below
+        stage_caches.set("verification", cache_key, {**verdicts, response.additional_kwargs["model"]: verdict})
+        return verdict
         
+    except LLMUnavailableError:
+        # No model could be reached: reported as read-only mode, not as an unfaithful answer
+        raise
     except Exception as e:
-        print(f"Faithfulness check failed: {e}. Falling back to optimistic validation.")
-        return True, 0.8 # Fallback to save the query if verification fails
+        logger.error("Faithfulness check failed: %s. Rejecting the unverified answer.", e)
+        return False, 0.0
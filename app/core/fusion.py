@@ -0,0 +1,75 @@
+import math
+from typing import Dict, List
+from llama_index.core.schema import NodeWithScore
+from app.schemas.models import FusionMode
+
+def _rrf(results: List[NodeWithScore], k: int) -> Dict[str, float]:
+    # Scaled so that rank 1 contributes 1.0
+    return {n.node.node_id: (k + 1) / (k + rank) for rank, n in enumerate(results, start=1)}
+
+def _min_max(results: List[NodeWithScore]) -> Dict[str, float]:
+    scores = [n.score or 0.0 for n in results]
+    if not scores:
+        return {}
+    low, high = min(scores), max(scores)
+    if high == low:
+        return {n.node.node_id: 1.0 for n in results}
+    return {n.node.node_id: ((n.score or 0.0) - low) / (high - low) for n in results}
+
+def _z_score(results: List[NodeWithScore]) -> Dict[str, float]:
+    scores = [n.score or 0.0 for n in results]
+    if not scores:
+        return {}
+    mean = sum(scores) / len(scores)
+    std = math.sqrt(sum((s - mean) ** 2 for s in scores) / len(scores))
+    if std == 0:
+        return {n.node.node_id: 0.0 for n in results}
+    return {n.node.node_id: ((n.score or 0.0) - mean) / std for n in results}
+
+def fuse(
+    vector_results: List[NodeWithScore],
+    keyword_results: List[NodeWithScore],
+    mode: FusionMode = FusionMode.RRF,
+    top_k: int = 4,
+    vector_weight: float = 1.0,
+    keyword_weight: float = 1.0,
+    rrf_k: int = 60,
+) -> List[NodeWithScore]:
+    """
+    Fuses the two retriever legs into one ranked list of at most `top_k` nodes.
+    Fused scores are normalized to [0, 1] so confidence scoring can compare them across modes.
+    A node missing from one leg gets that leg's worst normalized score.
+    """
+    legs = [(vector_results, vector_weight), (keyword_results, keyword_weight)]
+    legs = [(results, weight) for results, weight in legs if results and weight > 0]
+    if not legs or top_k <= 0:
+        return []
+
+    if mode == FusionMode.RRF:
+        normalized = [(_rrf(results, rrf_k), 0.0) for results, _ in legs]
+    elif mode == FusionMode.MIN_MAX:
+        normalized = [(_min_max(results), 0.0) for results, _ in legs]
+    elif mode == FusionMode.Z_SCORE:
+        normalized = [(z, min(z.values())) for z in (_z_score(results) for results, _ in legs)]
+    else:
+        raise ValueError(f"Unknown fusion mode: {mode}")
+
+    nodes = {}
+    for results, _ in legs:
+        for n in results:
+            nodes.setdefault(n.node.node_id, n.node)
+
+    total_weight = sum(weight for _, weight in legs)
+    fused = {}
+    for node_id in nodes:
+        score = sum(
+            weight * leg_scores.get(node_id, missing)
+            for (leg_scores, missing), (_, weight) in zip(normalized, legs)
+        ) / total_weight
+        if mode == FusionMode.Z_SCORE:
+            score = 1 / (1 + math.exp(-score))
+        fused[node_id] = score
+
+    # Ties keep first-seen order (vector leg first), matching the previous union
+    ranked = sorted(nodes, key=lambda node_id: -fused[node_id])[:top_k]
+    return [NodeWithScore(node=nodes[node_id], score=fused[node_id]) for node_id in ranked]
@@ -1,24 +1,34 @@
-from typing import List
+from typing import AsyncIterator, List
 from llama_index.core.schema import NodeWithScore
 from app.core.config import config
-from app.core.llm import llm
+from app.core.context import CONTEXT_PREFIX, pack_context
+from app.core.llm import get_llm
+from app.core.stage_cache import stage_caches, content_key, prompt_version
 
-GENERATION_PROMPT = """
-You are a strict regulatory compliance assistant. 
-Use ONLY the provided clauses below to answer the user's question.
+# Clauses first (CONTEXT_PREFIX, shared with verification), instructions after
+GENERATION_PROMPT = CONTEXT_PREFIX + """
+You are a strict regulatory compliance assistant.
+Use ONLY the clauses above to answer the user's question.
 If the clauses do not contain the answer, you MUST state that you do not know.
 DO NOT use any external knowledge.
 DO NOT paraphrase in a way that changes the legal meaning.
 
-CLAUSES:
-{context_str}
-
 QUESTION:
 {question}
 
 ANSWER:
 """
 
+PROMPT_VERSION = prompt_version(GENERATION_PROMPT)
+
+def _cache_key(question: str, nodes: List[NodeWithScore]) -> str:
+    return content_key(
+        question, [n.node.node_id for n in nodes], PROMPT_VERSION, config.LLM_MODEL, config.CONTEXT_TOKEN_BUDGET
+    )
+
+def build_prompt(question: str, nodes: List[NodeWithScore]) -> str:
+    return GENERATION_PROMPT.format(context_str=pack_context(nodes).text, question=question)
+
 async def generate_answer(question: str, nodes: List[NodeWithScore]) -> str:
     """
     Generates an answer constrained strictly to the provided nodes.
@@ -26,12 +36,34 @@ async def generate_answer(question: str, nodes: List[NodeWithScore]) -> str:
     if not nodes:
         return "No information available."
 
-    context_str = "\n\n".join([
-        f"Clause ID: {n.node.metadata.get('clause_id', 'unknown')}\n{n.node.get_content()}" 
-        for n in nodes
-    ])
-    
-    prompt = GENERATION_PROMPT.format(context_str=context_str, question=question)
-    
-    response = await llm.acomplete(prompt)
-    return response.text.strip()
+    cache_key = _cache_key(question, nodes)
+    cached = stage_caches.get("generation", cache_key)
+    if cached is not None:
+        return cached
+
+    response = await get_llm().acomplete(build_prompt(question, nodes))
+    answer = response.text.strip()
+    stage_caches.set("generation", cache_key, answer)
+    return answer
+
+async def stream_answer(question: str, nodes: List[NodeWithScore]) -> AsyncIterator[str]:
+    """
+    Same as `generate_answer`, but yields text deltas as the LLM produces them.
+    A cached answer is yielded in one piece; a completed stream is cached.
+    """
+    if not nodes:
+        yield "No information available."
+        return
+
+    cache_key = _cache_key(question, nodes)
+    cached = stage_caches.get("generation", cache_key)
+    if cached is not None:
+        yield cached
+        return
+
+    parts = []
+    async for chunk in await get_llm().astream_complete(build_prompt(question, nodes)):
+        if chunk.delta:
+            parts.append(chunk.delta)
+            yield chunk.delta
+    stage_caches.set("generation", cache_key, "".join(parts).strip())
@@ -0,0 +1,163 @@
+import re
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+import Stemmer
+from llama_index.core.schema import NodeWithScore
+from app.ingestion.keyword_index import STOP_WORDS
+
+ACCEPT = "accept"
+REJECT = "reject"
+ESCALATE = "escalate"
+
+# A claim is grounded when nearly all of its content terms and most of its term pairs
+# appear in the context, and every number it states appears next to the same words.
+# It is unsupported when most of its terms are missing.
+ACCEPT_COVERAGE = 0.8
+ACCEPT_BIGRAM_COVERAGE = 0.6
+REJECT_COVERAGE = 0.4
+# Claim-to-clause cosine similarity (bge-small); only used when clause embeddings are available
+ACCEPT_SIMILARITY = 0.7
+REJECT_SIMILARITY = 0.55
+
+SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?;])\s+|\n+")
+# Unlike the BM25 tokenizer, single characters are kept so "5 years" and "(b)" survive
+TERM_PATTERN = re.compile(r"(?u)\b\w+\b")
+# Statutes spell numbers out ("thirty days"); answers often don't
+NUMBER_WORDS = {
+    "one": "1", "two": "2", "three": "3", "four": "4", "five": "5", "six": "6", "seven": "7",
+    "eight": "8", "nine": "9", "ten": "10", "eleven": "11", "twelve": "12", "fifteen": "15",
+    "eighteen": "18", "twenty": "20", "thirty": "30", "forty": "40", "fifty": "50",
+    "sixty": "60", "ninety": "90", "hundred": "100",
+}
+# Answer boilerplate ("Yes.", "Based on the provided clauses,") carries no claim to check,
+# and "shall"/"must" state the same obligation ("may" is kept)
+FRAMING_WORDS = frozenset({
+    "yes", "based", "provided", "given", "context", "clauses", "according", "answer",
+    "information", "mentioned", "above", "following", "shall", "must",
+})
+MIN_CLAIM_TERMS = 2
+# Words that negate or limit a claim. They are kept as terms (two of them are BM25 stop
+# words), and a claim whose negations or modal ("shall" vs "may") differ from the context
+# sentence it matches best always goes to the LLM: "is not liable" covers the same terms
+# as "shall be liable".
+NEGATIONS = frozenset({"not", "no", "nor", "never", "without", "except", "unless", "only"})
+MODALS = {"shall": "shall", "must": "shall", "may": "may"}
+CONTRACTIONS = re.compile(r"n't\b|\bcannot\b")
+
+_stemmer = Stemmer.Stemmer("english")
+
+@dataclass
+class GroundingVerdict:
+    decision: str
+    score: float
+    # One entry per claim: text, term and bigram coverage, similarity (or None), unsupported numbers
+    claims: List[Dict] = field(default_factory=list)
+
+def terms(text: str) -> List[str]:
+    """
+    Content terms in order: lowercased, stop and framing words dropped, number words as digits, stemmed.
+    """
+    words = [
+        NUMBER_WORDS.get(word, word) for word in _words(text)
+        if (word not in STOP_WORDS or word in NEGATIONS) and word not in FRAMING_WORDS
+    ]
+    return _stemmer.stemWords(words)
+
+def _words(text: str) -> List[str]:
+    return TERM_PATTERN.findall(CONTRACTIONS.sub(" not", text.lower()))
+
+def polarity(text: str) -> Tuple[frozenset, frozenset]:
+    """
+    (negation words, modals) in `text`; "must" counts as "shall", "can't" as "not".
+    """
+    words = _words(text)
+    return frozenset(w for w in words if w in NEGATIONS), frozenset(MODALS[w] for w in words if w in MODALS)
+
+def _polarity_differs(claim: Tuple[frozenset, frozenset], context: Tuple[frozenset, frozenset]) -> bool:
+    # A claim without a modal ("is liable") restates either; one with a modal must match
+    (claim_negations, claim_modals), (context_negations, context_modals) = claim, context
+    return claim_negations != context_negations or bool(claim_modals and claim_modals != context_modals)
+
+def split_claims(answer: str) -> List[str]:
+    """
+    Sentence-level claims, skipping fragments with too few content terms to check
+    ("Yes.", "Based on the provided clauses:", list markers).
+    """
+    parts = (part.strip(" -*•\t") for part in SENTENCE_BOUNDARY.split(answer))
+    return [part for part in parts if len(set(terms(part))) >= MIN_CLAIM_TERMS]
+
+def _claim_decision(
+    coverage: float, bigram_coverage: float, similarity: Optional[float], missing_numbers: List[str], polarity_mismatch: bool
+) -> str:
+    if coverage < REJECT_COVERAGE and (similarity is None or similarity < REJECT_SIMILARITY):
+        return REJECT
+    if (
+        coverage >= ACCEPT_COVERAGE and bigram_coverage >= ACCEPT_BIGRAM_COVERAGE and not missing_numbers
+        and not polarity_mismatch and (similarity is None or similarity >= ACCEPT_SIMILARITY)
+    ):
+        return ACCEPT
+    return ESCALATE
+
+def check_grounding(
+    answer: str,
+    nodes: List[NodeWithScore],
+    claim_embeddings: Optional[List[List[float]]] = None,
+    node_embeddings: Optional[np.ndarray] = None,
+) -> GroundingVerdict:
+    """
+    Local verdict on whether `answer` is supported by `nodes`: ACCEPT only when every
+    claim is grounded (with the negations and modal of its closest context sentence), REJECT when any claim is clearly unsupported, otherwise ESCALATE
+    to the LLM verifier. `claim_embeddings` (one per `split_claims` entry) and
+    unit-normalized `node_embeddings` add a similarity check when both are given.
+    """
+    claims = split_claims(answer)
+    if not claims or not nodes:
+        return GroundingVerdict(ESCALATE, 0.0)
+    context_terms, context_bigrams = set(), set()
+    # (term set, polarity) per context sentence, to compare each claim with its closest match
+    sentences = []
+    for n in nodes:
+        content = n.node.get_content()
+        node_terms = terms(content)
+        context_terms.update(node_terms)
+        context_bigrams.update(zip(node_terms, node_terms[1:]))
+        sentences.extend((set(terms(part)), polarity(part)) for part in SENTENCE_BOUNDARY.split(content) if part.strip())
+
+    similarities = [None] * len(claims)
+    if claim_embeddings is not None and node_embeddings is not None and len(node_embeddings):
+        matrix = np.asarray(claim_embeddings, dtype=np.float32)
+        matrix /= np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+        similarities = (matrix @ node_embeddings.T).max(axis=1).tolist()
+
+    results, decisions = [], []
+    for claim, similarity in zip(claims, similarities):
+        sequence = terms(claim)
+        bigrams = list(zip(sequence, sequence[1:]))
+        coverage = len(set(sequence) & context_terms) / len(set(sequence))
+        bigram_coverage = sum(b in context_bigrams for b in bigrams) / len(bigrams) if bigrams else 1.0
+        # A number counts as supported only next to a word it also sits next to in the context
+        missing_numbers = sorted({
+            term for i, term in enumerate(sequence) if term.isdigit()
+            and not (i > 0 and bigrams[i - 1] in context_bigrams)
+            and not (i < len(bigrams) and bigrams[i] in context_bigrams)
+        })
+        closest = max(sentences, key=lambda sentence: len(sentence[0] & set(sequence)), default=(set(), polarity("")))
+        polarity_mismatch = _polarity_differs(polarity(claim), closest[1])
+        decisions.append(_claim_decision(coverage, bigram_coverage, similarity, missing_numbers, polarity_mismatch))
+        results.append({
+            "claim": claim,
+            "coverage": round(coverage, 3),
+            "bigram_coverage": round(bigram_coverage, 3),
+            "similarity": None if similarity is None else round(similarity, 3),
+            "missing_numbers": missing_numbers,
+            "polarity_mismatch": polarity_mismatch,
+        })
+
+    # Weakest claim decides the score: one unsupported sentence makes the answer unfaithful
+    score = round(min(r["coverage"] for r in results), 3)
+    if REJECT in decisions:
+        return GroundingVerdict(REJECT, score, results)
+    if all(decision == ACCEPT for decision in decisions):
+        return GroundingVerdict(ACCEPT, score, results)
+    return GroundingVerdict(ESCALATE, score, results)
@@ -1,18 +1,67 @@
-from llama_index.llms.openrouter import OpenRouter
+import threading
 from llama_index.embeddings.huggingface import HuggingFaceEmbedding
 from llama_index.core import Settings
 from app.core.config import config
+from app.core.llm_gateway import LLMGateway
+from app.core.metrics import metrics
+from app.core.ratelimit import ProviderRateLimiter, parse_rates
+
+# Models are created on first use rather than at import, so importing the app stays cheap
+_embed_lock = threading.Lock()
+_embed_model = None
+
+# Shared by every LLM call site so concurrent requests and batches respect provider limits
+llm_rate_limiter = ProviderRateLimiter(
+    config.LLM_RATE_LIMIT_PER_SECOND, config.LLM_RATE_BURST, parse_rates(config.LLM_RATE_LIMITS)
+)
+
+# OpenRouter by default (bypasses direct OpenAI quota issues); connections are opened on first use
+llm_gateway = LLMGateway(
+    api_base=config.LLM_API_BASE,
+    api_key=config.OPENROUTER_API_KEY or config.OPENAI_API_KEY,
+    models=[config.LLM_MODEL, *config.LLM_FALLBACK_MODELS],
+    rate_limiter=llm_rate_limiter,
+    max_concurrency=config.LLM_MAX_CONCURRENCY,
+    max_connections=config.LLM_MAX_CONNECTIONS,
+    timeout=config.LLM_TIMEOUT_SECONDS,
+    max_retries=config.LLM_MAX_RETRIES,
+    backoff_base=config.LLM_BACKOFF_SECONDS,
+    hedge_after=config.LLM_HEDGE_AFTER_SECONDS,
+    max_tokens=config.LLM_MAX_TOKENS,
+)
+
+def _gateway_metrics():
+    models = llm_gateway.snapshot()
+    yield "rag_llm_requests_total", "counter", "LLM attempts per model.", [
+        ({"model": model}, stats["requests"]) for model, stats in models.items()
+    ]
+    yield "rag_llm_errors_total", "counter", "Failed LLM attempts per model and error kind.", [
+        ({"model": model, "kind": kind}, count) for model, stats in models.items() for kind, count in stats["errors"].items()
+    ]
+    yield "rag_llm_tokens_total", "counter", "LLM tokens used per model and type.", [
+        ({"model": model, "type": kind}, stats[f"{kind}_tokens"]) for model, stats in models.items() for kind in ("prompt", "completion")
+    ]
+    yield "rag_llm_fallbacks_total", "counter", "Calls moved to this model after the previous one failed.", [
+        ({"model": model}, stats["fallbacks"]) for model, stats in models.items()
+    ]
+
+metrics.register_collector(_gateway_metrics)
+
+def get_llm() -> LLMGateway:
+    return llm_gateway
+
+def get_embed_model():
+    global _embed_model
+    with _embed_lock:
+        if _embed_model is None:
+            # Use Local HuggingFace for Embeddings to bypass OpenAI Quota issues
+            _embed_model = HuggingFaceEmbedding(
+                model_name=config.EMBED_MODEL,
+                embed_batch_size=config.INGEST_EMBED_BATCH_SIZE
+            )
+            Settings.embed_model = _embed_model
+    return _embed_model
 
 def setup_settings():
-    # Use OpenRouter for Generation to bypass direct OpenAI quota issues
-    Settings.llm = OpenRouter(
-        api_key=config.OPENROUTER_API_KEY,
-        model="openai/gpt-4o-mini"
-    )
-    # Use Local HuggingFace for Embeddings to bypass OpenAI Quota issues
-    Settings.embed_model = HuggingFaceEmbedding(
-        model_name="BAAI/bge-small-en-v1.5"
-    )
-    return Settings.llm
-
-llm = setup_settings()
+    get_embed_model()
+    return get_llm()
@@ -0,0 +1,332 @@
+import asyncio
+import json
+import random
+import threading
+import time
+from collections import Counter, deque
+from contextlib import aclosing
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Dict, List, Optional, Set
+import httpx
+from llama_index.core.llms import CompletionResponse
+from app.core.ratelimit import ProviderRateLimiter
+
+# Worth retrying (same model after a backoff, then the next model); anything else moves straight on
+RETRYABLE_STATUS = {408, 409, 425, 429, 500, 502, 503, 504}
+
+class LLMUnavailableError(Exception):
+    """
+    No configured model produced a completion: every model was rate limited, over quota,
+    erroring or unreachable after retries.
+    """
+
+class _AttemptError(Exception):
+    def __init__(self, kind: str, message: str, retryable: bool, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.kind = kind
+        self.retryable = retryable
+        self.retry_after = retry_after
+
+@dataclass
+class ModelStats:
+    requests: int = 0
+    successes: int = 0
+    retries: int = 0
+    hedges: int = 0
+    fallbacks: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    # Error kind ("429", "5xx", "timeout", "connection", ...) -> count
+    errors: Counter = field(default_factory=Counter)
+    # Seconds per successful attempt, last 1000 only
+    latencies: deque = field(default_factory=lambda: deque(maxlen=1000))
+
+    def snapshot(self) -> dict:
+        latencies = sorted(self.latencies)
+        def percentile(p):
+            return round(latencies[min(len(latencies) - 1, int(p * len(latencies)))] * 1000, 1) if latencies else None
+        return {
+            "requests": self.requests,
+            "successes": self.successes,
+            "retries": self.retries,
+            "hedges": self.hedges,
+            "fallbacks": self.fallbacks,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "errors": dict(self.errors),
+            "latency_ms": {"p50": percentile(0.5), "p95": percentile(0.95), "p99": percentile(0.99)},
+        }
+
+class LLMGateway:
+    """
+    OpenAI-compatible chat completions client shared by every LLM call site.
+
+    - One pooled httpx client (keep-alive connections) per event loop
+    - A global concurrency limit plus a token bucket per provider
+    - Retries with full-jitter exponential backoff (honouring Retry-After), then the next model in `models`
+    - Hedging: a request still running after `hedge_after` seconds is raced against a second one
+    - Per-model request, error, retry, hedge, fallback, token and latency counters
+
+    `acomplete` / `astream_complete` mirror the LlamaIndex LLM methods the pipeline uses;
+    the model that served a response is in its `additional_kwargs["model"]`.
+    Raises `LLMUnavailableError` once every model has failed.
+    """
+    def __init__(
+        self,
+        api_base: str,
+        api_key: Optional[str],
+        models: List[str],
+        rate_limiter: ProviderRateLimiter,
+        max_concurrency: int = 16,
+        max_connections: int = 32,
+        timeout: float = 30.0,
+        max_retries: int = 2,
+        backoff_base: float = 0.5,
+        backoff_max: float = 8.0,
+        hedge_after: float = 0.0,
+        temperature: float = 0.1,
+        max_tokens: int = 256,
+    ):
+        self.api_base = api_base.rstrip("/")
+        self.api_key = api_key
+        self.models = models
+        self.rate_limiter = rate_limiter
+        self.max_concurrency = max_concurrency
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.hedge_after = hedge_after
+        self.temperature = temperature
+        self.max_tokens = max_tokens
+        self.stats: Dict[str, ModelStats] = {model: ModelStats() for model in models}
+        self.lock = threading.Lock()
+        # httpx clients and asyncio semaphores are tied to the loop they were first used on
+        self._loop = None
+        self._client: Optional[httpx.AsyncClient] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._closing: Set[asyncio.Task] = set()
+
+    def _resources(self) -> tuple[httpx.AsyncClient, asyncio.Semaphore]:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._client is None:
+            if self._client is not None:
+                self._retire(self._client, self._loop)
+            self._loop = loop
+            self._client = httpx.AsyncClient(
+                base_url=self.api_base,
+                headers={"Authorization": f"Bearer {self.api_key}"} if self.api_key else {},
+                timeout=self.timeout,
+                limits=httpx.Limits(max_connections=self.max_connections, max_keepalive_connections=self.max_connections),
+            )
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._client, self._semaphore
+
+    def _retire(self, client: httpx.AsyncClient, loop: asyncio.AbstractEventLoop):
+        """
+        Closes a client left behind on a previous event loop: on that loop if it is still
+        running (in another thread), otherwise in the background on the current one.
+        """
+        if loop.is_running():
+            asyncio.run_coroutine_threadsafe(client.aclose(), loop)
+            return
+        task = asyncio.get_running_loop().create_task(client.aclose())
+        self._closing.add(task)
+        # Connections of a closed loop may fail to shut down cleanly; the pool is released either way
+        task.add_done_callback(lambda t: self._closing.discard(t) or t.cancelled() or t.exception())
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def _model_stats(self, model: str) -> ModelStats:
+        with self.lock:
+            return self.stats.setdefault(model, ModelStats())
+
+    def snapshot(self) -> dict:
+        with self.lock:
+            return {model: stats.snapshot() for model, stats in self.stats.items()}
+
+    def _payload(self, model: str, prompt: str, stream: bool) -> dict:
+        return {
+            "model": model,
+            "messages": [{"role": "user", "content": prompt}],
+            "temperature": self.temperature,
+            "max_tokens": self.max_tokens,
+            "stream": stream,
+        }
+
+    def _backoff(self, attempt: int, retry_after: Optional[float]) -> float:
+        if retry_after is not None:
+            return min(retry_after, self.backoff_max)
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    @staticmethod
+    def _status_error(response: httpx.Response) -> _AttemptError:
+        status = response.status_code
+        retry_after = None
+        try:
+            retry_after = float(response.headers["retry-after"])
+        except (KeyError, ValueError):
+            pass
+        kind = "5xx" if status >= 500 else str(status)
+        return _AttemptError(kind, f"HTTP {status}", status in RETRYABLE_STATUS, retry_after)
+
+    async def _attempt(self, model: str, prompt: str) -> str:
+        """
+        One HTTP request, under the concurrency limit and the provider's rate limit.
+        """
+        client, semaphore = self._resources()
+        stats = self._model_stats(model)
+        async with semaphore:
+            await self.rate_limiter.acquire(model)
+            stats.requests += 1
+            start = time.perf_counter()
+            try:
+                response = await client.post("/chat/completions", json=self._payload(model, prompt, stream=False))
+            except httpx.TimeoutException as e:
+                raise _AttemptError("timeout", f"timeout: {e}", retryable=True)
+            except httpx.TransportError as e:
+                raise _AttemptError("connection", f"connection error: {e}", retryable=True)
+        if response.status_code != 200:
+            raise self._status_error(response)
+        try:
+            body = response.json()
+            error = body.get("error")
+            content = None if error else body["choices"][0]["message"]["content"]
+            usage = body.get("usage") or {}
+        except (ValueError, KeyError, IndexError, TypeError, AttributeError) as e:
+            raise _AttemptError("bad_response", f"malformed response: {e!r}", retryable=True)
+        if error:
+            # OpenRouter reports some upstream failures (quota, provider errors) in a 200 body
+            code = error.get("code") if isinstance(error, dict) else None
+            raise _AttemptError(str(code or "error"), f"provider error: {error}", retryable=True)
+        stats.successes += 1
+        stats.latencies.append(time.perf_counter() - start)
+        stats.prompt_tokens += usage.get("prompt_tokens", 0)
+        stats.completion_tokens += usage.get("completion_tokens", 0)
+        return content or ""
+
+    async def _hedged(self, model: str, prompt: str) -> str:
+        """
+        `_attempt`, plus a second identical request if the first is slower than `hedge_after`;
+        whichever succeeds first wins and the other is cancelled.
+        """
+        if self.hedge_after <= 0:
+            return await self._attempt(model, prompt)
+        tasks = {asyncio.create_task(self._attempt(model, prompt))}
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=self.hedge_after)
+            if not done:
+                self._model_stats(model).hedges += 1
+                tasks.add(asyncio.create_task(self._attempt(model, prompt)))
+            error = None
+            while tasks:
+                done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def _complete_text(self, prompt: str) -> tuple[str, str]:
+        """
+        Returns the completion and the model that produced it.
+        """
+        errors = []
+        for position, model in enumerate(self.models):
+            stats = self._model_stats(model)
+            if position:
+                stats.fallbacks += 1
+            for attempt in range(self.max_retries + 1):
+                try:
+                    return await self._hedged(model, prompt), model
+                except _AttemptError as e:
+                    stats.errors[e.kind] += 1
+                    errors.append(f"{model}: {e}")
+                    if not e.retryable or attempt == self.max_retries:
+                        break
+                    stats.retries += 1
+                    await asyncio.sleep(self._backoff(attempt, e.retry_after))
+        raise LLMUnavailableError("; ".join(errors) or "no LLM models configured")
+
+    async def acomplete(self, prompt: str, **kwargs) -> CompletionResponse:
+        text, model = await self._complete_text(prompt)
+        return CompletionResponse(text=text, additional_kwargs={"model": model})
+
+    async def astream_complete(self, prompt: str, **kwargs) -> AsyncIterator[CompletionResponse]:
+        return self._stream(prompt)
+
+    async def _stream(self, prompt: str) -> AsyncIterator[CompletionResponse]:
+        """
+        Streams deltas from the first model that answers. Retries and fallbacks only
+        happen before the first token: a half-streamed answer cannot be resumed.
+        """
+        errors = []
+        for position, model in enumerate(self.models):
+            stats = self._model_stats(model)
+            if position:
+                stats.fallbacks += 1
+            for attempt in range(self.max_retries + 1):
+                text = ""
+                try:
+                    # Closed promptly if the caller stops reading, releasing the concurrency slot
+                    async with aclosing(self._stream_attempt(model, prompt)) as deltas:
+                        async for delta in deltas:
+                            text += delta
+                            yield CompletionResponse(text=text, delta=delta, additional_kwargs={"model": model})
+                    return
+                except _AttemptError as e:
+                    stats.errors[e.kind] += 1
+                    errors.append(f"{model}: {e}")
+                    if text:
+                        raise LLMUnavailableError(f"stream interrupted: {e}") from e
+                    if not e.retryable or attempt == self.max_retries:
+                        break
+                    stats.retries += 1
+                    await asyncio.sleep(self._backoff(attempt, e.retry_after))
+        raise LLMUnavailableError("; ".join(errors) or "no LLM models configured")
+
+    async def _stream_attempt(self, model: str, prompt: str) -> AsyncIterator[str]:
+        client, semaphore = self._resources()
+        stats = self._model_stats(model)
+        async with semaphore:
+            await self.rate_limiter.acquire(model)
+            stats.requests += 1
+            start = time.perf_counter()
+            try:
+                async with client.stream("POST", "/chat/completions", json=self._payload(model, prompt, stream=True)) as response:
+                    if response.status_code != 200:
+                        await response.aread()
+                        raise self._status_error(response)
+                    events = 0
+                    async for line in response.aiter_lines():
+                        if not line.startswith("data:"):
+                            continue
+                        events += 1
+                        data = line[len("data:"):].strip()
+                        if data == "[DONE]":
+                            break
+                        try:
+                            chunk = json.loads(data)
+                            error = chunk.get("error")
+                            delta = None if error else (chunk.get("choices") or [{}])[0].get("delta", {}).get("content")
+                        except (ValueError, IndexError, AttributeError) as e:
+                            raise _AttemptError("bad_response", f"malformed stream chunk: {e!r}", retryable=True)
+                        if error:
+                            raise _AttemptError("error", f"provider error: {error}", retryable=True)
+                        if delta:
+                            yield delta
+                    if not events:
+                        raise _AttemptError("bad_response", "malformed stream: no events", retryable=True)
+            except httpx.TimeoutException as e:
+                raise _AttemptError("timeout", f"timeout: {e}", retryable=True)
+            except httpx.TransportError as e:
+                raise _AttemptError("connection", f"connection error: {e}", retryable=True)
+        stats.successes += 1
+        stats.latencies.append(time.perf_counter() - start)
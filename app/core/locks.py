@@ -0,0 +1,86 @@
+import asyncio
+import os
+import threading
+from typing import Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-process deployments only
+    fcntl = None
+
+class FileLock:
+    """
+    Cross-process exclusive lock on a sidecar file, so several uvicorn workers never
+    write the same files at once. Also excludes other threads of the same process,
+    since each holder opens the file itself.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self.fd = None
+
+    def __enter__(self):
+        self.fd = os.open(self.path, os.O_CREAT | os.O_RDWR, 0o644)
+        if fcntl:
+            fcntl.flock(self.fd, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        if fcntl:
+            fcntl.flock(self.fd, fcntl.LOCK_UN)
+        os.close(self.fd)
+
+class ReadySignal:
+    """
+    A threading.Event that event loops can await without parking an executor thread
+    per waiter: `set()` from the loading thread resolves each waiter's future through
+    its loop's `call_soon_threadsafe`.
+    """
+    def __init__(self):
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._waiters = []
+
+    def is_set(self) -> bool:
+        return self._event.is_set()
+
+    def clear(self):
+        self._event.clear()
+
+    def set(self):
+        with self._lock:
+            self._event.set()
+            waiters, self._waiters = self._waiters, []
+        for loop, future in waiters:
+            try:
+                loop.call_soon_threadsafe(_resolve, future)
+            except RuntimeError:  # that loop has closed
+                pass
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        return self._event.wait(timeout)
+
+    async def wait_async(self, timeout: Optional[float] = None) -> bool:
+        """
+        Waits up to `timeout` seconds; returns whether the signal is set.
+        """
+        if self._event.is_set():
+            return True
+        loop = asyncio.get_running_loop()
+        waiter = (loop, loop.create_future())
+        with self._lock:
+            if self._event.is_set():
+                return True
+            self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(waiter[1], timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            with self._lock:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+        return self._event.is_set()
+
+def _resolve(future: asyncio.Future):
+    if not future.done():
+        future.set_result(True)
@@ -0,0 +1,394 @@
+import asyncio
+import json
+import logging
+import uuid
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional, Union
+from app.core.abstention import FAITHFULNESS_REJECTED, QUOTA_EXCEEDED, should_abstain, generate_abstain_response
+from app.core.audit_logger import log_query
+from app.core.cache import query_cache
+from app.core.confidence import ConfidenceAssessment, assess_confidence
+from app.core.config import config
+from app.core.faithfulness import verify_faithfulness
+from app.core.generation import generate_answer
+from app.core.llm_gateway import LLMUnavailableError
+from app.core.metrics import CACHE_LOOKUPS, start_trace, timed
+from app.core.retrieval import RetrievalResult, hybrid_retrieve, hybrid_retrieve_batch
+from app.core.semantic_cache import SemanticCache, semantic_cache, embed_question, embed_questions
+from app.core.singleflight import SingleFlight
+from app.ingestion.index import ingestion_manager
+from app.schemas.models import QueryRequest, AnswerResponse, AbstainResponse, Jurisdiction, RetrievalNode, Outcome
+
+logger = logging.getLogger(__name__)
+
+QueryResponse = Union[AnswerResponse, AbstainResponse]
+
+# Uncached questions being answered right now; duplicates await the running answer
+query_flights = SingleFlight(timeout=config.COALESCE_TIMEOUT_SECONDS)
+# Their embeddings, so near-duplicate phrasings can join too (keys removed when answered)
+in_flight_questions = SemanticCache(
+    threshold=config.SEMANTIC_CACHE_THRESHOLD,
+    max_entries=config.SEMANTIC_CACHE_MAX_ENTRIES,
+)
+
+# Index version the semantic cache's namespaces were last checked against
+_namespace_version = None
+
+RETRIEVAL_OPTIONS = ("top_k", "candidate_pool", "fusion_mode", "vector_weight", "keyword_weight")
+
+def retrieval_options(request: QueryRequest) -> dict:
+    # The jurisdiction picks the index partitions to search
+    options = {name: getattr(request, name) for name in RETRIEVAL_OPTIONS}
+    options["jurisdiction"] = request.jurisdiction.value
+    return options
+
+def cache_namespace(request: QueryRequest) -> str:
+    # Requests overriding retrieval options get their own entries
+    values = {name: getattr(request, name) for name in RETRIEVAL_OPTIONS}
+    overrides = [f"{name}={getattr(value, 'value', value)}" for name, value in values.items() if value is not None]
+    # Keyed on the searched partitions' version so answers from a previous index are never served
+    jurisdiction = request.jurisdiction.value
+    namespace = f"{ingestion_manager.version_for(ingestion_manager.route(jurisdiction))}:{jurisdiction}"
+    return f"{namespace}[{','.join(overrides)}]" if overrides else namespace
+
+async def load_partitions(requests: List[QueryRequest]):
+    """
+    Loads the partitions `requests` are routed to before any cache lookup, so their
+    cache keys carry the loaded index version.
+    """
+    partitions = sorted({p for request in requests for p in ingestion_manager.route(request.jurisdiction.value)})
+    await ingestion_manager.wait_partitions(partitions, config.INDEX_READY_TIMEOUT_SECONDS)
+
+def cache_key(request: QueryRequest) -> str:
+    return f"{cache_namespace(request)}:{request.question.strip().lower()}"
+
+def grounding_nodes(nodes) -> List[RetrievalNode]:
+    return [
+        RetrievalNode(
+            id=n.node.node_id,
+            text=n.node.get_content(),
+            score=n.score or 0.0,
+            metadata=n.node.metadata
+        ) for n in nodes
+    ]
+
+def semantic_hit(request: QueryRequest, key: str, namespace: str, query_embedding) -> Optional[QueryResponse]:
+    """
+    Cached answer to a near-duplicate of `request`. Audited as a request of its own, with
+    the similarity and the query_id of the answer it reused.
+    """
+    with timed("cache"):
+        hit = semantic_cache.lookup(namespace, query_embedding)
+        cached_response = query_cache.get(hit[0]) if hit else None
+    if not hit:
+        return None
+    similar_key, similarity = hit
+    if cached_response:
+        CACHE_LOOKUPS.inc(result="semantic_hit")
+        logger.info("Semantic cache hit (%.3f): %s -> %s", similarity, key, similar_key)
+        log_query(
+            str(uuid.uuid4()), request.question, request.jurisdiction,
+            cached_response.outcome, cached_response.confidence,
+            cache_similarity=similarity, cached_query_id=cached_response.query_id
+        )
+        return cached_response
+    # The answer expired from the response cache; forget the stale pointer
+    semantic_cache.remove(namespace, similar_key)
+    return None
+
+async def cached_response(request: QueryRequest, key: str, namespace: str):
+    """
+    Exact, then semantic cache lookup. Returns (cached response or None, question embedding or None).
+    """
+    with timed("cache"):
+        response = query_cache.get(key)
+    if response:
+        CACHE_LOOKUPS.inc(result="exact_hit")
+        logger.info("Cache hit: %s", key)
+        return response, None
+
+    # Embedded up front whenever there is a vector index: the semantic cache, the vector
+    # retriever and confidence scoring all reuse this one embedding
+    query_embedding = None
+    if config.SEMANTIC_CACHE_ENABLED or ingestion_manager.has_vectors:
+        try:
+            with timed("embedding"):
+                query_embedding = await asyncio.to_thread(embed_question, request.question)
+        except Exception as e:
+            logger.warning("Query embedding failed, skipping semantic cache: %s", e)
+    if query_embedding is not None and config.SEMANTIC_CACHE_ENABLED:
+        response = semantic_hit(request, key, namespace, query_embedding)
+        if response:
+            return response, query_embedding
+    CACHE_LOOKUPS.inc(result="miss")
+    return None, query_embedding
+
+def drop_stale_namespaces():
+    """
+    Once the index version changes, semantic cache namespaces keyed on the previous one
+    can never be looked up again; they are dropped instead of waiting to age out.
+    """
+    global _namespace_version
+    version = ingestion_manager.version
+    if version == _namespace_version:
+        return
+    _namespace_version = version
+    current = {ingestion_manager.version_for(ingestion_manager.route(j.value)) for j in Jurisdiction}
+    semantic_cache.retain(lambda namespace: namespace.split(":", 1)[0] in current)
+
+def cache_response(key: str, namespace: str, response: AnswerResponse, query_embedding):
+    query_cache.set(key, response)
+    if query_embedding is not None:
+        drop_stale_namespaces()
+        semantic_cache.add(namespace, key, query_embedding)
+
+def assess_retrieval(request: QueryRequest, retrieval: RetrievalResult, query_embedding=None) -> ConfidenceAssessment:
+    """
+    Confidence from features of the retrieval we already have: the query embedding,
+    the nodes' stored embeddings and the searched partitions' per-node term sets.
+    Scored on the clause-level hits, which are what the indexes hold.
+    """
+    clauses = retrieval.clauses or retrieval.nodes
+    with timed("confidence"):
+        node_embeddings = None
+        if query_embedding is not None:
+            node_embeddings = ingestion_manager.node_embeddings([n.node.node_id for n in clauses], retrieval.partitions)
+        return assess_confidence(
+            request.question, clauses, retrieval.vector_results, retrieval.keyword_results,
+            query_embedding=query_embedding,
+            node_embeddings=node_embeddings,
+            keyword_index=ingestion_manager.keyword_indexes(retrieval.partitions),
+        )
+
+async def answer_query(
+    request: QueryRequest,
+    retrieval: RetrievalResult,
+    key: str,
+    namespace: str,
+    query_embedding=None,
+) -> QueryResponse:
+    """
+    Everything after retrieval: confidence, abstention, generation, verification,
+    audit logging and caching.
+    """
+    query_id = str(uuid.uuid4())
+    nodes = retrieval.nodes
+
+    # 2. Confidence Scoring
+    confidence = assess_retrieval(request, retrieval, query_embedding).level
+
+    # 3. Abstention Gate
+    abstain, reason = should_abstain(confidence, len(nodes))
+    if abstain:
+        log_query(query_id, request.question, request.jurisdiction, Outcome.ABSTAINED, confidence)
+        return generate_abstain_response(query_id, reason)
+
+    # 4. Generation & 5. Verification
+    try:
+        # 4. Generation
+        with timed("generation"):
+            answer = await generate_answer(request.question, nodes)
+
+        # 5. Faithfulness Verification
+        with timed("verification"):
+            is_faithful, faith_score = await verify_faithfulness(answer, nodes)
+        if not is_faithful:
+            log_query(query_id, request.question, request.jurisdiction, Outcome.ABSTAINED, confidence)
+            return generate_abstain_response(query_id, FAITHFULNESS_REJECTED, confidence)
+    except LLMUnavailableError as e:
+        logger.warning("LLM unavailable (%s): %s", query_id, e)
+        log_query(query_id, request.question, request.jurisdiction, Outcome.ERROR, confidence)
+        return generate_abstain_response(query_id, QUOTA_EXCEEDED, confidence)
+
+    # 6. Audit Logging
+    log_query(query_id, request.question, request.jurisdiction, Outcome.ANSWERED, confidence)
+
+    response = AnswerResponse(
+        query_id=query_id,
+        answer=answer,
+        confidence=confidence,
+        grounding_nodes=grounding_nodes(nodes),
+        faithfulness_score=faith_score
+    )
+
+    # Save to Cache
+    cache_response(key, namespace, response, query_embedding)
+    return response
+
+async def coalesced(
+    request: QueryRequest,
+    key: str,
+    namespace: str,
+    query_embedding,
+    work: Callable[[], Awaitable[QueryResponse]],
+) -> QueryResponse:
+    """
+    Runs `work` (answering an uncached request) once for concurrent requests with the
+    same cache key, or for a near-duplicate of a question being answered right now.
+    Duplicates get the same response, abstention or exception. A near-duplicate is
+    audited under its own query_id with its similarity, like a semantic cache hit.
+    """
+    if not config.COALESCE_ENABLED:
+        return await work()
+    semantic = query_embedding is not None and config.SEMANTIC_CACHE_ENABLED
+    similar = None
+    if semantic:
+        hit = in_flight_questions.lookup(namespace, query_embedding)
+        if hit and not query_flights.running(key) and query_flights.running(hit[0]):
+            similar = hit
+
+    # Registered before the flight's task first runs, so a near-duplicate arriving meanwhile finds it
+    registered = semantic and similar is None and not query_flights.running(key)
+    if registered:
+        in_flight_questions.add(namespace, key, query_embedding)
+    led = False
+
+    async def lead():
+        nonlocal led
+        led = True
+        return await work()
+
+    try:
+        response = await query_flights.do(key, lead, similar[0] if similar else None)
+    finally:
+        if registered:
+            in_flight_questions.remove(namespace, key)
+    if similar and not led:
+        logger.info("Coalesced with in-flight near-duplicate (%.3f): %s -> %s", similar[1], key, similar[0])
+        log_query(
+            str(uuid.uuid4()), request.question, request.jurisdiction,
+            response.outcome, response.confidence,
+            cache_similarity=similar[1], cached_query_id=response.query_id
+        )
+    return response
+
+async def run_query(request: QueryRequest) -> QueryResponse:
+    start_trace()
+    # 0. Cache Check (exact key, then near-duplicate phrasing of an answered question)
+    await load_partitions([request])
+    key = cache_key(request)
+    namespace = cache_namespace(request)
+    response, query_embedding = await cached_response(request, key, namespace)
+    if response:
+        return response
+
+    async def work():
+        # A duplicate may have finished between the lookup above and this flight starting
+        response = query_cache.get(key)
+        if response:
+            return response
+        # 1. Retrieval (one pass; per-retriever hits are kept for confidence scoring)
+        retrieval = await hybrid_retrieve(
+            request.question, **retrieval_options(request), query_embedding=query_embedding
+        )
+        return await answer_query(request, retrieval, key, namespace, query_embedding)
+
+    return await coalesced(request, key, namespace, query_embedding, work)
+
+async def run_batch(
+    requests: List[QueryRequest],
+    concurrency: Optional[int] = None,
+) -> AsyncIterator[tuple[List[int], Union[QueryResponse, Exception]]]:
+    """
+    Answers many requests, yielding (indices into `requests`, response or exception)
+    in completion order. Identical requests run once; cache hits come back first.
+    Uncached questions are embedded in one pass and retrieved in one vectorized pass
+    per distinct set of retrieval options; generation and verification then run with
+    at most `concurrency` questions in flight (LLM calls are also rate limited per provider).
+    """
+    # Identical questions (same cache key) are answered once
+    await load_partitions(requests)
+    groups: Dict[str, tuple[QueryRequest, List[int]]] = {}
+    for i, request in enumerate(requests):
+        groups.setdefault(cache_key(request), (request, []))[1].append(i)
+
+    # 0. Exact cache hits
+    pending = []
+    for key, (request, indices) in groups.items():
+        response = query_cache.get(key)
+        if response:
+            CACHE_LOOKUPS.inc(result="exact_hit")
+            yield indices, response
+        else:
+            pending.append(key)
+    if not pending:
+        return
+
+    # 0b. One embedding pass for every remaining question, then semantic cache hits
+    embeddings = [None] * len(pending)
+    try:
+        with timed("embedding"):
+            embeddings = await asyncio.to_thread(embed_questions, [groups[key][0].question for key in pending])
+    except Exception as e:
+        logger.warning("Batch embedding failed, retrieving one question at a time: %s", e)
+
+    misses = []
+    for key, embedding in zip(pending, embeddings):
+        request, indices = groups[key]
+        if embedding is not None and config.SEMANTIC_CACHE_ENABLED:
+            response = semantic_hit(request, key, cache_namespace(request), embedding)
+            if response:
+                yield indices, response
+                continue
+        CACHE_LOOKUPS.inc(result="miss")
+        misses.append((key, embedding))
+
+    # 1. Retrieval, vectorized across questions that share retrieval options
+    retrievals: Dict[str, RetrievalResult] = {}
+    by_options: Dict[tuple, List[tuple[str, list]]] = {}
+    for key, embedding in misses:
+        options = retrieval_options(groups[key][0])
+        by_options.setdefault(tuple(options.items()), []).append((key, embedding))
+    for options, items in by_options.items():
+        if all(embedding is not None for _, embedding in items):
+            results = await hybrid_retrieve_batch(
+                [groups[key][0].question for key, _ in items],
+                [embedding for _, embedding in items],
+                **dict(options),
+            )
+        else:
+            results = [
+                await hybrid_retrieve(groups[key][0].question, **dict(options), query_embedding=embedding)
+                for key, embedding in items
+            ]
+        retrievals.update({key: result for (key, _), result in zip(items, results)})
+
+    # 2-6. Generation and verification fan out under a concurrency limit
+    semaphore = asyncio.Semaphore(concurrency or config.BATCH_CONCURRENCY)
+
+    async def answer(key: str, embedding):
+        request, indices = groups[key]
+        async with semaphore:
+            # Per-question trace from here on; embedding and retrieval ran for the whole batch
+            start_trace()
+            namespace = cache_namespace(request)
+            try:
+                # Exact duplicates only: near-duplicates within a batch are still answered separately
+                response = await coalesced(
+                    request, key, namespace, None,
+                    lambda: answer_query(request, retrievals[key], key, namespace, embedding),
+                )
+            except Exception as e:
+                return indices, e
+        return indices, response
+
+    tasks = [asyncio.create_task(answer(key, embedding)) for key, embedding in misses]
+    try:
+        for finished in asyncio.as_completed(tasks):
+            yield await finished
+    finally:
+        # Client went away: stop generating answers nobody will read
+        for task in tasks:
+            task.cancel()
+
+async def run_batch_ndjson(requests: List[QueryRequest], concurrency: Optional[int] = None) -> AsyncIterator[str]:
+    """
+    `run_batch` as NDJSON lines, one per input request:
+    {"index": i, "response": {...}} or {"index": i, "error": "..."}.
+    """
+    async for indices, result in run_batch(requests, concurrency):
+        for index in indices:
+            if isinstance(result, Exception):
+                line = {"index": index, "error": str(result)}
+            else:
+                line = {"index": index, "response": result.model_dump(mode="json")}
+            yield json.dumps(line) + "\n"
@@ -0,0 +1,72 @@
+import asyncio
+import threading
+import time
+from typing import Dict
+
+class TokenBucket:
+    """
+    Allows `rate` acquisitions per second on average with bursts up to `capacity`.
+    `acquire` sleeps until a token is available instead of failing.
+    """
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _reserve(self) -> float:
+        """
+        Takes a token (possibly going into debt) and returns how long to wait before using it.
+        """
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    async def acquire(self):
+        if self.rate <= 0:
+            return
+        wait = self._reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+class ProviderRateLimiter:
+    """
+    One token bucket per LLM provider ("openai/gpt-4o-mini" -> "openai"), so a batch
+    cannot exceed any single provider's request rate. Per-provider rates override the default.
+    """
+    def __init__(self, default_rate: float, burst: float, rates: Dict[str, float] = None):
+        self.default_rate = default_rate
+        self.burst = burst
+        self.rates = rates or {}
+        self.buckets: Dict[str, TokenBucket] = {}
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def provider(model: str) -> str:
+        return model.split("/", 1)[0] if "/" in model else model
+
+    def bucket(self, model: str) -> TokenBucket:
+        provider = self.provider(model)
+        with self.lock:
+            if provider not in self.buckets:
+                rate = self.rates.get(provider, self.default_rate)
+                self.buckets[provider] = TokenBucket(rate, max(self.burst, 1))
+            return self.buckets[provider]
+
+    async def acquire(self, model: str):
+        await self.bucket(model).acquire()
+
+def parse_rates(spec: str) -> Dict[str, float]:
+    """
+    "openai=5,anthropic=2" -> {"openai": 5.0, "anthropic": 2.0}
+    """
+    rates = {}
+    for item in spec.split(","):
+        if "=" in item:
+            provider, rate = item.split("=", 1)
+            rates[provider.strip()] = float(rate)
+    return rates
@@ -1,29 +1,218 @@
-from typing import List
-from llama_index.core.schema import NodeWithScore
+import asyncio
+import time
+from dataclasses import dataclass, field, replace
+from typing import Dict, List, Optional
+from llama_index.core.schema import NodeWithScore, QueryBundle
+from app.core.config import config
+from app.core.fusion import fuse
+from app.core.metrics import observe_stage
+from app.core.stage_cache import stage_caches, content_key
 from app.ingestion.index import ingestion_manager
+from app.schemas.models import FusionMode
 
-async def hybrid_retrieve(query: str) -> List[NodeWithScore]:
+@dataclass
+class RetrievalResult:
     """
-    Retreives nodes from both vector and keyword retrievers and merges them.
-    Explicitly handles empty indices by returning an empty list.
+    Output of one hybrid retrieval pass: the merged list plus each leg's own hits,
+    so downstream scoring never has to re-run the retrievers. `nodes` is what the
+    prompt gets (sibling clauses expanded to their parent rule); `clauses` are the
+    fused clause-level hits before expansion, which confidence scoring uses.
+    `partitions` are the index partitions that were searched.
     """
-    vector_retriever = ingestion_manager.get_vector_retriever()
-    keyword_retriever = ingestion_manager.get_keyword_retriever()
+    nodes: List[NodeWithScore] = field(default_factory=list)
+    clauses: List[NodeWithScore] = field(default_factory=list)
+    vector_results: List[NodeWithScore] = field(default_factory=list)
+    keyword_results: List[NodeWithScore] = field(default_factory=list)
+    partitions: List[str] = field(default_factory=list)
+    timings: Dict[str, float] = field(default_factory=dict)  # milliseconds per leg
+
+async def _timed_retrieve(retriever, query: QueryBundle) -> tuple[List[NodeWithScore], float]:
+    if not retriever:
+        return [], 0.0
+    start = time.perf_counter()
+    # Retrievers are synchronous (embedding + scoring); keep them off the event loop
+    results = await asyncio.to_thread(retriever.retrieve, query)
+    return results, (time.perf_counter() - start) * 1000
+
+def _resolve_options(
+    top_k: Optional[int] = None,
+    candidate_pool: Optional[int] = None,
+    fusion_mode: Optional[FusionMode] = None,
+    vector_weight: Optional[float] = None,
+    keyword_weight: Optional[float] = None,
+) -> dict:
+    return {
+        "top_k": top_k or config.RETRIEVAL_TOP_K,
+        "candidate_pool": candidate_pool or config.CANDIDATE_POOL,
+        "fusion_mode": fusion_mode or FusionMode(config.FUSION_MODE),
+        "vector_weight": config.VECTOR_WEIGHT if vector_weight is None else vector_weight,
+        "keyword_weight": config.KEYWORD_WEIGHT if keyword_weight is None else keyword_weight,
+    }
+
+def _cache_key(query: str, options: dict, partitions: List[str]) -> str:
+    return content_key(
+        ingestion_manager.version_for(partitions), query, options["top_k"], options["candidate_pool"],
+        options["fusion_mode"].value, options["vector_weight"], options["keyword_weight"], config.RRF_K,
+        config.PARENT_EXPANSION_MAX_TOKENS,
+    )
+
+def _fuse(vector_results: List[NodeWithScore], keyword_results: List[NodeWithScore], options: dict) -> List[NodeWithScore]:
+    return fuse(
+        vector_results,
+        keyword_results,
+        mode=options["fusion_mode"],
+        top_k=options["top_k"],
+        vector_weight=options["vector_weight"],
+        keyword_weight=options["keyword_weight"],
+        rrf_k=config.RRF_K,
+    )
+
+def _expand(clauses: List[NodeWithScore], partitions: List[str]) -> List[NodeWithScore]:
+    return ingestion_manager.expand_to_parents(clauses, config.PARENT_EXPANSION_MAX_TOKENS, partitions)
+
+async def _partitions(jurisdiction: Optional[str]) -> List[str]:
+    # Partitions outside the startup preload are loaded by their first query
+    return await ingestion_manager.wait_partitions(ingestion_manager.route(jurisdiction), config.INDEX_READY_TIMEOUT_SECONDS)
+
+async def hybrid_retrieve(
+    query: str,
+    top_k: Optional[int] = None,
+    candidate_pool: Optional[int] = None,
+    fusion_mode: Optional[FusionMode] = None,
+    vector_weight: Optional[float] = None,
+    keyword_weight: Optional[float] = None,
+    query_embedding: Optional[List[float]] = None,
+    jurisdiction: Optional[str] = None,
+) -> RetrievalResult:
+    """
+    Retreives `candidate_pool` nodes from both vector and keyword retrievers concurrently
+    and fuses them into the `top_k` best. Unset options fall back to config.
+    A precomputed `query_embedding` is reused by the vector leg instead of re-embedding.
+    Only the partitions routed for `jurisdiction` are searched (all of them if None).
+    Explicitly handles empty indices by returning an empty result.
+    """
+    options = _resolve_options(top_k, candidate_pool, fusion_mode, vector_weight, keyword_weight)
+
+    start = time.perf_counter()
+    partitions = await _partitions(jurisdiction)
+    cache_key = _cache_key(query, options, partitions)
+    cached = stage_caches.get("retrieval", cache_key)
+    if cached:
+        observe_stage("retrieval_cache", time.perf_counter() - start)
+        return replace(cached, timings={"cache": (time.perf_counter() - start) * 1000})
+
+    pool = options["candidate_pool"]
+    vector_retriever = ingestion_manager.get_vector_retriever(similarity_top_k=pool, partitions=partitions)
+    keyword_retriever = ingestion_manager.get_keyword_retriever(similarity_top_k=pool, partitions=partitions)
 
     if not vector_retriever and not keyword_retriever:
-        return []
-
-    # Get results from available retrievers
-    vector_results = vector_retriever.retrieve(query) if vector_retriever else []
-    keyword_results = keyword_retriever.retrieve(query) if keyword_retriever else []
-
-    # Merge results (simple union by node ID)
-    seen_ids = set()
-    merged = []
-    
-    for res in vector_results + keyword_results:
-        if res.node.node_id not in seen_ids:
-            merged.append(res)
-            seen_ids.add(res.node.node_id)
-            
-    return merged
+        return RetrievalResult(partitions=partitions)
+
+    query_bundle = QueryBundle(query_str=query, embedding=query_embedding)
+    (vector_results, vector_ms), (keyword_results, keyword_ms) = await asyncio.gather(
+        _timed_retrieve(vector_retriever, query_bundle),
+        _timed_retrieve(keyword_retriever, query_bundle),
+    )
+
+    fusion_start = time.perf_counter()
+    merged = _fuse(vector_results, keyword_results, options)
+    end = time.perf_counter()
+    _observe_legs(vector_retriever, vector_ms, keyword_retriever, keyword_ms)
+    observe_stage("fusion", end - fusion_start)
+
+    result = RetrievalResult(
+        nodes=_expand(merged, partitions),
+        clauses=merged,
+        vector_results=vector_results,
+        keyword_results=keyword_results,
+        partitions=partitions,
+        timings={
+            "vector": vector_ms,
+            "keyword": keyword_ms,
+            "fusion": (end - fusion_start) * 1000,
+            "total": (end - start) * 1000,
+        },
+    )
+    stage_caches.set("retrieval", cache_key, result)
+    return result
+
+def _observe_legs(vector_retriever, vector_ms: float, keyword_retriever, keyword_ms: float):
+    if vector_retriever:
+        observe_stage("vector", vector_ms / 1000)
+    if keyword_retriever:
+        observe_stage("keyword", keyword_ms / 1000)
+
+def _timed_batch(fn, *args) -> tuple[List[List[NodeWithScore]], float]:
+    start = time.perf_counter()
+    results = fn(*args)
+    return results, (time.perf_counter() - start) * 1000
+
+async def hybrid_retrieve_batch(
+    queries: List[str],
+    query_embeddings: List[List[float]],
+    top_k: Optional[int] = None,
+    candidate_pool: Optional[int] = None,
+    fusion_mode: Optional[FusionMode] = None,
+    vector_weight: Optional[float] = None,
+    keyword_weight: Optional[float] = None,
+    jurisdiction: Optional[str] = None,
+) -> List[RetrievalResult]:
+    """
+    `hybrid_retrieve` for many queries sharing the same options. The vector leg scores
+    every query in one matrix product; the keyword leg runs the batch in one worker thread.
+    Results are cached per query under the same keys as `hybrid_retrieve`.
+    """
+    options = _resolve_options(top_k, candidate_pool, fusion_mode, vector_weight, keyword_weight)
+    start = time.perf_counter()
+    partitions = await _partitions(jurisdiction)
+    keys = [_cache_key(query, options, partitions) for query in queries]
+    results: List[Optional[RetrievalResult]] = [stage_caches.get("retrieval", key) for key in keys]
+    missing = [i for i, result in enumerate(results) if result is None]
+    if not missing:
+        return results
+
+    pool = options["candidate_pool"]
+    keyword_retriever = ingestion_manager.get_keyword_retriever(similarity_top_k=pool, partitions=partitions)
+    vector_retriever = ingestion_manager.get_vector_retriever(similarity_top_k=pool, partitions=partitions)
+    if not vector_retriever and not keyword_retriever:
+        return [result or RetrievalResult(partitions=partitions) for result in results]
+
+    def vector_leg():
+        if not vector_retriever:
+            return [[] for _ in missing]
+        return ingestion_manager.vector_search_batch([query_embeddings[i] for i in missing], pool, partitions)
+
+    def keyword_leg():
+        if not keyword_retriever:
+            return [[] for _ in missing]
+        return [keyword_retriever.retrieve(queries[i]) for i in missing]
+
+    (vector_batches, vector_ms), (keyword_batches, keyword_ms) = await asyncio.gather(
+        asyncio.to_thread(_timed_batch, vector_leg),
+        asyncio.to_thread(_timed_batch, keyword_leg),
+    )
+    # Once per batch: the legs scored every query together
+    _observe_legs(vector_retriever, vector_ms, keyword_retriever, keyword_ms)
+
+    for i, vector_results, keyword_results in zip(missing, vector_batches, keyword_batches):
+        fusion_start = time.perf_counter()
+        merged = _fuse(vector_results, keyword_results, options)
+        end = time.perf_counter()
+        observe_stage("fusion", end - fusion_start)
+        results[i] = RetrievalResult(
+            nodes=_expand(merged, partitions),
+            clauses=merged,
+            vector_results=vector_results,
+            keyword_results=keyword_results,
+            partitions=partitions,
+            # Leg timings cover the whole batch
+            timings={
+                "vector": vector_ms,
+                "keyword": keyword_ms,
+                "fusion": (end - fusion_start) * 1000,
+                "total": (end - start) * 1000,
+                "batch_size": len(missing),
+            },
+        )
+        stage_caches.set("retrieval", keys[i], results[i])
+    return results
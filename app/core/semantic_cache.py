@@ -0,0 +1,128 @@
+import threading
+from typing import Callable, List, Optional
+import numpy as np
+from llama_index.embeddings.huggingface import HuggingFaceEmbedding
+from llama_index.embeddings.huggingface.utils import get_query_instruct_for_model_name, get_text_instruct_for_model_name
+from app.core.config import config
+from app.core.llm import get_embed_model
+from app.core.stage_cache import stage_caches, content_key
+
+def embed_question(question: str) -> List[float]:
+    """
+    Embeds a question with the configured local model (BAAI/bge-small-en-v1.5).
+    """
+    key = content_key(config.EMBED_MODEL, question)
+    embedding = stage_caches.get("embedding", key)
+    if embedding is None:
+        embedding = get_embed_model().get_query_embedding(question)
+        stage_caches.set("embedding", key, embedding)
+    return embedding
+
+def embed_questions(questions: List[str]) -> List[List[float]]:
+    """
+    Batch version of `embed_question`: uncached questions go through the model in one pass.
+    """
+    keys = [content_key(config.EMBED_MODEL, q) for q in questions]
+    embeddings = [stage_caches.get("embedding", key) for key in keys]
+    missing = [i for i, embedding in enumerate(embeddings) if embedding is None]
+    if missing:
+        model = get_embed_model()
+        texts = [questions[i] for i in missing]
+        if isinstance(model, HuggingFaceEmbedding) and not (
+            model.text_instruction or get_text_instruct_for_model_name(model.model_name)
+        ):
+            # There is no public batch query API. Without a document instruction, the text batch
+            # API on instruction-prefixed questions encodes exactly what get_query_embedding does
+            instruction = model.query_instruction or get_query_instruct_for_model_name(model.model_name)
+            fresh = model.get_text_embedding_batch([instruction + text for text in texts])
+        else:
+            fresh = [model.get_query_embedding(text) for text in texts]
+        for i, embedding in zip(missing, fresh):
+            embeddings[i] = embedding
+            stage_caches.set("embedding", keys[i], embedding)
+    return embeddings
+
+class SemanticCache:
+    """
+    Small in-memory vector index of answered questions, one per namespace (jurisdiction).
+    It only maps near-duplicate questions to an existing response cache key; the
+    responses themselves stay in `query_cache` and follow its TTL/LRU policy.
+    """
+    def __init__(self, threshold: float = 0.92, max_entries: int = 1000):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self.keys = {}      # namespace -> list of cache keys
+        self.vectors = {}   # namespace -> (n, dim) array of unit-normalized embeddings
+
+    @staticmethod
+    def _normalize(embedding) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+    def lookup(self, namespace: str, embedding) -> Optional[tuple[str, float]]:
+        """
+        Returns (cache_key, similarity) of the closest cached question at or above the threshold.
+        """
+        query = self._normalize(embedding)
+        with self.lock:
+            vectors = self.vectors.get(namespace)
+            if vectors is None or not len(vectors):
+                return None
+            similarities = vectors @ query
+            best = int(np.argmax(similarities))
+            similarity = float(similarities[best])
+            if similarity < self.threshold:
+                return None
+            return self.keys[namespace][best], similarity
+
+    def add(self, namespace: str, key: str, embedding):
+        vector = self._normalize(embedding)[None, :]
+        with self.lock:
+            keys = self.keys.setdefault(namespace, [])
+            if key in keys:
+                return
+            vectors = self.vectors.get(namespace)
+            vectors = vector if vectors is None else np.vstack([vectors, vector])
+            keys.append(key)
+            # Oldest questions drop out first once the namespace is full
+            if len(keys) > self.max_entries:
+                del keys[0]
+                vectors = vectors[1:]
+            self.vectors[namespace] = vectors
+
+    def remove(self, namespace: str, key: str):
+        with self.lock:
+            keys = self.keys.get(namespace, [])
+            if key in keys:
+                i = keys.index(key)
+                del keys[i]
+                self.vectors[namespace] = np.delete(self.vectors[namespace], i, axis=0)
+
+    def retain(self, keep: Callable[[str], bool]):
+        """
+        Drops every namespace `keep` rejects, e.g. those of an index version no longer served.
+        """
+        with self.lock:
+            for namespace in [n for n in self.keys if not keep(n)]:
+                del self.keys[namespace]
+                self.vectors.pop(namespace, None)
+
+    def clear(self):
+        with self.lock:
+            self.keys.clear()
+            self.vectors.clear()
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                "threshold": self.threshold,
+                "entries": {namespace: len(keys) for namespace, keys in self.keys.items()},
+            }
+
+# Global semantic cache instance
+semantic_cache = SemanticCache(
+    threshold=config.SEMANTIC_CACHE_THRESHOLD,
+    max_entries=config.SEMANTIC_CACHE_MAX_ENTRIES,
+)
@@ -0,0 +1,74 @@
+import asyncio
+import logging
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, Optional, TypeVar
+
+from app.core.metrics import COALESCED
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+@dataclass
+class Flight:
+    task: asyncio.Task
+    # Loop time after which the flight is considered stuck and no longer joined
+    deadline: float
+
+class SingleFlight:
+    """
+    At most one run of `work` per key at a time: concurrent callers with the same key
+    await the first caller's result, or its exception, instead of repeating the work.
+
+    The work runs as its own task, so a caller that goes away (client disconnect) does
+    not cancel it for the others. Callers wait for a flight until `timeout` seconds after
+    it started; after that it is abandoned and they start a new one.
+    """
+    def __init__(self, timeout: float = 60.0):
+        self.timeout = timeout
+        self.flights: Dict[str, Flight] = {}
+
+    def running(self, key: str) -> bool:
+        flight = self.flights.get(key)
+        return flight is not None and self._joinable(flight)
+
+    @staticmethod
+    def _joinable(flight: Flight) -> bool:
+        loop = asyncio.get_running_loop()
+        return flight.task.get_loop() is loop and not flight.task.done() and loop.time() < flight.deadline
+
+    async def do(self, key: str, work: Callable[[], Awaitable[T]], similar: Optional[str] = None) -> T:
+        """
+        `work()`'s result, shared with every concurrent call for `key`. When no flight for
+        `key` is running, a running one for `similar` (a near-duplicate's key) is joined instead.
+        """
+        match, flight = "exact", self.flights.get(key)
+        if (flight is None or not self._joinable(flight)) and similar is not None:
+            match, flight = "semantic", self.flights.get(similar)
+        if flight is None or not self._joinable(flight):
+            return await self._lead(key, work)
+
+        COALESCED.inc(match=match)
+        remaining = flight.deadline - asyncio.get_running_loop().time()
+        done, _ = await asyncio.wait({flight.task}, timeout=remaining)
+        if done:
+            return flight.task.result()
+        logger.warning("In-flight query still running after %.0fs, running it again: %s", self.timeout, key)
+        return await self.do(key, work)
+
+    async def _lead(self, key: str, work: Callable[[], Awaitable[T]]) -> T:
+        loop = asyncio.get_running_loop()
+        flight = Flight(asyncio.ensure_future(work()), loop.time() + self.timeout)
+        self.flights[key] = flight
+
+        def finished(_):
+            if self.flights.get(key) is flight:
+                del self.flights[key]
+        flight.task.add_done_callback(finished)
+        return await asyncio.shield(flight.task)
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": len(self.flights),
+            "coalesced": {match: int(COALESCED.value(match=match)) for match in ("exact", "semantic")},
+        }
@@ -0,0 +1,55 @@
+import hashlib
+import json
+from app.core.cache import ResponseCache
+from app.core.config import config
+
+STAGES = ("embedding", "retrieval", "generation", "verification")
+
+def content_key(*parts) -> str:
+    """
+    Content-addressed key: a hash of everything the stage output depends on.
+    """
+    payload = json.dumps(parts, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def prompt_version(template: str) -> str:
+    return hashlib.sha256(template.encode("utf-8")).hexdigest()[:12]
+
+class StageCaches:
+    """
+    One bounded cache per pipeline stage, so a miss on the final response can
+    still reuse whichever intermediate results are unaffected by what changed.
+
+    - embedding:    (embed model, question)
+    - retrieval:    (index version, question, retrieval options)
+    - generation:   (question, node IDs, prompt version, LLM model)
+    - verification: (answer, node IDs, prompt version), holding a verdict per serving LLM model
+
+    Node IDs are never reused for different text, so only retrieval depends on
+    the index version; it is dropped whenever the index changes.
+    """
+    def __init__(self):
+        self.caches = {
+            stage: ResponseCache(
+                ttl_seconds=config.STAGE_CACHE_TTL_SECONDS,
+                max_entries=config.STAGE_CACHE_MAX_ENTRIES,
+                max_bytes=config.STAGE_CACHE_MAX_BYTES,
+                sweep_interval=config.CACHE_SWEEP_SECONDS,
+            )
+            for stage in STAGES
+        }
+
+    def get(self, stage: str, key: str):
+        return self.caches[stage].get(key)
+
+    def set(self, stage: str, key: str, value):
+        self.caches[stage].set(key, value)
+
+    def invalidate_index(self):
+        self.caches["retrieval"].clear()
+
+    def stats(self) -> dict:
+        return {stage: cache.stats() for stage, cache in self.caches.items()}
+
+# Global stage cache instance
+stage_caches = StageCaches()
@@ -1,77 +1,822 @@
+import asyncio
+from collections import ChainMap
+import hashlib
+import json
+import logging
 import os
-from typing import List
-from llama_index.core import VectorStoreIndex, SimpleDirectoryReader, StorageContext, load_index_from_storage
-from llama_index.core.node_parser import SentenceSplitter
-from llama_index.core.retrievers import VectorIndexRetriever
-from llama_index.retrievers.bm25 import BM25Retriever
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Mapping, Optional
+import numpy as np
+from llama_index.core import VectorStoreIndex, StorageContext, load_index_from_storage
+from llama_index.core.schema import BaseNode, NodeWithScore
+from llama_index.core.vector_stores import SimpleVectorStore
 from app.core.config import config
-from app.core.llm import llm
+from app.core.llm import get_embed_model
+from app.core.locks import FileLock, ReadySignal
+from app.core.semantic_cache import embed_question
+from app.core.stage_cache import stage_caches
+from app.ingestion.keyword_index import META_FILE as KEYWORD_META_FILE, KeywordRetriever, load_or_build
+from app.ingestion.manifest import Manifest, CorpusChanges, MANIFEST_FILE, scan_corpus
+from app.ingestion.partitions import SHARED_PARTITION, MergedRetriever, merge_by_score, parse_routes, partition_of, route
+from app.ingestion.pipeline import IngestionPipeline
+from app.ingestion.snapshot import current_snapshot, open_snapshot, publish_snapshot, snapshot_meta
+from app.ingestion.structure import is_parent
+from app.ingestion.vector_store import META_FILE as VECTOR_META_FILE, VECTOR_DIR, MmapVectorStore, VectorRetriever
+
+logger = logging.getLogger(__name__)
 
 PERSIST_DIR = "./storage"
+# Every partition but the shared one persists under storage/partitions/<name>
+PARTITIONS_DIR = os.path.join(PERSIST_DIR, "partitions")
+# SimpleVectorStore JSON written by indexes built before the memory-mapped store
+LEGACY_VECTOR_STORE_FILE = "default__vector_store.json"
+# Held while a partition's snapshot is built, published or attached
+SNAPSHOT_LOCK_FILE = ".snapshot.lock"
+
+def partition_dir(partition: str) -> str:
+    # The shared partition keeps the layout from before partitioning
+    return PERSIST_DIR if partition == SHARED_PARTITION else os.path.join(PARTITIONS_DIR, partition)
+
+def expand_to_parents(nodes: List[NodeWithScore], parents: Mapping[str, BaseNode], max_tokens: int) -> List[NodeWithScore]:
+    """
+    Replaces two or more retrieved nodes that share a parent (the whole rule or
+    sub-rule) with that parent, at the best child's position and score, when the
+    parent is at most `max_tokens` long. Repeats upward, so sibling sub-rules can
+    merge into their rule. Single clauses stay clauses.
+    """
+    def parent_id(node: BaseNode) -> Optional[str]:
+        parent = node.parent_node
+        return parent.node_id if parent is not None and parent.node_id in parents else None
+
+    while True:
+        parent_ids = [parent_id(n.node) for n in nodes]
+        counts: Dict[str, int] = {}
+        for pid in parent_ids:
+            if pid is not None:
+                counts[pid] = counts.get(pid, 0) + 1
+        expand = {
+            pid for pid, count in counts.items()
+            if count >= 2 and parents[pid].metadata.get("tokens", 0) <= max_tokens
+        }
+        if not expand:
+            return nodes
+        expanded, placed = [], {}
+        for n, pid in zip(nodes, parent_ids):
+            if pid not in expand:
+                expanded.append(n)
+            elif pid in placed:
+                placed[pid].score = max(placed[pid].score or 0.0, n.score or 0.0)
+            else:
+                placed[pid] = NodeWithScore(node=parents[pid], score=n.score)
+                expanded.append(placed[pid])
+        nodes = expanded
 
 class IngestionManager:
-    def __init__(self):
+    """
+    Owns one partition's vector index, keyword index and corpus manifest. Nothing is
+    loaded at construction; call `load()` (or `start_background_load()`).
+
+    With `snapshots` (INDEX_SNAPSHOTS) it serves a read-only snapshot instead: the first
+    process to load builds or loads the index once and publishes it, every process
+    memory-maps the published files, and a newer snapshot (from `sync()` in any process)
+    replaces the attached one within SNAPSHOT_POLL_SECONDS.
+    """
+    def __init__(self, partition: str = SHARED_PARTITION, persist_dir: Optional[str] = None, snapshots: Optional[bool] = None):
+        self.partition = partition
+        self.persist_dir = persist_dir or partition_dir(partition)
+        self.keyword_persist_dir = os.path.join(self.persist_dir, "keyword")
+        self.manifest_path = os.path.join(self.persist_dir, MANIFEST_FILE)
+        self.vector_persist_dir = os.path.join(self.persist_dir, VECTOR_DIR)
+        self.legacy_vector_store_path = os.path.join(self.persist_dir, LEGACY_VECTOR_STORE_FILE)
+        self.snapshots = config.INDEX_SNAPSHOTS if snapshots is None else snapshots
+        # Name of the attached snapshot
+        self.snapshot = None
         self.nodes = []
+        self.node_map = {}
+        # Whole rules / sub-rules from structural chunking: stored for expansion, never indexed
+        self.parents: Dict[str, BaseNode] = {}
         self.index = None
-        self._initialize()
+        self.keyword_index = None
+        self.version = ""
+        self.manifest = Manifest()
+        self.lock = threading.Lock()
+        self.load_lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self.ready_event = ReadySignal()
+        self.status = "not_started"  # loading | ready | degraded | failed
+        self.error = None
+        self.load_seconds = None
+        self._loader = None
+        self._watcher = None
 
-    def _initialize(self):
-        if os.path.exists(PERSIST_DIR):
+    def load(self):
+        """
+        Loads (or builds) the embedding model and indexes. Idempotent and thread-safe;
+        concurrent callers block until the first load finishes.
+        """
+        with self.load_lock:
+            if self.status in ("ready", "degraded"):
+                return
+            self.status = "loading"
+            self.error = None
+            self.ready_event.clear()
+            start = time.perf_counter()
             try:
-                print("Loading existing index from storage...")
-                storage_context = StorageContext.from_defaults(persist_dir=PERSIST_DIR)
-                self.index = load_index_from_storage(storage_context)
-                self.nodes = self.index.docstore.docs.values()
-                print(f"Loaded index with {len(self.nodes)} nodes")
+                get_embed_model()
+                if self.snapshots:
+                    self._load_snapshot()
+                else:
+                    self._initialize()
+                    self._initialize_keyword_index()
+                self.status = "degraded" if self.error else "ready"
+            except Exception as e:
+                logger.critical("Index load failed: %s", e)
+                self.status = "failed"
+                self.error = str(e)
+            finally:
+                self.load_seconds = time.perf_counter() - start
+                logger.info("Index %s %s after %.1fs", self.partition, self.status, self.load_seconds)
+                self.ready_event.set()
+
+    def start_background_load(self):
+        """
+        Starts loading in a thread unless a load has succeeded or is under way; a failed
+        load is retried.
+        """
+        with self._start_lock:
+            # A failed loader may still be finishing; its status is final
+            if self.status not in ("not_started", "failed"):
                 return
+            self.status = "loading"
+            self.ready_event.clear()
+            self._loader = threading.Thread(target=self.load, name=f"index-loader-{self.partition}", daemon=True)
+            self._loader.start()
+
+    async def wait_ready(self, timeout: float) -> bool:
+        """
+        Starts loading if nobody has yet (or the last load failed), then waits up to
+        `timeout` seconds. Returns True once the index can serve queries (possibly degraded).
+        """
+        if not self.ready_event.is_set() or self.status == "failed":
+            self.start_background_load()
+            await self.ready_event.wait_async(timeout)
+        return self.status in ("ready", "degraded")
+
+    def state(self) -> dict:
+        return {
+            "status": self.status,
+            "error": self.error,
+            "load_seconds": self.load_seconds,
+            "nodes": len(self.nodes),
+            "parents": len(self.parents),
+            "vector_index": self.index is not None,
+            "keyword_index": self.keyword_index is not None,
+            "version": self.version,
+            "snapshot": self.snapshot,
+        }
+
+    def _update_version(self):
+        """
+        Identifies the index contents; cached retrieval results and answers are keyed on it.
+        """
+        # Quantization and IVF change vector scores, so the store layout is part of the version
+        digest = hashlib.sha256(self.vector_store.layout.encode("utf-8") if self.index else b"keyword-only")
+        for node_id in sorted(self.node_map):
+            digest.update(node_id.encode("utf-8"))
+        version = digest.hexdigest()[:12]
+        if self.version and version != self.version:
+            stage_caches.invalidate_index()
+        self.version = version
+
+    def _initialize_keyword_index(self):
+        self.node_map = {n.node_id: n for n in self.nodes}
+        self._update_version()
+        try:
+            self.keyword_index = load_or_build(self.keyword_persist_dir, self.nodes)
+            if self.keyword_index:
+                logger.info("Keyword index ready with %d nodes", self.keyword_index.num_docs)
+        except Exception as e:
+            logger.critical("Failed to initialize keyword index: %s", e)
+            self.keyword_index = None
+
+    # --- Snapshot serving (INDEX_SNAPSHOTS) ---
+
+    def _snapshot_lock(self) -> FileLock:
+        os.makedirs(self.persist_dir, exist_ok=True)
+        return FileLock(os.path.join(self.persist_dir, SNAPSHOT_LOCK_FILE))
+
+    def _source_stamp(self) -> str:
+        """
+        Changes whenever the persisted index or the settings it is loaded with do, so a
+        snapshot taken from an older index is never attached.
+        """
+        stamp = {"chunking": config.CHUNKING_MODE, **self._vector_store_params()}
+        for name in ("docstore.json", os.path.join(VECTOR_DIR, VECTOR_META_FILE), os.path.join("keyword", KEYWORD_META_FILE)):
+            try:
+                stat = os.stat(os.path.join(self.persist_dir, name))
+                stamp[name] = [stat.st_mtime_ns, stat.st_size]
+            except FileNotFoundError:
+                stamp[name] = None
+        return hashlib.sha256(json.dumps(stamp, sort_keys=True).encode("utf-8")).hexdigest()[:12]
+
+    def _fresh_snapshot(self) -> Optional[str]:
+        # The current snapshot, unless it is stale or was published degraded (keyword-only)
+        name = current_snapshot(self.persist_dir)
+        meta = snapshot_meta(self.persist_dir, name) if name else None
+        if meta is None or meta["source"] != self._source_stamp() or meta["error"]:
+            return None
+        return name
+
+    def _builder(self) -> "IngestionManager":
+        # Loads and writes the persisted index on behalf of the snapshot readers
+        return IngestionManager(self.partition, self.persist_dir, snapshots=False)
+
+    def _load_snapshot(self):
+        """
+        Attaches the current snapshot. The first process to get here without a fresh one
+        loads (or builds) the index and publishes it while the others wait on the lock.
+        """
+        with self._snapshot_lock():
+            name = self._fresh_snapshot()
+            if name is None:
+                builder = self._builder()
+                builder.load()
+                if builder.status == "failed":
+                    raise RuntimeError(builder.error)
+                name = publish_snapshot(builder, self._source_stamp())
+                logger.info("Published %s index snapshot %s", self.partition, name)
+            self._attach(name)
+        if config.SNAPSHOT_POLL_SECONDS > 0 and self._watcher is None:
+            self._watcher = threading.Thread(target=self._follow_snapshots, name=f"snapshot-watcher-{self.partition}", daemon=True)
+            self._watcher.start()
+
+    def _attach(self, name: str):
+        # Caller holds the snapshot lock
+        snapshot = open_snapshot(self.persist_dir, name, **self._vector_store_params())
+        index = None
+        if snapshot.vector_store is not None:
+            index = VectorStoreIndex([], storage_context=StorageContext.from_defaults(vector_store=snapshot.vector_store))
+        self.node_map, self.parents, self.nodes = snapshot.nodes, snapshot.parents, snapshot.nodes.values()
+        self.index, self.keyword_index = index, snapshot.keyword_index
+        self.error = snapshot.meta["error"]
+        if self.version and snapshot.version != self.version:
+            stage_caches.invalidate_index()
+        self.version, self.snapshot = snapshot.version, name
+        logger.info("Attached %s index snapshot %s (%d nodes)", self.partition, name, len(self.nodes))
+
+    def refresh_snapshot(self) -> bool:
+        """
+        Attaches the current snapshot if another one than ours has been published.
+        """
+        if current_snapshot(self.persist_dir) in (None, self.snapshot):
+            return False
+        with self._snapshot_lock():
+            name = current_snapshot(self.persist_dir)
+            if name is None or name == self.snapshot:
+                return False
+            self._attach(name)
+        self.status = "degraded" if self.error else "ready"
+        return True
+
+    def _follow_snapshots(self):
+        while True:
+            time.sleep(config.SNAPSHOT_POLL_SECONDS)
+            try:
+                self.refresh_snapshot()
             except Exception as e:
-                print(f"Failed to load index: {e}. Building new index...")
+                logger.error("Failed to attach new %s index snapshot: %s", self.partition, e)
+
+    def _scan(self) -> Dict[str, str]:
+        return scan_corpus(config.CORPUS_DIR, keep=lambda rel_path: partition_of(rel_path) == self.partition)
+
+    def _load_persisted(self) -> bool:
+        """
+        Loads the persisted index and manifest, if there is one. Returns whether it did.
+        """
+        if not os.path.exists(os.path.join(self.persist_dir, "docstore.json")):
+            return False
+        try:
+            logger.info("Loading existing %s index from storage...", self.partition)
+            storage_context = StorageContext.from_defaults(persist_dir=self.persist_dir, vector_store=self._load_vector_store())
+            self.index = load_index_from_storage(storage_context)
+            self._set_nodes(self.index.docstore.docs.values())
+            self.manifest = self._load_manifest()
+            logger.info("Loaded index with %d nodes", len(self.nodes))
+            return True
+        except Exception as e:
+            logger.warning("Failed to load index: %s. Building new index...", e)
+            self.index = None
+            return False
 
-        if not os.path.exists(config.CORPUS_DIR) or not os.listdir(config.CORPUS_DIR):
-            print("Corpus directory is empty. Index will be empty.")
+    def _initialize(self):
+        if self._load_persisted():
+            return
+
+        current = self._scan()
+        if not current:
+            logger.info("No corpus files in partition %s. Index will be empty.", self.partition)
             return
 
-        documents = SimpleDirectoryReader(str(config.CORPUS_DIR)).load_data()
-        
-        parser = SentenceSplitter(
-            chunk_size=config.CHUNK_SIZE, 
-            chunk_overlap=config.CHUNK_OVERLAP
-        )
-        
         try:
-            self.nodes = parser.get_nodes_from_documents(documents)
-            
-            for i, node in enumerate(self.nodes):
-                node.metadata["clause_id"] = f"clause_{i}"
-                node.metadata["source"] = node.metadata.get("file_name", "unknown")
-
-            print(f"Creating index with {len(self.nodes)} nodes...")
-            self.index = VectorStoreIndex(self.nodes)
-            
-            self.index.storage_context.persist(persist_dir=PERSIST_DIR)
-            print("Index created and persisted successfully")
-            
+            self._apply_changes(self.manifest.diff(current, config.CHUNKING_MODE))
         except Exception as e:
-            print(f"CRITICAL: Failed to initialize VectorStoreIndex: {e}")
-            print("This is likely due to OpenAI API rate limits.")
-            print("Falling back to Keyword Only mode (BM25).")
-            # Do NOT clear self.nodes here, so BM25 still works!
+            logger.critical("Failed to initialize VectorStoreIndex: %s", e)
+            logger.critical("Falling back to Keyword Only mode (BM25).")
+            # Keep the parsed nodes so BM25 still works, but persist nothing
+            self.error = f"Vector index unavailable, serving keyword-only results: {e}"
             self.index = None
-        
-    def get_vector_retriever(self, similarity_top_k=3):
+            self.manifest = Manifest()
+            self._set_nodes(self._parse_files(sorted(current)))
+
+    @staticmethod
+    def _vector_store_params() -> dict:
+        return {
+            "dtype": config.VECTOR_DTYPE,
+            "ann_threshold": config.VECTOR_ANN_THRESHOLD,
+            "lists": config.VECTOR_IVF_LISTS,
+            "nprobe": config.VECTOR_IVF_NPROBE,
+        }
+
+    def _load_vector_store(self) -> MmapVectorStore:
+        """
+        Memory-maps the persisted embeddings, converting an older SimpleVectorStore JSON
+        file once, and rewrites them if VECTOR_DTYPE or the IVF settings changed.
+        """
+        params = self._vector_store_params()
+        if os.path.exists(os.path.join(self.vector_persist_dir, VECTOR_META_FILE)):
+            vector_store = MmapVectorStore.load(self.vector_persist_dir, **params)
+        elif os.path.exists(self.legacy_vector_store_path):
+            logger.info("Converting JSON vector store to memory-mapped arrays...")
+            data = SimpleVectorStore.from_persist_path(self.legacy_vector_store_path).data
+            vector_store = MmapVectorStore(**params)
+            node_ids = list(data.embedding_dict)
+            vector_store.add_embeddings(
+                node_ids, [data.embedding_dict[i] for i in node_ids], [data.text_id_to_ref_doc_id.get(i, "None") for i in node_ids]
+            )
+        else:
+            raise FileNotFoundError(f"No vector store found in {self.persist_dir}")
+        if vector_store.needs_save:
+            vector_store.save(self.vector_persist_dir)
+        if os.path.exists(self.legacy_vector_store_path):
+            os.remove(self.legacy_vector_store_path)
+        return vector_store
+
+    @property
+    def vector_store(self) -> Optional[MmapVectorStore]:
+        return self.index.vector_store if self.index is not None else None
+
+    def _set_nodes(self, nodes):
+        nodes = list(nodes)
+        self.nodes = [n for n in nodes if not is_parent(n)]
+        self.parents = {n.node_id: n for n in nodes if is_parent(n)}
+
+    def _load_manifest(self) -> Manifest:
+        if os.path.exists(self.manifest_path):
+            return Manifest.load(self.manifest_path)
+
+        # Index persisted before incremental ingestion existed: adopt its nodes as-is
+        logger.info("No ingestion manifest found. Adopting existing index...")
+        current = self._scan()
+        manifest = Manifest()
+        for node in self.nodes:
+            # Files deleted since the build get an empty hash and are removed on the next sync
+            rel_path = self._corpus_path(node.metadata)
+            entry = manifest.files.setdefault(rel_path, {"sha256": current.get(rel_path, ""), "node_ids": []})
+            entry["node_ids"].append(node.node_id)
+            clause_id = node.metadata.get("clause_id", "")
+            if clause_id.startswith("clause_") and clause_id[7:].isdigit():
+                manifest.next_clause = max(manifest.next_clause, int(clause_id[7:]) + 1)
+        manifest.save(self.manifest_path)
+        return manifest
+
+    @staticmethod
+    def _corpus_path(metadata: dict) -> str:
+        if metadata.get("corpus_path"):
+            return metadata["corpus_path"]
+        file_path = Path(metadata.get("file_path", metadata.get("file_name", "")))
+        try:
+            return file_path.resolve().relative_to(config.CORPUS_DIR).as_posix()
+        except ValueError:
+            return file_path.name
+
+    def _pipeline(self) -> IngestionPipeline:
+        return IngestionPipeline(
+            corpus_dir=config.CORPUS_DIR,
+            chunk_size=config.CHUNK_SIZE,
+            chunk_overlap=config.CHUNK_OVERLAP,
+            workers=config.INGEST_WORKERS,
+            embed_batch_size=config.INGEST_EMBED_BATCH_SIZE,
+            pages_per_task=config.INGEST_PAGES_PER_TASK,
+            chunking=config.CHUNKING_MODE,
+        )
+
+    def _tag_node(self, node: BaseNode):
+        node.metadata["partition"] = self.partition
+        # Structural nodes already carry their citation ("Rule 46(b)")
+        if not node.metadata.get("clause_id"):
+            node.metadata["clause_id"] = self.manifest.allocate_clause_id()
+
+    def _parse_files(self, rel_paths: List[str]) -> List[BaseNode]:
+        """
+        Reads and chunks the given corpus files without embedding them (keyword-only mode).
+        """
+        nodes = []
+        self._pipeline().run(rel_paths, decorate=self._tag_node, sink=nodes.extend)
+        return nodes
+
+    def _apply_changes(self, changes: CorpusChanges) -> dict:
+        """
+        Parses, chunks and embeds only added/changed files, drops nodes of changed/removed
+        files, and persists the vector index and manifest. Unchanged files keep their
+        node and clause IDs.
+        """
+        stale_ids = self.manifest.node_ids(changes.changed + changes.removed)
+        to_ingest = changes.added + changes.changed
+
+        if self.index is None:
+            logger.info("Creating new index...")
+            vector_store = MmapVectorStore(**self._vector_store_params())
+            self.index = VectorStoreIndex([], storage_context=StorageContext.from_defaults(vector_store=vector_store))
+        elif stale_ids:
+            logger.info("Removing %d stale nodes...", len(stale_ids))
+            # Parents live in the docstore only
+            self.index.delete_nodes([i for i in stale_ids if i not in self.parents], delete_from_docstore=True)
+            for node_id in stale_ids:
+                if node_id in self.parents:
+                    self.index.docstore.delete_document(node_id, raise_error=False)
+
+        file_node_ids = {rel_path: [] for rel_path in to_ingest}
+
+        def decorate(node: BaseNode):
+            self._tag_node(node)
+            file_node_ids[node.metadata["corpus_path"]].append(node.node_id)
+
+        def store(batch: List[BaseNode]):
+            self.index.insert_nodes([n for n in batch if not is_parent(n)])
+            self.index.docstore.add_documents([n for n in batch if is_parent(n)])
+
+        logger.info("Ingesting %d files...", len(to_ingest))
+        stats = self._pipeline().run(to_ingest, decorate=decorate, sink=store, embed_model=get_embed_model())
+        logger.info("Ingestion throughput: %s", stats.as_dict())
+
+        current = self._scan()
+        for rel_path in changes.removed:
+            self.manifest.forget(rel_path)
+        for rel_path, node_ids in file_node_ids.items():
+            self.manifest.record(rel_path, current.get(rel_path, ""), node_ids, config.CHUNKING_MODE)
+
+        self.index.storage_context.persist(persist_dir=self.persist_dir)
+        self.manifest.save(self.manifest_path)
+        self._set_nodes(self.index.docstore.docs.values())
+        logger.info("Index updated and persisted successfully")
+
+        summary = self._summary(changes, nodes_added=stats.chunks, nodes_removed=len(stale_ids))
+        summary["throughput"] = stats.as_dict()
+        return summary
+
+    def _summary(self, changes: CorpusChanges, nodes_added: int = 0, nodes_removed: int = 0) -> dict:
+        return {
+            "added": changes.added,
+            "changed": changes.changed,
+            "removed": changes.removed,
+            "unchanged": len(changes.unchanged),
+            "nodes_added": nodes_added,
+            "nodes_removed": nodes_removed,
+            "total_nodes": len(self.nodes),
+        }
+
+    def sync(self, full: bool = False) -> dict:
+        """
+        Incrementally brings the index in line with the corpus directory.
+        `full=True` discards the existing index and re-ingests everything.
+
+        The new index is built on a separate manager (from the persisted one, for an
+        incremental run) and swapped in once complete; queries keep reading the old one
+        meanwhile, and a failed run leaves it in place.
+        """
+        self.load()
+        if not self.lock.acquire(blocking=False):
+            raise RuntimeError("An ingestion run is already in progress.")
+        try:
+            if self.snapshots:
+                return self._sync_snapshot(full)
+            # A full rebuild starts from an empty manifest but carries the clause numbering
+            # over, so clause IDs cited before the rebuild are never handed out again
+            base = Manifest(next_clause=self.manifest.next_clause) if full else self.manifest
+            changes = base.diff(self._scan(), config.CHUNKING_MODE)
+            if not (changes.has_changes or full or self.index is None):
+                summary = self._summary(changes)
+                summary["version"] = self.version
+                return summary
+            builder = self._builder()
+            if full:
+                builder.manifest = base
+            elif self.index is not None and not builder._load_persisted():
+                raise RuntimeError(f"Persisted {self.partition} index could not be loaded; run a full sync.")
+            summary = builder._apply_changes(changes)
+            builder._initialize_keyword_index()
+            self._adopt(builder)
+            summary["version"] = self.version
+            return summary
+        finally:
+            self.lock.release()
+
+    def _adopt(self, builder: "IngestionManager"):
+        # Caller holds self.lock. Retrievers already handed out keep the old index and node map
+        if self.version and builder.version != self.version:
+            stage_caches.invalidate_index()
+        self.index, self.nodes, self.parents, self.node_map, self.keyword_index, self.manifest, self.version = (
+            builder.index, builder.nodes, builder.parents, builder.node_map, builder.keyword_index, builder.manifest, builder.version
+        )
+        self.status, self.error = "ready", None
+
+    def _sync_snapshot(self, full: bool) -> dict:
+        """
+        Syncs the persisted index through a builder and publishes it, unless nothing changed.
+        """
+        with self._snapshot_lock():
+            builder = self._builder()
+            summary = builder.sync(full)
+            name = self._fresh_snapshot() or publish_snapshot(builder, self._source_stamp())
+            if name != self.snapshot:
+                self._attach(name)
+        self.status = "degraded" if self.error else "ready"
+        return summary
+
+    def get_vector_retriever(self, similarity_top_k=config.CANDIDATE_POOL):
         if not self.index:
             return None
-        return VectorIndexRetriever(
-            index=self.index,
+        return VectorRetriever(
+            vector_store=self.vector_store,
+            node_map=self.node_map,
+            embed=embed_question,
             similarity_top_k=similarity_top_k,
         )
 
-    def get_keyword_retriever(self, similarity_top_k=3):
-        if not self.nodes:
+    def node_embeddings(self, node_ids: List[str]):
+        """
+        Unit-normalized stored embeddings for `node_ids` (None if any is unavailable).
+        """
+        if not self.index:
             return None
-        return BM25Retriever.from_defaults(
-            nodes=self.nodes,
+        return self.vector_store.get_embeddings(node_ids)
+
+    def vector_search_batch(self, embeddings: List[List[float]], similarity_top_k: int) -> Optional[List[List[NodeWithScore]]]:
+        """
+        Cosine top-k for many query embeddings in one pass over the vector store; same
+        scores as the vector retriever.
+        """
+        if not self.index:
+            return None
+        return [
+            [NodeWithScore(node=self.node_map[node_id], score=score) for node_id, score in results if node_id in self.node_map]
+            for results in self.vector_store.search(embeddings, similarity_top_k)
+        ]
+
+    def expand_to_parents(self, nodes: List[NodeWithScore], max_tokens: int) -> List[NodeWithScore]:
+        return expand_to_parents(nodes, self.parents, max_tokens)
+
+    def get_keyword_retriever(self, similarity_top_k=config.CANDIDATE_POOL):
+        if not self.keyword_index:
+            return None
+        return KeywordRetriever(
+            keyword_index=self.keyword_index,
+            node_map=self.node_map,
             similarity_top_k=similarity_top_k
         )
 
-ingestion_manager = IngestionManager()
+class PartitionedIndex:
+    """
+    One IngestionManager per corpus partition (see app.ingestion.partitions). The shared
+    partition and PRELOAD_PARTITIONS load at startup, the others on their first query.
+    Queries are routed to their jurisdiction's partitions and the hits merged by score.
+    """
+    def __init__(self):
+        self.managers: Dict[str, IngestionManager] = {}
+        self.routes = parse_routes(config.JURISDICTION_PARTITIONS)
+        self.lock = threading.Lock()
+        self.sync_lock = threading.Lock()
+        self.load_lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self.ready_event = ReadySignal()
+        self.status = "not_started"  # loading | ready | degraded | failed
+        self.error = None
+        self.load_seconds = None
+        self._loader = None
+
+    def discover(self) -> List[str]:
+        """
+        Partitions with a corpus directory or a persisted index; the shared one always exists.
+        """
+        names = {SHARED_PARTITION}
+        corpus = Path(config.CORPUS_DIR)
+        if corpus.is_dir():
+            names.update(p.name.lower() for p in corpus.iterdir() if p.is_dir() and not p.name.startswith("."))
+        if os.path.isdir(PARTITIONS_DIR):
+            names.update(name for name in os.listdir(PARTITIONS_DIR) if os.path.isdir(os.path.join(PARTITIONS_DIR, name)))
+        with self.lock:
+            for name in names:
+                if name not in self.managers:
+                    self.managers[name] = IngestionManager(name)
+            return sorted(self.managers)
+
+    def _preloaded(self) -> List[IngestionManager]:
+        preload = set(config.PRELOAD_PARTITIONS)
+        return [m for name, m in sorted(self.managers.items()) if name == SHARED_PARTITION or name in preload or "*" in preload]
+
+    def _update_status(self):
+        # Only a failed shared partition takes the service down; other partitions degrade it
+        managers = self._preloaded()
+        if self.managers[SHARED_PARTITION].status == "failed":
+            self.status = "failed"
+        elif any(m.status != "ready" for m in managers):
+            self.status = "degraded"
+        else:
+            self.status = "ready"
+        errors = [f"{m.partition}: {m.error}" for m in managers if m.error]
+        self.error = "; ".join(errors) or None
+
+    def load(self):
+        """
+        Discovers the partitions and loads the preloaded ones. Idempotent and thread-safe.
+        """
+        with self.load_lock:
+            if self.status in ("ready", "degraded"):
+                return
+            self.status = "loading"
+            self.error = None
+            self.ready_event.clear()
+            start = time.perf_counter()
+            try:
+                self.discover()
+                for manager in self._preloaded():
+                    manager.load()
+                self._update_status()
+            except Exception as e:
+                logger.critical("Index load failed: %s", e)
+                self.status = "failed"
+                self.error = str(e)
+            finally:
+                self.load_seconds = time.perf_counter() - start
+                logger.info("Index %s after %.1fs (%d partitions)", self.status, self.load_seconds, len(self.managers))
+                self.ready_event.set()
+
+    def start_background_load(self):
+        """
+        Starts loading in a thread unless a load has succeeded or is under way; a failed
+        load is retried.
+        """
+        with self._start_lock:
+            # A failed loader may still be finishing; its status is final
+            if self.status not in ("not_started", "failed"):
+                return
+            self.status = "loading"
+            self.ready_event.clear()
+            self._loader = threading.Thread(target=self.load, name="index-loader", daemon=True)
+            self._loader.start()
+
+    async def wait_ready(self, timeout: float) -> bool:
+        """
+        Starts loading if nobody has yet (or the last load failed), then waits up to
+        `timeout` seconds. Returns True once the preloaded partitions can serve queries
+        (possibly degraded).
+        """
+        if not self.ready_event.is_set() or self.status == "failed":
+            self.start_background_load()
+            await self.ready_event.wait_async(timeout)
+        return self.status in ("ready", "degraded")
+
+    def route(self, jurisdiction: Optional[str]) -> List[str]:
+        """
+        Partitions searched for `jurisdiction`. None (warm-up, debug endpoints) searches
+        the partitions already loaded, without loading any others.
+        """
+        if jurisdiction is None:
+            return [m.partition for m in self._serving()]
+        return route(jurisdiction, self.routes, self.managers)
+
+    async def wait_partitions(self, partitions: List[str], timeout: float) -> List[str]:
+        """
+        Loads those of `partitions` nobody has loaded yet, waiting up to `timeout` seconds.
+        Returns the ones that can serve queries.
+        """
+        managers = [self.managers[name] for name in partitions]
+        if any(m.status not in ("ready", "degraded") for m in managers):
+            await asyncio.gather(*(m.wait_ready(timeout) for m in managers))
+        return [m.partition for m in managers if m.status in ("ready", "degraded")]
+
+    def _serving(self, partitions: Optional[List[str]] = None) -> List[IngestionManager]:
+        names = sorted(self.managers) if partitions is None else partitions
+        return [self.managers[name] for name in names if self.managers[name].status in ("ready", "degraded")]
+
+    def version_for(self, partitions: List[str]) -> str:
+        """
+        Identifies the contents of `partitions`; cached retrievals and answers are keyed on it.
+        """
+        digest = hashlib.sha256()
+        for name in partitions:
+            digest.update(f"{name}:{self.managers[name].version};".encode("utf-8"))
+        return digest.hexdigest()[:12]
+
+    @property
+    def version(self) -> str:
+        return self.version_for(sorted(self.managers))
+
+    @property
+    def nodes(self) -> List[BaseNode]:
+        return [node for m in self._serving() for node in m.nodes]
+
+    @property
+    def has_vectors(self) -> bool:
+        return any(m.index is not None for m in self._serving())
+
+    def state(self) -> dict:
+        managers = list(self.managers.values())
+        return {
+            "status": self.status,
+            "error": self.error,
+            "load_seconds": self.load_seconds,
+            "nodes": sum(len(m.nodes) for m in managers),
+            "parents": sum(len(m.parents) for m in managers),
+            "vector_index": any(m.index is not None for m in managers),
+            "keyword_index": any(m.keyword_index is not None for m in managers),
+            "version": self.version,
+            "partitions": {name: m.state() for name, m in sorted(self.managers.items())},
+        }
+
+    def sync(self, full: bool = False) -> dict:
+        """
+        Syncs every partition (a new corpus subdirectory becomes a partition) and totals
+        their changes; each partition's own summary is under "partitions".
+        """
+        self.load()
+        if not self.sync_lock.acquire(blocking=False):
+            raise RuntimeError("An ingestion run is already in progress.")
+        try:
+            summaries = {name: self.managers[name].sync(full) for name in self.discover()}
+        finally:
+            self._update_status()
+            self.sync_lock.release()
+        summary = {key: [p for s in summaries.values() for p in s[key]] for key in ("added", "changed", "removed")}
+        for key in ("unchanged", "nodes_added", "nodes_removed", "total_nodes"):
+            summary[key] = sum(s[key] for s in summaries.values())
+        summary["version"] = self.version
+        summary["partitions"] = summaries
+        return summary
+
+    @staticmethod
+    def _merged(retrievers: list, similarity_top_k: int):
+        retrievers = [r for r in retrievers if r is not None]
+        if len(retrievers) <= 1:
+            return retrievers[0] if retrievers else None
+        return MergedRetriever(retrievers, similarity_top_k)
+
+    def get_vector_retriever(self, similarity_top_k=config.CANDIDATE_POOL, partitions: Optional[List[str]] = None):
+        retrievers = [m.get_vector_retriever(similarity_top_k) for m in self._serving(partitions)]
+        return self._merged(retrievers, similarity_top_k)
+
+    def get_keyword_retriever(self, similarity_top_k=config.CANDIDATE_POOL, partitions: Optional[List[str]] = None):
+        retrievers = [m.get_keyword_retriever(similarity_top_k) for m in self._serving(partitions)]
+        return self._merged(retrievers, similarity_top_k)
+
+    def keyword_indexes(self, partitions: Optional[List[str]] = None) -> list:
+        return [m.keyword_index for m in self._serving(partitions) if m.keyword_index is not None]
+
+    def vector_search_batch(
+        self, embeddings: List[List[float]], similarity_top_k: int, partitions: Optional[List[str]] = None
+    ) -> Optional[List[List[NodeWithScore]]]:
+        batches = [m.vector_search_batch(embeddings, similarity_top_k) for m in self._serving(partitions)]
+        batches = [b for b in batches if b is not None]
+        if len(batches) <= 1:
+            return batches[0] if batches else None
+        return [merge_by_score(hits, similarity_top_k) for hits in zip(*batches)]
+
+    def node_embeddings(self, node_ids: List[str], partitions: Optional[List[str]] = None):
+        """
+        Unit-normalized stored embeddings for `node_ids`, each from its own partition
+        (None if any is unavailable).
+        """
+        managers = self._serving(partitions)
+        if len(managers) == 1:
+            return managers[0].node_embeddings(node_ids)
+        rows = {}
+        for manager in managers:
+            owned = [node_id for node_id in node_ids if node_id in manager.node_map]
+            if owned:
+                embeddings = manager.node_embeddings(owned)
+                if embeddings is None:
+                    return None
+                rows.update(zip(owned, embeddings))
+        if not node_ids or any(node_id not in rows for node_id in node_ids):
+            return None
+        return np.stack([rows[node_id] for node_id in node_ids])
+
+    def expand_to_parents(
+        self, nodes: List[NodeWithScore], max_tokens: int, partitions: Optional[List[str]] = None
+    ) -> List[NodeWithScore]:
+        parents = ChainMap(*(m.parents for m in self._serving(partitions)))
+        return expand_to_parents(nodes, parents, max_tokens)
+
+ingestion_manager = PartitionedIndex()
@@ -0,0 +1,280 @@
+import json
+import logging
+import os
+import re
+from collections import Counter
+from functools import lru_cache
+from typing import Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+import Stemmer
+from llama_index.core.base.base_retriever import BaseRetriever
+from llama_index.core.schema import BaseNode, NodeWithScore, QueryBundle
+
+from app.ingestion.string_table import StringTable
+
+logger = logging.getLogger(__name__)
+
+TOKEN_PATTERN = re.compile(r"(?u)\b\w\w+\b")
+
+# Same English stop word list the BM25Retriever (bm25s) used, so scores stay comparable.
+STOP_WORDS = frozenset({
+    "a", "an", "and", "are", "as", "at", "be", "but", "by", "for", "if", "in",
+    "into", "is", "it", "no", "not", "of", "on", "or", "such", "that", "the",
+    "their", "then", "there", "these", "they", "this", "to", "was", "will", "with",
+})
+
+META_FILE = "meta.json"
+ARRAY_FILES = ("term_offsets", "postings_docs", "postings_weights", "doc_lengths", "idf", "doc_offsets", "doc_terms")
+# String tables replacing meta.json's node ID and vocabulary lists in index snapshots
+STRING_FILES = ("node_ids", "vocab")
+
+_stemmer = Stemmer.Stemmer("english")
+# Per-node term sets kept per index; confidence scoring keeps asking about the same few hundred clauses
+TERM_SET_CACHE_SIZE = 2048
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Lowercases, drops stop words and stems. Used for both documents and queries.
+    """
+    tokens = [t for t in TOKEN_PATTERN.findall(text.lower()) if t not in STOP_WORDS]
+    return _stemmer.stemWords(tokens)
+
+
+class KeywordIndex:
+    """
+    Prebuilt BM25 index stored as a compact inverted file.
+
+    Postings for term `t` live in `postings_docs[term_offsets[t]:term_offsets[t + 1]]`
+    with the BM25 length-normalized term weight precomputed at build time, so a
+    query only touches the postings of its own terms.
+
+    The forward index `doc_terms[doc_offsets[d]:doc_offsets[d + 1]]` holds the sorted
+    distinct term IDs of document `d`, for token-level coverage checks.
+
+    `node_ids` and `vocab` are lists, or StringTables when loaded from an index snapshot
+    (see app.ingestion.snapshot), which then also back the term and document lookups.
+    """
+
+    def __init__(
+        self,
+        node_ids: Sequence[str],
+        vocab: Sequence[str],
+        term_offsets: np.ndarray,
+        postings_docs: np.ndarray,
+        postings_weights: np.ndarray,
+        doc_lengths: np.ndarray,
+        idf: np.ndarray,
+        doc_offsets: np.ndarray,
+        doc_terms: np.ndarray,
+        k1: float = 1.5,
+        b: float = 0.75,
+        term_ids: Optional[Mapping[str, int]] = None,
+        doc_index: Optional[Mapping[str, int]] = None,
+    ):
+        self.node_ids = node_ids
+        self.vocab = vocab
+        self.term_ids = term_ids if term_ids is not None else {term: i for i, term in enumerate(vocab)}
+        self.term_offsets = term_offsets
+        self.postings_docs = postings_docs
+        self.postings_weights = postings_weights
+        self.doc_lengths = doc_lengths
+        self.idf = idf
+        self.doc_offsets = doc_offsets
+        self.doc_terms = doc_terms
+        self.doc_index = doc_index if doc_index is not None else {node_id: i for i, node_id in enumerate(node_ids)}
+        self.k1 = k1
+        self.b = b
+        self._term_sets = lru_cache(maxsize=TERM_SET_CACHE_SIZE)(self._term_set)
+
+    @property
+    def num_docs(self) -> int:
+        return len(self.node_ids)
+
+    @classmethod
+    def build(cls, nodes: Iterable[BaseNode], k1: float = 1.5, b: float = 0.75) -> "KeywordIndex":
+        node_ids = []
+        doc_term_counts = []
+        for node in nodes:
+            node_ids.append(node.node_id)
+            doc_term_counts.append(Counter(tokenize(node.get_content())))
+
+        doc_lengths = np.array([sum(c.values()) for c in doc_term_counts], dtype=np.int32)
+        avgdl = float(doc_lengths.mean()) if len(doc_lengths) else 0.0
+
+        vocab = sorted({term for counts in doc_term_counts for term in counts})
+        term_ids = {term: i for i, term in enumerate(vocab)}
+
+        # Group (doc, tf) pairs by term
+        postings: List[List[Tuple[int, int]]] = [[] for _ in vocab]
+        for doc_id, counts in enumerate(doc_term_counts):
+            for term, tf in counts.items():
+                postings[term_ids[term]].append((doc_id, tf))
+
+        doc_freqs = np.array([len(p) for p in postings], dtype=np.int64)
+        term_offsets = np.zeros(len(vocab) + 1, dtype=np.int64)
+        np.cumsum(doc_freqs, out=term_offsets[1:])
+
+        postings_docs = np.empty(int(term_offsets[-1]), dtype=np.int32)
+        tfs = np.empty(int(term_offsets[-1]), dtype=np.float32)
+        for term_id, plist in enumerate(postings):
+            start = term_offsets[term_id]
+            for j, (doc_id, tf) in enumerate(plist):
+                postings_docs[start + j] = doc_id
+                tfs[start + j] = tf
+
+        # Lucene-style BM25 as scored by bm25s: idf * tf / (tf + k1 * (1 - b + b * dl / avgdl))
+        n = len(node_ids)
+        idf = np.log1p((n - doc_freqs + 0.5) / (doc_freqs + 0.5)).astype(np.float32)
+        if avgdl > 0:
+            norm = k1 * (1 - b + b * doc_lengths[postings_docs] / avgdl)
+        else:
+            norm = np.full_like(tfs, k1)
+        postings_weights = (tfs / (tfs + norm)).astype(np.float32)
+
+        doc_offsets = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum([len(counts) for counts in doc_term_counts], out=doc_offsets[1:])
+        doc_terms = np.empty(int(doc_offsets[-1]), dtype=np.int32)
+        for doc_id, counts in enumerate(doc_term_counts):
+            doc_terms[doc_offsets[doc_id]:doc_offsets[doc_id + 1]] = sorted(term_ids[t] for t in counts)
+
+        return cls(
+            node_ids, vocab, term_offsets, postings_docs, postings_weights, doc_lengths, idf,
+            doc_offsets, doc_terms, k1, b,
+        )
+
+    def persist(self, persist_dir: str, string_tables: bool = False):
+        """
+        Writes the arrays and meta.json; with `string_tables`, node IDs and terms go to
+        memory-mapped StringTables instead of meta.json (the index snapshot layout).
+        """
+        os.makedirs(persist_dir, exist_ok=True)
+        for name in ARRAY_FILES:
+            # Replaced rather than overwritten: a loaded index may still be mapping the old file
+            path = os.path.join(persist_dir, f"{name}.npy")
+            with open(path + ".tmp", "wb") as f:
+                np.save(f, getattr(self, name))
+            os.replace(path + ".tmp", path)
+        meta = {"k1": self.k1, "b": self.b}
+        for name in STRING_FILES:
+            if string_tables:
+                StringTable.save(os.path.join(persist_dir, name), getattr(self, name))
+            else:
+                meta[name] = list(getattr(self, name))
+        # Write metadata last so a partially written index is never picked up
+        tmp_path = os.path.join(persist_dir, META_FILE + ".tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, os.path.join(persist_dir, META_FILE))
+
+    @classmethod
+    def load(cls, persist_dir: str, mmap: bool = True) -> "KeywordIndex":
+        with open(os.path.join(persist_dir, META_FILE), "r") as f:
+            meta = json.load(f)
+        mmap_mode = "r" if mmap else None
+        # Plain ndarray views of the mapping: same pages, without np.memmap's per-slice overhead
+        arrays = {
+            name: np.asarray(np.load(os.path.join(persist_dir, f"{name}.npy"), mmap_mode=mmap_mode))
+            for name in ARRAY_FILES
+        }
+        if "node_ids" in meta:
+            return cls(meta["node_ids"], meta["vocab"], k1=meta["k1"], b=meta["b"], **arrays)
+        node_ids, vocab = (StringTable.load(os.path.join(persist_dir, name), mmap) for name in STRING_FILES)
+        return cls(
+            node_ids, vocab, k1=meta["k1"], b=meta["b"], term_ids=vocab.positions(), doc_index=node_ids.positions(), **arrays
+        )
+
+    def query_terms(self, query: str) -> tuple[int, np.ndarray]:
+        """
+        Returns (number of distinct query terms, IDs of those present in the vocabulary).
+        """
+        terms = set(tokenize(query))
+        return len(terms), np.array(sorted(self.term_ids[t] for t in terms if t in self.term_ids), dtype=np.int32)
+
+    def node_terms(self, node_id: str) -> np.ndarray:
+        doc = self.doc_index.get(node_id)
+        if doc is None:
+            return np.empty(0, dtype=np.int32)
+        return self.doc_terms[self.doc_offsets[doc]:self.doc_offsets[doc + 1]]
+
+    def node_term_set(self, node_id: str) -> Optional[frozenset]:
+        """
+        The node's distinct term IDs as a set (None if the node is not indexed here).
+        """
+        return self._term_sets(node_id)
+
+    def _term_set(self, node_id: str) -> Optional[frozenset]:
+        if node_id not in self.doc_index:
+            return None
+        return frozenset(self.node_terms(node_id).tolist())
+
+    def doc_freqs(self, term_ids: List[int]) -> List[int]:
+        ids = np.asarray(term_ids, dtype=np.int64)
+        return (self.term_offsets[ids + 1] - self.term_offsets[ids]).tolist()
+
+    def search(self, query: str, top_k: int = 3) -> List[Tuple[str, float]]:
+        """
+        Returns up to `top_k` (node_id, bm25_score) pairs, best first.
+        """
+        term_ids = {self.term_ids[t] for t in tokenize(query) if t in self.term_ids}
+        if not term_ids or top_k <= 0:
+            return []
+
+        docs = []
+        weights = []
+        for term_id in term_ids:
+            start, end = self.term_offsets[term_id], self.term_offsets[term_id + 1]
+            docs.append(self.postings_docs[start:end])
+            weights.append(self.postings_weights[start:end] * self.idf[term_id])
+
+        # Accumulate over matching documents only, never over the whole corpus
+        candidates, inverse = np.unique(np.concatenate(docs), return_inverse=True)
+        scores = np.bincount(inverse, weights=np.concatenate(weights))
+
+        k = min(top_k, len(candidates))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.lexsort((candidates[top], -scores[top]))]
+        return [(self.node_ids[candidates[i]], float(scores[i])) for i in top]
+
+
+class KeywordRetriever(BaseRetriever):
+    """
+    Thin retriever over a shared KeywordIndex; cheap to construct per request.
+    """
+
+    def __init__(self, keyword_index: KeywordIndex, node_map: Dict[str, BaseNode], similarity_top_k: int = 3):
+        self.keyword_index = keyword_index
+        self.node_map = node_map
+        self.similarity_top_k = similarity_top_k
+        super().__init__()
+
+    def _retrieve(self, query_bundle: QueryBundle) -> List[NodeWithScore]:
+        results = self.keyword_index.search(query_bundle.query_str, self.similarity_top_k)
+        return [
+            NodeWithScore(node=self.node_map[node_id], score=score)
+            for node_id, score in results
+            if node_id in self.node_map
+        ]
+
+
+def load_or_build(persist_dir: str, nodes: List[BaseNode]) -> Optional[KeywordIndex]:
+    """
+    Loads the persisted index if it covers exactly `nodes`, otherwise rebuilds and persists it.
+    """
+    if not nodes:
+        return None
+
+    if os.path.exists(os.path.join(persist_dir, META_FILE)):
+        try:
+            keyword_index = KeywordIndex.load(persist_dir)
+            if set(keyword_index.node_ids) == {n.node_id for n in nodes}:
+                return keyword_index
+            logger.info("Keyword index is stale. Rebuilding...")
+        except Exception as e:
+            logger.warning("Failed to load keyword index: %s. Rebuilding...", e)
+
+    keyword_index = KeywordIndex.build(nodes)
+    keyword_index.persist(persist_dir)
+    # Reopen memory-mapped so every request shares the same pages
+    return KeywordIndex.load(persist_dir)
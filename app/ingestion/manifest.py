@@ -0,0 +1,92 @@
+import hashlib
+import json
+import os
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+MANIFEST_FILE = "manifest.json"
+
+def file_sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def scan_corpus(corpus_dir: Path, keep: Optional[Callable[[str], bool]] = None) -> Dict[str, str]:
+    """
+    Returns {corpus-relative posix path: sha256} for every non-hidden file under `corpus_dir`
+    (only paths accepted by `keep`, if given; the others are never hashed).
+    """
+    files = {}
+    for path in sorted(Path(corpus_dir).rglob("*")):
+        rel = path.relative_to(corpus_dir)
+        if path.is_file() and not any(part.startswith(".") for part in rel.parts):
+            if keep is None or keep(rel.as_posix()):
+                files[rel.as_posix()] = file_sha256(path)
+    return files
+
+@dataclass
+class CorpusChanges:
+    added: List[str] = field(default_factory=list)
+    changed: List[str] = field(default_factory=list)
+    removed: List[str] = field(default_factory=list)
+    unchanged: List[str] = field(default_factory=list)
+
+    @property
+    def has_changes(self) -> bool:
+        return bool(self.added or self.changed or self.removed)
+
+class Manifest:
+    """
+    What the persisted index was built from: content hash, chunking mode and node IDs per
+    source file, plus the next free clause number so clause IDs are never reused.
+    """
+    def __init__(self, files: Dict[str, dict] = None, next_clause: int = 0):
+        self.files = files or {}
+        self.next_clause = next_clause
+
+    @classmethod
+    def load(cls, path: str) -> "Manifest":
+        with open(path, "r") as f:
+            data = json.load(f)
+        return cls(files=data["files"], next_clause=data["next_clause"])
+
+    def save(self, path: str):
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"files": self.files, "next_clause": self.next_clause}, f, indent=2)
+        os.replace(tmp_path, path)
+
+    def diff(self, current: Dict[str, str], chunking: str = None) -> CorpusChanges:
+        """
+        Files chunked with a different `chunking` mode than requested count as changed.
+        Entries from before chunking modes existed were sentence-chunked.
+        """
+        changes = CorpusChanges()
+        for rel_path, sha256 in current.items():
+            if rel_path not in self.files:
+                changes.added.append(rel_path)
+            elif self.files[rel_path]["sha256"] != sha256 or (
+                chunking is not None and self.files[rel_path].get("chunking", "sentence") != chunking
+            ):
+                changes.changed.append(rel_path)
+            else:
+                changes.unchanged.append(rel_path)
+        changes.removed = [rel_path for rel_path in self.files if rel_path not in current]
+        return changes
+
+    def allocate_clause_id(self) -> str:
+        clause_id = f"clause_{self.next_clause}"
+        self.next_clause += 1
+        return clause_id
+
+    def node_ids(self, rel_paths: List[str]) -> List[str]:
+        return [node_id for rel_path in rel_paths for node_id in self.files.get(rel_path, {}).get("node_ids", [])]
+
+    def record(self, rel_path: str, sha256: str, node_ids: List[str], chunking: str = "sentence"):
+        self.files[rel_path] = {"sha256": sha256, "node_ids": node_ids, "chunking": chunking}
+
+    def forget(self, rel_path: str):
+        self.files.pop(rel_path, None)
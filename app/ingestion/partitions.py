@@ -0,0 +1,56 @@
+from typing import Dict, Iterable, List, Sequence
+from llama_index.core.base.base_retriever import BaseRetriever
+from llama_index.core.schema import NodeWithScore, QueryBundle
+
+# Files at the corpus root belong to every jurisdiction
+SHARED_PARTITION = "shared"
+
+def partition_of(rel_path: str) -> str:
+    """
+    Partition of a corpus-relative path: its top-level directory, lowercased
+    ("GDPR/articles.pdf" -> "gdpr"), or the shared partition for files at the root.
+    """
+    head, sep, _ = rel_path.partition("/")
+    return head.lower() if sep else SHARED_PARTITION
+
+def parse_routes(spec: str) -> Dict[str, List[str]]:
+    """
+    "DPDP=dpdp|it_rules;GDPR=gdpr" -> {"DPDP": ["dpdp", "it_rules"], "GDPR": ["gdpr"]}.
+    """
+    routes = {}
+    for entry in spec.split(";"):
+        jurisdiction, _, partitions = entry.partition("=")
+        if jurisdiction.strip():
+            routes[jurisdiction.strip().upper()] = [p.strip().lower() for p in partitions.split("|") if p.strip()]
+    return routes
+
+def route(jurisdiction: str, routes: Dict[str, List[str]], available: Iterable[str]) -> List[str]:
+    """
+    Partitions a query for `jurisdiction` searches: its configured partitions (default:
+    the partition named after it) plus the shared one, limited to those that exist.
+    """
+    wanted = set(routes.get(jurisdiction.upper(), [jurisdiction.lower()])) | {SHARED_PARTITION}
+    return sorted(wanted & set(available))
+
+def merge_by_score(results: Sequence[List[NodeWithScore]], top_k: int) -> List[NodeWithScore]:
+    """
+    The `top_k` best of several partitions' hits, ties broken by node ID.
+    """
+    merged = [n for hits in results for n in hits]
+    merged.sort(key=lambda n: (-(n.score or 0.0), n.node.node_id))
+    return merged[:top_k]
+
+class MergedRetriever(BaseRetriever):
+    """
+    Runs one retriever per partition and keeps the `similarity_top_k` best hits overall.
+    Cosine scores compare directly across partitions; BM25 scores use each partition's
+    own IDF, which ranks a partition's rare terms slightly higher than a single index would.
+    """
+
+    def __init__(self, retrievers: List[BaseRetriever], similarity_top_k: int = 3):
+        self.retrievers = retrievers
+        self.similarity_top_k = similarity_top_k
+        super().__init__()
+
+    def _retrieve(self, query_bundle: QueryBundle) -> List[NodeWithScore]:
+        return merge_by_score([r.retrieve(query_bundle) for r in self.retrievers], self.similarity_top_k)
@@ -0,0 +1,223 @@
+import multiprocessing
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from itertools import groupby
+from typing import Callable, Iterator, List, Optional
+from llama_index.core import Document, SimpleDirectoryReader
+from llama_index.core.node_parser import SentenceSplitter
+from llama_index.core.readers.file.base import default_file_metadata_func
+from llama_index.core.schema import BaseNode, MetadataMode
+from pypdf import PdfReader
+from app.ingestion.structure import chunk_structured, is_parent
+
+# Same keys SimpleDirectoryReader hides from embeddings and prompts
+EXCLUDED_METADATA_KEYS = [
+    "file_name", "file_type", "file_size", "creation_date",
+    "last_modified_date", "last_accessed_date", "corpus_path", "partition",
+]
+
+@dataclass(frozen=True)
+class ParseTask:
+    """
+    One unit of parallel work: a whole file, or a page range of a PDF.
+    """
+    corpus_dir: str
+    rel_path: str
+    first_page: int = 0
+    last_page: Optional[int] = None  # exclusive; None = whole file
+
+@dataclass
+class IngestionStats:
+    files: int = 0
+    pages: int = 0
+    chunks: int = 0
+    embeddings: int = 0
+    parse_seconds: float = 0.0
+    embed_seconds: float = 0.0
+    store_seconds: float = 0.0
+    wall_seconds: float = 0.0
+
+    def as_dict(self) -> dict:
+        def rate(count, seconds):
+            return round(count / seconds, 1) if seconds > 0 else None
+        return {
+            "files": self.files,
+            "pages": self.pages,
+            "chunks": self.chunks,
+            "embeddings": self.embeddings,
+            "wall_seconds": round(self.wall_seconds, 2),
+            "pages_per_second": rate(self.pages, self.parse_seconds),
+            "chunks_per_second": rate(self.chunks, self.parse_seconds),
+            "embeddings_per_second": rate(self.embeddings, self.embed_seconds),
+            "stored_chunks_per_second": rate(self.chunks, self.store_seconds),
+        }
+
+def plan_tasks(corpus_dir: Path, rel_paths: List[str], pages_per_task: int) -> List[ParseTask]:
+    """
+    Splits large PDFs into page ranges so a single big file still spreads across workers.
+    """
+    tasks = []
+    for rel_path in rel_paths:
+        path = Path(corpus_dir) / rel_path
+        if path.suffix.lower() == ".pdf":
+            num_pages = len(PdfReader(str(path)).pages)
+            for first in range(0, max(num_pages, 1), pages_per_task):
+                tasks.append(ParseTask(str(corpus_dir), rel_path, first, min(first + pages_per_task, num_pages)))
+        else:
+            tasks.append(ParseTask(str(corpus_dir), rel_path))
+    return tasks
+
+def _load_documents(task: ParseTask) -> List[Document]:
+    path = str(Path(task.corpus_dir) / task.rel_path)
+    if task.last_page is None:
+        return SimpleDirectoryReader(input_files=[path]).load_data()
+
+    # One Document per page, with the same metadata as llama-index's PDFReader
+    file_metadata = default_file_metadata_func(path)
+    reader = PdfReader(path)
+    documents = []
+    for page in range(task.first_page, task.last_page):
+        metadata = dict(file_metadata, page_label=reader.page_labels[page])
+        documents.append(Document(text=reader.pages[page].extract_text(), metadata=metadata))
+    return documents
+
+def parse_task(task: ParseTask, chunk_size: int, chunk_overlap: int, chunking: str = "sentence") -> tuple[int, list]:
+    """
+    Runs in a worker process: load, then chunk. Returns (pages parsed, nodes). With
+    structural chunking the loaded documents are returned instead: rules run across
+    page ranges, so a file is chunked once all of its tasks are back.
+    """
+    documents = _load_documents(task)
+    for document in documents:
+        document.metadata["corpus_path"] = task.rel_path
+        document.metadata["source"] = document.metadata.get("file_name", "unknown")
+        document.excluded_embed_metadata_keys = list(EXCLUDED_METADATA_KEYS)
+        document.excluded_llm_metadata_keys = list(EXCLUDED_METADATA_KEYS)
+
+    if chunking == "structural":
+        return len(documents), documents
+    parser = SentenceSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    return len(documents), parser.get_nodes_from_documents(documents)
+
+class IngestionPipeline:
+    """
+    Parses and chunks files across a process pool and embeds the resulting nodes in
+    large batches, handing each embedded batch to `sink` as soon as it is ready so the
+    whole corpus is never held in memory at once.
+
+    `chunking` is "structural" (rule/section, sub-rule, clause and proviso boundaries,
+    see app/ingestion/structure.py) or "sentence" (fixed-size SentenceSplitter chunks).
+    """
+    def __init__(
+        self,
+        corpus_dir: Path,
+        chunk_size: int,
+        chunk_overlap: int,
+        workers: int = 0,
+        embed_batch_size: int = 256,
+        pages_per_task: int = 16,
+        chunking: str = "sentence",
+    ):
+        self.corpus_dir = Path(corpus_dir)
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.workers = workers or os.cpu_count() or 1
+        self.embed_batch_size = embed_batch_size
+        self.pages_per_task = pages_per_task
+        self.chunking = chunking
+
+    def iter_nodes(self, rel_paths: List[str], stats: IngestionStats) -> Iterator[BaseNode]:
+        """
+        Yields chunked nodes in corpus order (so clause IDs are deterministic).
+        """
+        tasks = plan_tasks(self.corpus_dir, rel_paths, self.pages_per_task)
+        stats.files += len(rel_paths)
+        if not tasks:
+            return
+
+        start = time.perf_counter()
+        if self.workers == 1 or len(tasks) == 1:
+            results = (parse_task(t, self.chunk_size, self.chunk_overlap, self.chunking) for t in tasks)
+        else:
+            results = self._parallel_results(tasks)
+        if self.chunking == "structural":
+            results = self._structured(tasks, results)
+
+        for pages, nodes in results:
+            stats.pages += pages
+            stats.chunks += len(nodes)
+            # Parse throughput is measured over the span in which results arrive
+            stats.parse_seconds = time.perf_counter() - start
+            yield from nodes
+
+    def _structured(self, tasks: List[ParseTask], results) -> Iterator[tuple[int, List[BaseNode]]]:
+        # Tasks of one file are consecutive; chunk each file once all of its pages are loaded
+        pairs = zip(tasks, results)
+        for _, file_results in groupby(pairs, key=lambda pair: pair[0].rel_path):
+            pages, documents = 0, []
+            for _, (task_pages, task_documents) in file_results:
+                pages += task_pages
+                documents.extend(task_documents)
+            yield pages, chunk_structured(documents, self.chunk_size, self.chunk_overlap)
+
+    def _parallel_results(self, tasks: List[ParseTask]) -> Iterator[tuple[int, List[BaseNode]]]:
+        # spawn: workers never inherit the parent's torch/tokenizer threads
+        context = multiprocessing.get_context("spawn")
+        workers = min(self.workers, len(tasks))
+        # Bounded look-ahead so parsed-but-unembedded nodes cannot pile up in memory
+        window = 2 * workers
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+            pending = deque()
+            for task in tasks:
+                pending.append(executor.submit(parse_task, task, self.chunk_size, self.chunk_overlap, self.chunking))
+                if len(pending) >= window:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+
+    def run(
+        self,
+        rel_paths: List[str],
+        decorate: Callable[[BaseNode], None],
+        sink: Optional[Callable[[List[BaseNode]], None]],
+        embed_model=None,
+    ) -> IngestionStats:
+        """
+        Streams nodes for `rel_paths` through `decorate` (e.g. clause ID assignment), embeds
+        them in batches with `embed_model` and passes each batch to `sink`.
+        Without an embed model, batches are handed over unembedded. Parent nodes from
+        structural chunking are passed through without embeddings.
+        """
+        stats = IngestionStats()
+        wall_start = time.perf_counter()
+        batch = []
+
+        def flush():
+            leaves = [n for n in batch if not is_parent(n)]
+            if embed_model is not None and leaves:
+                start = time.perf_counter()
+                texts = [n.get_content(metadata_mode=MetadataMode.EMBED) for n in leaves]
+                for node, embedding in zip(leaves, embed_model.get_text_embedding_batch(texts)):
+                    node.embedding = embedding
+                stats.embeddings += len(leaves)
+                stats.embed_seconds += time.perf_counter() - start
+            if sink is not None:
+                start = time.perf_counter()
+                sink(list(batch))
+                stats.store_seconds += time.perf_counter() - start
+            batch.clear()
+
+        for node in self.iter_nodes(rel_paths, stats):
+            decorate(node)
+            batch.append(node)
+            if len(batch) >= self.embed_batch_size:
+                flush()
+        if batch:
+            flush()
+
+        stats.wall_seconds = time.perf_counter() - wall_start
+        return stats
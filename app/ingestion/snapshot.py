@@ -0,0 +1,165 @@
+import json
+import os
+import shutil
+import time
+import uuid
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Iterable, Iterator, Mapping, Optional
+
+import numpy as np
+from llama_index.core.schema import BaseNode
+from llama_index.core.storage.docstore.utils import doc_to_json, json_to_doc
+
+from app.ingestion.keyword_index import META_FILE as KEYWORD_META_FILE, KeywordIndex
+from app.ingestion.string_table import StringTable
+from app.ingestion.vector_store import META_FILE as VECTOR_META_FILE, VECTOR_DIR, MmapVectorStore
+
+# Under each partition's persist directory: snapshots/<version>-<id>/ and the CURRENT pointer
+SNAPSHOTS_DIR = "snapshots"
+CURRENT_FILE = "CURRENT"
+META_FILE = "meta.json"
+# Decoded nodes kept per table; retrieval keeps returning the same few hundred clauses
+NODE_CACHE_SIZE = 4096
+
+
+class NodeTable(Mapping[str, BaseNode]):
+    """
+    Nodes serialized back to back in one memory-mapped byte array, looked up by ID and
+    decoded on access (the most recently used are kept). Workers attached to the same
+    snapshot share its pages instead of each parsing the docstore into objects.
+    """
+
+    def __init__(self, ids: StringTable, data: np.ndarray, offsets: np.ndarray):
+        self.ids = ids
+        self.rows = ids.positions()
+        self.data = data
+        self.offsets = offsets
+        self._decode = lru_cache(maxsize=NODE_CACHE_SIZE)(self._decode_row)
+
+    @staticmethod
+    def save(path: str, nodes: Iterable[BaseNode]):
+        nodes = list(nodes)
+        os.makedirs(path, exist_ok=True)
+        blobs = [json.dumps(doc_to_json(node)).encode("utf-8") for node in nodes]
+        offsets = np.zeros(len(blobs) + 1, dtype=np.int64)
+        np.cumsum([len(blob) for blob in blobs], out=offsets[1:])
+        np.save(os.path.join(path, "data.npy"), np.frombuffer(b"".join(blobs), dtype=np.uint8))
+        np.save(os.path.join(path, "offsets.npy"), offsets)
+        StringTable.save(os.path.join(path, "ids"), [node.node_id for node in nodes])
+
+    @classmethod
+    def load(cls, path: str) -> "NodeTable":
+        return cls(
+            StringTable.load(os.path.join(path, "ids")),
+            np.asarray(np.load(os.path.join(path, "data.npy"), mmap_mode="r")),
+            np.asarray(np.load(os.path.join(path, "offsets.npy"), mmap_mode="r")),
+        )
+
+    def _decode_row(self, row: int) -> BaseNode:
+        return json_to_doc(json.loads(self.data[self.offsets[row]:self.offsets[row + 1]].tobytes()))
+
+    def __getitem__(self, node_id: str) -> BaseNode:
+        return self._decode(self.rows[node_id])
+
+    def __contains__(self, node_id) -> bool:
+        return node_id in self.rows
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.ids)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+
+@dataclass
+class Snapshot:
+    name: str
+    meta: dict
+    nodes: NodeTable
+    parents: NodeTable
+    vector_store: Optional[MmapVectorStore]
+    keyword_index: Optional[KeywordIndex]
+
+    @property
+    def version(self) -> str:
+        return self.meta["version"]
+
+
+def current_snapshot(persist_dir: str) -> Optional[str]:
+    """
+    Name of the snapshot CURRENT points to, if any.
+    """
+    try:
+        with open(os.path.join(persist_dir, SNAPSHOTS_DIR, CURRENT_FILE), "r") as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def snapshot_meta(persist_dir: str, name: str) -> Optional[dict]:
+    try:
+        with open(os.path.join(persist_dir, SNAPSHOTS_DIR, name, META_FILE), "r") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def publish_snapshot(manager, source: str) -> str:
+    """
+    Writes the index `manager` has loaded (nodes, parents, saved vectors, keyword index)
+    as a new snapshot, points CURRENT at it and deletes the older ones. `source`
+    identifies the persisted index it was taken from. Returns the snapshot's name.
+
+    Readers of a deleted snapshot keep their mappings; callers hold the partition's
+    snapshot lock, so nobody is half-way through attaching to it.
+    """
+    root = os.path.join(manager.persist_dir, SNAPSHOTS_DIR)
+    name = f"{manager.version or 'empty'}-{uuid.uuid4().hex[:8]}"
+    path = os.path.join(root, name)
+    os.makedirs(path)
+
+    NodeTable.save(os.path.join(path, "nodes"), manager.nodes)
+    NodeTable.save(os.path.join(path, "parents"), manager.parents.values())
+    if manager.vector_store is not None:
+        manager.vector_store.save(manager.vector_persist_dir)
+        manager.vector_store.snapshot(os.path.join(path, VECTOR_DIR))
+    if manager.keyword_index is not None:
+        manager.keyword_index.persist(os.path.join(path, "keyword"), string_tables=True)
+    meta = {"version": manager.version, "source": source, "error": manager.error, "created": time.time()}
+    with open(os.path.join(path, META_FILE), "w") as f:
+        json.dump(meta, f)
+
+    # CURRENT names the live snapshot; replacing it is the switch-over
+    tmp_path = os.path.join(root, CURRENT_FILE + ".tmp")
+    with open(tmp_path, "w") as f:
+        f.write(name)
+    os.replace(tmp_path, os.path.join(root, CURRENT_FILE))
+    for other in os.listdir(root):
+        if other != name and os.path.isdir(os.path.join(root, other)):
+            shutil.rmtree(os.path.join(root, other), ignore_errors=True)
+    return name
+
+
+def open_snapshot(persist_dir: str, name: str, **vector_params) -> Snapshot:
+    """
+    Memory-maps snapshot `name`; nothing is parsed or copied up front but its meta.json.
+    """
+    path = os.path.join(persist_dir, SNAPSHOTS_DIR, name)
+    meta = snapshot_meta(persist_dir, name)
+    if meta is None:
+        raise FileNotFoundError(f"No index snapshot {name} in {persist_dir}")
+    vector_dir, keyword_dir = os.path.join(path, VECTOR_DIR), os.path.join(path, "keyword")
+    return Snapshot(
+        name=name,
+        meta=meta,
+        nodes=NodeTable.load(os.path.join(path, "nodes")),
+        parents=NodeTable.load(os.path.join(path, "parents")),
+        vector_store=(
+            MmapVectorStore.load(vector_dir, **vector_params)
+            if os.path.exists(os.path.join(vector_dir, VECTOR_META_FILE)) else None
+        ),
+        keyword_index=(
+            KeywordIndex.load(keyword_dir) if os.path.exists(os.path.join(keyword_dir, KEYWORD_META_FILE)) else None
+        ),
+    )
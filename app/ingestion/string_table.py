@@ -0,0 +1,82 @@
+from typing import Iterator, Mapping, Optional, Sequence
+
+import numpy as np
+
+
+class StringTable(Sequence[str]):
+    """
+    Read-only list of strings (node IDs, terms) kept as fixed-width UTF-8 arrays on disk
+    and memory-mapped on load, plus a sorted copy for lookups by binary search. Every
+    process reading the files shares their pages instead of building its own list and
+    dict. `positions()` is the {string: position} view.
+    """
+
+    def __init__(self, values: np.ndarray, sorted_values: np.ndarray, order: np.ndarray):
+        self.values = values
+        self.sorted_values = sorted_values
+        self.order = order
+
+    @staticmethod
+    def save(prefix: str, strings: Sequence[str]):
+        """
+        Writes `<prefix>.npy` (in order) and `<prefix>.sorted.npy` / `<prefix>.order.npy` (the lookup).
+        """
+        values = np.array([s.encode("utf-8") for s in strings], dtype=bytes)
+        order = np.argsort(values, kind="stable")
+        np.save(f"{prefix}.npy", values)
+        np.save(f"{prefix}.sorted.npy", values[order])
+        np.save(f"{prefix}.order.npy", order)
+
+    @classmethod
+    def load(cls, prefix: str, mmap: bool = True) -> "StringTable":
+        mmap_mode = "r" if mmap else None
+        # Plain ndarray views of the mapping: same pages, without np.memmap's per-slice overhead
+        return cls(*(
+            np.asarray(np.load(f"{prefix}{suffix}.npy", mmap_mode=mmap_mode)) for suffix in ("", ".sorted", ".order")
+        ))
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [value.decode("utf-8") for value in self.values[i]]
+        return self.values[i].decode("utf-8")
+
+    def __iter__(self) -> Iterator[str]:
+        for value in self.values:
+            yield value.decode("utf-8")
+
+    def position(self, string: str) -> Optional[int]:
+        key = string.encode("utf-8")
+        i = int(np.searchsorted(self.sorted_values, key))
+        if i < len(self.sorted_values) and self.sorted_values[i] == key:
+            return int(self.order[i])
+        return None
+
+    def positions(self) -> "Positions":
+        return Positions(self)
+
+
+class Positions(Mapping[str, int]):
+    """
+    {string: position} over a StringTable, without materializing a dict.
+    """
+
+    def __init__(self, table: StringTable):
+        self.table = table
+
+    def __getitem__(self, string: str) -> int:
+        position = self.table.position(string)
+        if position is None:
+            raise KeyError(string)
+        return position
+
+    def __contains__(self, string) -> bool:
+        return isinstance(string, str) and self.table.position(string) is not None
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.table)
+
+    def __len__(self) -> int:
+        return len(self.table)
@@ -0,0 +1,263 @@
+import re
+from dataclasses import dataclass, field
+from typing import List, Optional, Tuple
+from llama_index.core import Document
+from llama_index.core.node_parser import SentenceSplitter
+from llama_index.core.schema import BaseNode, NodeRelationship, TextNode
+from llama_index.core.utils import get_tokenizer
+
+# "21.Registration to be cancelled in certain cases .-" / "[ 21A Suspension of registration.-"
+RULE_HEADING = re.compile(r"^\s*\[?\s*(\d{1,3})\s*([A-Z]{0,2})\s*\.?\s*([A-Z][^\n]{2,200}?)\s*\.\s*[-–—]+\s*")
+# "SECTION 16: INPUT TAX CREDIT"
+SECTION_HEADING = re.compile(r"^\s*SECTION\s+(\d{1,3})\s*([A-Z]{0,2})\s*[:.]\s*(.+?)\s*$")
+SUB_RULE = re.compile(r"^\s*\[?\s*\((\d{1,3})([A-Z]{0,2})\)")
+CLAUSE = re.compile(r"^\s*\[?\s*\(([a-z]{1,2})\)")
+PROVISO = re.compile(r"^\s*\[?\s*Provided\b")
+PAGE_HEADER = re.compile(r"^\s*Page \d+ of \d+\s*$")
+# Amendment footnote markers after a closing bracket: "[or both]29 in violation"
+FOOTNOTE_REF = re.compile(r"\]\s?\d{1,3}(?=[\s,.;:)\]]|[a-z]|$)")
+FOOTNOTE_LINE = re.compile(r"^\s*\d{1,3}\s*[A-Z]")
+
+# A unit up to this size is one leaf; larger units are split into their sub-rules, clauses and provisos
+SPLIT_TOKENS = 256
+# A parent's lead-in ("... if the said person,-") is repeated in its children's text when this short
+LEAD_IN_TOKENS = 64
+# Later rules may skip a few numbers (omitted rules); a bigger jump is a stray number, not a heading
+MAX_RULE_GAP = 5
+
+RULE, SUB_RULE_LEVEL, CLAUSE_LEVEL, PROVISO_LEVEL = "rule", "sub_rule", "clause", "proviso"
+
+@dataclass
+class Unit:
+    """
+    One structural unit (rule or section, sub-rule, clause, proviso) and its children.
+    `lines` is the unit's own text up to its first child.
+    """
+    level: str
+    citation: str
+    title: str = ""
+    page_label: Optional[str] = None
+    lines: List[str] = field(default_factory=list)
+    children: List["Unit"] = field(default_factory=list)
+    # Numbering state for children, to tell "(2) of section 31" on a wrapped line from sub-rule (2)
+    last_sub_rule: Optional[Tuple[int, str]] = None
+    last_clause: Optional[str] = None
+    provisos: int = 0
+    # Numbered rule lines come from PDF extraction; "SECTION n:" files are curated excerpts that skip numbers
+    strict: bool = True
+
+    @property
+    def own_text(self) -> str:
+        return "\n".join(self.lines).strip()
+
+    @property
+    def full_text(self) -> str:
+        parts = [self.own_text] + [child.full_text for child in self.children]
+        return "\n".join(part for part in parts if part)
+
+def count_tokens(text: str) -> int:
+    return len(get_tokenizer()(text))
+
+def clean_page(text: str) -> str:
+    """
+    Drops the "Page N of M" header and the amendment footnotes below the page's
+    separator line, and strips footnote markers from the body.
+    """
+    lines = text.split("\n")
+    for i in range(len(lines) - 1, 0, -1):
+        # Footnotes sit under a long run of spaces, one "29Inserted vide Notf ..." per line
+        if len(lines[i]) >= 20 and not lines[i].strip():
+            rest = [line for line in lines[i + 1:] if line.strip()]
+            if rest and FOOTNOTE_LINE.match(rest[0]):
+                lines = lines[:i]
+            break
+    lines = [line for line in lines if not PAGE_HEADER.match(line)]
+    return FOOTNOTE_REF.sub("]", "\n".join(lines))
+
+def _heading(line: str, last_rule: Optional[Tuple[int, str]]):
+    """
+    (prefix, number, suffix, title, rest of line) if `line` starts a rule or section
+    numbered after `last_rule`, else None.
+    """
+    for prefix, pattern in (("Section", SECTION_HEADING), ("Rule", RULE_HEADING)):
+        match = pattern.match(line)
+        if not match:
+            continue
+        number, suffix = int(match.group(1)), match.group(2)
+        # "SECTION n:" is unambiguous; a numbered rule line must follow the previous rule closely
+        if prefix == "Rule" and last_rule is not None and not (
+            last_rule < (number, suffix) and number <= last_rule[0] + MAX_RULE_GAP
+        ):
+            return None
+        rest = line[match.end():] if prefix == "Rule" else ""
+        return prefix, number, suffix, match.group(3).strip(" .[]"), rest
+    return None
+
+def _next_letter(letter: str) -> str:
+    return chr(ord(letter[0]) + 1)
+
+def parse_units(pages: List[Tuple[Optional[str], str]]) -> Tuple[List[str], List[Unit]]:
+    """
+    Parses (page label, text) pages into rules/sections with nested sub-rules, clauses
+    and provisos. Markers count only at the start of a line and only in sequence, so a
+    wrapped "(2) of section 31" stays in the text. Returns (preamble lines, units).
+    """
+    preamble, units = [], []
+    last_rule = None
+    rule = sub_rule = current = None
+    for label, text in pages:
+        for line in text.split("\n"):
+            heading = _heading(line, last_rule)
+            if heading:
+                prefix, number, suffix, title, rest = heading
+                last_rule = (number, suffix)
+                rule = Unit(RULE, f"{prefix} {number}{suffix}", title, label, [line[:len(line) - len(rest)].strip()])
+                rule.strict = prefix == "Rule"
+                units.append(rule)
+                sub_rule, current = None, rule
+                line = rest
+                if not line.strip():
+                    continue
+            if rule is None:
+                preamble.append(line)
+                continue
+
+            sub_match, clause_match = SUB_RULE.match(line), CLAUSE.match(line)
+            if sub_match:
+                number = (int(sub_match.group(1)), sub_match.group(2))
+                if rule.last_sub_rule is None:
+                    # Sub-rule (1), or whatever directly follows the heading
+                    expected = number[0] == 1 or not rule.strict or current is rule and len(rule.lines) == 1
+                else:
+                    expected = rule.last_sub_rule < number and (not rule.strict or number[0] <= rule.last_sub_rule[0] + 3)
+                if expected:
+                    rule.last_sub_rule = number
+                    sub_rule = Unit(SUB_RULE_LEVEL, f"{rule.citation}({number[0]}{number[1]})", rule.title, label)
+                    rule.children.append(sub_rule)
+                    current = sub_rule
+            elif clause_match and current.level != PROVISO_LEVEL:
+                parent = sub_rule or rule
+                letter = clause_match.group(1)
+                expected = (
+                    letter == "a" if parent.last_clause is None
+                    else letter == _next_letter(parent.last_clause)
+                    or (len(letter) == 2 and letter[0] == parent.last_clause[0])
+                )
+                if expected:
+                    parent.last_clause = letter
+                    current = Unit(CLAUSE_LEVEL, f"{parent.citation}({letter})", rule.title, label)
+                    parent.children.append(current)
+            elif PROVISO.match(line):
+                parent = sub_rule or rule
+                parent.provisos += 1
+                suffix = "" if parent.provisos == 1 else f" {parent.provisos}"
+                current = Unit(PROVISO_LEVEL, f"{parent.citation}, proviso{suffix}", rule.title, label)
+                parent.children.append(current)
+            current.lines.append(line)
+    return preamble, units
+
+def is_parent(node: BaseNode) -> bool:
+    """
+    Parent nodes hold a whole split rule or sub-rule for expansion; only leaves are indexed.
+    """
+    return NodeRelationship.CHILD in node.relationships
+
+def _lead(unit: Unit) -> str:
+    # A rule's own text without its heading line
+    lines = unit.lines[1:] if unit.level == RULE else unit.lines
+    return "\n".join(lines).strip()
+
+def chunk_structured(documents: List[Document], chunk_size: int, chunk_overlap: int) -> List[BaseNode]:
+    """
+    Structural chunking for one source file (its documents in page order): one leaf per
+    rule/section, or per sub-rule, clause and proviso when the rule is large, each with
+    a citation `clause_id` ("Rule 46(b)", "Section 16(3)(a)") and a PARENT link to the
+    node holding the whole rule or sub-rule. Leaves over `chunk_size` are split further
+    under the same citation. Text before the first heading (notification lists, contents)
+    is sentence-chunked without a citation. Returns leaves followed by their parents.
+    """
+    if not documents:
+        return []
+    base_metadata = {k: v for k, v in documents[0].metadata.items() if k != "page_label"}
+    excluded = list(documents[0].excluded_embed_metadata_keys) + ["title", "level", "tokens"]
+    splitter = SentenceSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+
+    def text_nodes(text: str, unit: Unit) -> List[TextNode]:
+        nodes = []
+        for chunk in splitter.split_text(text):
+            node = TextNode(
+                text=chunk,
+                metadata=dict(base_metadata, clause_id=unit.citation, title=unit.title, level=unit.level),
+                excluded_embed_metadata_keys=excluded,
+                excluded_llm_metadata_keys=excluded,
+            )
+            if unit.page_label is not None:
+                node.metadata["page_label"] = unit.page_label
+            nodes.append(node)
+        return nodes
+
+    def build(unit: Unit, context: str) -> Tuple[List[TextNode], List[TextNode]]:
+        """
+        (leaves, parents) for `unit`. Leaves carry `context` (the rule heading, plus a
+        short parent lead-in such as "... if the said person,-") so a clause read on its
+        own still says what it qualifies.
+        """
+        full_text = unit.full_text
+        if not unit.children or count_tokens(full_text) <= SPLIT_TOKENS:
+            return text_nodes(f"{context}\n{full_text}" if context else full_text, unit), []
+
+        lead = _lead(unit)
+        child_context = context or unit.lines[0]
+        children, leaves, parents = [], [], []
+        if lead and count_tokens(lead) <= LEAD_IN_TOKENS:
+            child_context = f"{child_context}\n{lead}"
+        elif lead:
+            own = text_nodes(f"{context}\n{unit.own_text}" if context else unit.own_text, unit)
+            leaves.extend(own)
+            children.extend(own)
+        for child in unit.children:
+            child_leaves, child_parents = build(child, child_context)
+            leaves.extend(child_leaves)
+            parents.extend(child_parents)
+            # A split child is represented by its own parent node (built last)
+            children.extend(child_parents[-1:] or child_leaves)
+
+        parent = TextNode(
+            text=full_text,
+            metadata=dict(
+                base_metadata, clause_id=unit.citation, title=unit.title, level=unit.level,
+                tokens=count_tokens(full_text),
+            ),
+            excluded_embed_metadata_keys=excluded,
+            excluded_llm_metadata_keys=excluded,
+        )
+        if unit.page_label is not None:
+            parent.metadata["page_label"] = unit.page_label
+        parent.relationships[NodeRelationship.CHILD] = [child.as_related_node_info() for child in children]
+        for child in children:
+            child.relationships[NodeRelationship.PARENT] = parent.as_related_node_info()
+        parents.append(parent)
+        return leaves, parents
+
+    pages = [(d.metadata.get("page_label"), clean_page(d.text)) for d in documents]
+    preamble, units = parse_units(pages)
+    if not units:
+        return splitter.get_nodes_from_documents(documents)
+
+    nodes: List[BaseNode] = []
+    preamble_text = "\n".join(preamble).strip()
+    if preamble_text:
+        front = Document(
+            text=preamble_text,
+            metadata=dict(documents[0].metadata),
+            excluded_embed_metadata_keys=list(documents[0].excluded_embed_metadata_keys),
+            excluded_llm_metadata_keys=list(documents[0].excluded_llm_metadata_keys),
+        )
+        nodes.extend(splitter.get_nodes_from_documents([front]))
+
+    all_parents = []
+    for unit in units:
+        leaves, parents = build(unit, "")
+        nodes.extend(leaves)
+        all_parents.extend(parents)
+    return nodes + all_parents
@@ -0,0 +1,553 @@
+import json
+import os
+import shutil
+import threading
+import uuid
+from dataclasses import dataclass, field, replace
+from typing import Any, Callable, Dict, List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+from llama_index.core.base.base_retriever import BaseRetriever
+from llama_index.core.bridge.pydantic import PrivateAttr
+from llama_index.core.schema import BaseNode, NodeWithScore, QueryBundle
+from llama_index.core.vector_stores.types import (
+    BasePydanticVectorStore,
+    MetadataFilters,
+    VectorStoreQuery,
+    VectorStoreQueryMode,
+    VectorStoreQueryResult,
+)
+
+from app.ingestion.string_table import StringTable
+
+META_FILE = "meta.json"
+# StorageContext.persist hands the store a JSON path; the arrays go in this directory next to it
+VECTOR_DIR = "vectors"
+DTYPES = {"float32": np.float32, "float16": np.float16, "int8": np.int8}
+# Rows scored per matrix product. Quantized rows are widened to float32 per block, in
+# cache-sized blocks; per-row int8 scales are applied to the scores, not the rows.
+BLOCK_ROWS = 65536
+QUANTIZED_BLOCK_ROWS = 4096
+KMEANS_ITERATIONS = 10
+KMEANS_SAMPLE_PER_LIST = 32
+
+
+def _normalize(matrix) -> np.ndarray:
+    matrix = np.asarray(matrix, dtype=np.float32)
+    if matrix.ndim == 1:
+        matrix = matrix[None, :]
+    return matrix / np.linalg.norm(matrix, axis=1, keepdims=True).clip(min=1e-12)
+
+
+def _quantize(rows: np.ndarray, dtype: str) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """
+    (codes, per-row scales) for unit-normalized float32 rows. int8 uses one symmetric
+    scale per row; float32/float16 need none.
+    """
+    if dtype != "int8":
+        return rows.astype(DTYPES[dtype]), None
+    scales = (np.abs(rows).max(axis=1) / 127.0).clip(min=1e-12).astype(np.float32)
+    return np.round(rows / scales[:, None]).astype(np.int8), scales
+
+
+def _assign(rows: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    assignment = np.empty(len(rows), dtype=np.int64)
+    for start in range(0, len(rows), BLOCK_ROWS):
+        assignment[start:start + BLOCK_ROWS] = np.argmax(rows[start:start + BLOCK_ROWS] @ centroids.T, axis=1)
+    return assignment
+
+
+def train_centroids(sample: np.ndarray, lists: int, iterations: int = KMEANS_ITERATIONS, seed: int = 0) -> np.ndarray:
+    """
+    Spherical k-means over unit-normalized rows; empty lists are re-seeded from the sample.
+    """
+    rng = np.random.default_rng(seed)
+    lists = min(lists, len(sample))
+    centroids = sample[rng.choice(len(sample), lists, replace=False)].copy()
+    for _ in range(iterations):
+        assignment = _assign(sample, centroids)
+        order = np.argsort(assignment, kind="stable")
+        counts = np.bincount(assignment, minlength=lists)
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+        filled = counts > 0
+        centroids[filled] = np.add.reduceat(sample[order], starts[filled], axis=0)
+        centroids[~filled] = sample[rng.choice(len(sample), int((~filled).sum()), replace=False)]
+        centroids = _normalize(centroids)
+    return centroids
+
+
+def _top_k(scores: np.ndarray, keys: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    # Row-wise best k of (m, n) scores, unordered
+    if scores.shape[1] <= k:
+        return scores, keys
+    top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    return np.take_along_axis(scores, top, axis=1), np.take_along_axis(keys, top, axis=1)
+
+
+@dataclass(frozen=True)
+class Segment:
+    """
+    One saved generation: quantized rows (memory-mapped), their IDs and optional IVF
+    lists. `dead` marks rows deleted since the save; it is replaced, never mutated, so
+    a search can keep using the segment it started with. IDs are lists, or StringTables
+    in an index snapshot.
+    """
+    ids: Sequence[str] = field(default_factory=list)
+    ref_doc_ids: Sequence[str] = field(default_factory=list)
+    rows: Mapping[str, int] = field(default_factory=dict)
+    codes: Optional[np.ndarray] = None
+    scales: Optional[np.ndarray] = None
+    centroids: Optional[np.ndarray] = None
+    list_offsets: Optional[np.ndarray] = None
+    dead: Optional[np.ndarray] = None
+
+    @property
+    def block_rows(self) -> int:
+        return BLOCK_ROWS if self.codes.dtype == np.float32 else QUANTIZED_BLOCK_ROWS
+
+    def gather(self, rows: np.ndarray) -> np.ndarray:
+        block = self.codes[rows].astype(np.float32)
+        return block * self.scales[rows, None] if self.scales is not None else block
+
+    def _score_range(self, queries, start, end, best, k):
+        block = self.codes[start:end]
+        scores = queries @ (block if block.dtype == np.float32 else block.astype(np.float32)).T
+        if self.scales is not None:
+            scores *= self.scales[start:end]
+        if self.dead is not None:
+            scores[:, self.dead[start:end]] = -np.inf
+        keys = np.broadcast_to(np.arange(start, end), scores.shape)
+        return _top_k(np.hstack([best[0], scores]), np.hstack([best[1], keys]), k)
+
+    def search(self, queries: np.ndarray, k: int, nprobe: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        (scores, row numbers) of the best `k` rows per query, unordered; -inf pads.
+        """
+        m = len(queries)
+        best = (np.empty((m, 0), dtype=np.float32), np.empty((m, 0), dtype=np.int64))
+        if self.codes is None or not len(self.ids):
+            return best
+        if self.centroids is None:
+            for start in range(0, len(self.ids), self.block_rows):
+                best = self._score_range(queries, start, min(start + self.block_rows, len(self.ids)), best, k)
+            return best
+
+        # IVF: each query scans only the rows of its `nprobe` closest lists
+        probes = min(nprobe, len(self.centroids))
+        closest = np.argpartition(-(queries @ self.centroids.T), probes - 1, axis=1)[:, :probes]
+        scores = np.full((m, k), -np.inf, dtype=np.float32)
+        keys = np.zeros((m, k), dtype=np.int64)
+        for i, lists in enumerate(closest):
+            found = (best[0][:1], best[1][:1])
+            for l in np.sort(lists):
+                start, end = int(self.list_offsets[l]), int(self.list_offsets[l + 1])
+                if end > start:
+                    found = self._score_range(queries[i:i + 1], start, end, found, k)
+            width = found[0].shape[1]
+            scores[i, :width], keys[i, :width] = found[0][0], found[1][0]
+        return scores, keys
+
+
+@dataclass(frozen=True)
+class Delta:
+    """
+    Rows added since the last save, searched exactly. Chunks are concatenated on first use.
+    """
+    ids: List[str] = field(default_factory=list)
+    ref_doc_ids: List[str] = field(default_factory=list)
+    chunks: List[np.ndarray] = field(default_factory=list)
+
+    @property
+    def matrix(self) -> Optional[np.ndarray]:
+        if not self.chunks:
+            return None
+        if len(self.chunks) > 1:
+            # Benign race: concurrent readers may both concatenate the same chunks
+            self.chunks[:] = [np.concatenate(self.chunks)]
+        return self.chunks[0]
+
+
+class MmapVectorStore(BasePydanticVectorStore):
+    """
+    Vector store holding unit-normalized embeddings in one contiguous array on disk
+    (float32, or float16/int8 quantized), memory-mapped on load, so startup neither
+    parses nor copies the vectors and every process shares the same pages.
+
+    Below `ann_threshold` rows a query is an exact blocked matrix product. From there
+    on `save()` also trains an IVF index: rows are stored grouped by their nearest of
+    `lists` k-means centroids and a query scans only the `nprobe` closest lists.
+
+    Additions since the last save are searched exactly from memory; deletions mask
+    stored rows. `save()` compacts both into a new generation of files and switches
+    to it by replacing `meta.json`. Scores are cosine similarities, as in
+    SimpleVectorStore. Readers work on an immutable (segment, delta) snapshot, so a
+    search never blocks on ingestion.
+    """
+
+    stores_text: bool = False
+    dtype: str = "float32"
+    ann_threshold: int = 50000
+    lists: int = 0  # 0: sqrt(rows)
+    nprobe: int = 16
+
+    _state: Tuple[Segment, Delta] = PrivateAttr(default_factory=lambda: (Segment(), Delta()))
+    _persist_dir: Optional[str] = PrivateAttr(default=None)
+    _dirty: bool = PrivateAttr(default=False)
+    _lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "MmapVectorStore"
+
+    @property
+    def client(self) -> None:
+        return None
+
+    @property
+    def num_rows(self) -> int:
+        segment, delta = self._state
+        dead = int(segment.dead.sum()) if segment.dead is not None else 0
+        return len(segment.ids) - dead + len(delta.ids)
+
+    @property
+    def layout(self) -> str:
+        """
+        "int8/ivf1000/nprobe16" or "float32/exact"; part of the index version, since it changes scores.
+        """
+        segment = self._state[0]
+        search = f"ivf{len(segment.centroids)}/nprobe{self.nprobe}" if segment.centroids is not None else "exact"
+        dtype = segment.codes.dtype.name if segment.codes is not None else self.dtype
+        return f"{dtype}/{search}"
+
+    @property
+    def needs_save(self) -> bool:
+        return self._dirty
+
+    # --- Mutation (VectorStoreIndex inserts and deletes through these) ---
+
+    def add(self, nodes: Sequence[BaseNode], **add_kwargs: Any) -> List[str]:
+        if not nodes:
+            return []
+        ids = [node.node_id for node in nodes]
+        self.add_embeddings(ids, [node.get_embedding() for node in nodes], [node.ref_doc_id or "None" for node in nodes])
+        return ids
+
+    def add_embeddings(self, ids: List[str], embeddings, ref_doc_ids: Optional[List[str]] = None):
+        """
+        Adds (or replaces) raw embeddings under `ids`: searchable at once, on disk after `save()`.
+        """
+        if not len(ids):
+            return
+        matrix = _normalize(embeddings)
+        with self._lock:
+            segment, delta = self._drop(set(ids))
+            self._state = (segment, Delta(
+                delta.ids + list(ids),
+                delta.ref_doc_ids + list(ref_doc_ids or ["None"] * len(ids)),
+                delta.chunks + [matrix],
+            ))
+            self._dirty = True
+
+    def delete(self, ref_doc_id: str, **delete_kwargs: Any) -> None:
+        with self._lock:
+            segment, delta = self._state
+            self._state = self._drop({
+                node_id for node_id, ref in zip([*segment.ids, *delta.ids], [*segment.ref_doc_ids, *delta.ref_doc_ids])
+                if ref == ref_doc_id
+            })
+
+    def delete_nodes(
+        self,
+        node_ids: Optional[List[str]] = None,
+        filters: Optional[MetadataFilters] = None,
+        **delete_kwargs: Any,
+    ) -> None:
+        if filters is not None:
+            raise NotImplementedError("MmapVectorStore keeps no metadata; delete by node ID.")
+        with self._lock:
+            self._state = self._drop(set(node_ids or []))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._state = (Segment(), Delta())
+            self._dirty = True
+
+    def _drop(self, node_ids: set) -> Tuple[Segment, Delta]:
+        # New (segment, delta) without `node_ids`; caller holds the lock
+        segment, delta = self._state
+        rows = [segment.rows[node_id] for node_id in node_ids if node_id in segment.rows]
+        if rows:
+            dead = np.zeros(len(segment.ids), dtype=bool) if segment.dead is None else segment.dead.copy()
+            dead[rows] = True
+            segment = replace(segment, dead=dead, rows={k: v for k, v in segment.rows.items() if k not in node_ids})
+            self._dirty = True
+        if node_ids.intersection(delta.ids):
+            keep = [i for i, node_id in enumerate(delta.ids) if node_id not in node_ids]
+            delta = Delta(
+                [delta.ids[i] for i in keep], [delta.ref_doc_ids[i] for i in keep], [delta.matrix[keep]] if keep else []
+            )
+            self._dirty = True
+        return segment, delta
+
+    # --- Search ---
+
+    def search(self, embeddings, top_k: int) -> List[List[Tuple[str, float]]]:
+        """
+        Up to `top_k` (node_id, cosine similarity) pairs per query embedding, best first.
+        Saved rows and unsaved additions are searched together.
+        """
+        queries = _normalize(embeddings)
+        if top_k <= 0:
+            return [[] for _ in queries]
+        segment, delta = self._state
+        scores, keys = segment.search(queries, top_k, self.nprobe)
+        pending = delta.matrix
+        if pending is not None:
+            offset = len(segment.ids)
+            pending_keys = np.broadcast_to(np.arange(offset, offset + len(pending)), (len(queries), len(pending)))
+            scores, keys = _top_k(np.hstack([scores, queries @ pending.T]), np.hstack([keys, pending_keys]), top_k)
+
+        results = []
+        for row_scores, row_keys in zip(scores, keys):
+            ranked = []
+            for i in np.lexsort((row_keys, -row_scores)):
+                if np.isfinite(row_scores[i]):
+                    key = int(row_keys[i])
+                    node_id = segment.ids[key] if key < len(segment.ids) else delta.ids[key - len(segment.ids)]
+                    ranked.append((node_id, float(row_scores[i])))
+            results.append(ranked)
+        return results
+
+    def get_embeddings(self, node_ids: List[str]) -> Optional[np.ndarray]:
+        """
+        Unit-normalized float32 rows for `node_ids` (dequantized); None if any is missing.
+        """
+        segment, delta = self._state
+        pending = {node_id: i for i, node_id in enumerate(delta.ids)}
+        rows = []
+        for node_id in node_ids:
+            if node_id in pending:
+                rows.append(delta.matrix[pending[node_id]])
+            elif node_id in segment.rows:
+                rows.append(segment.gather(np.array([segment.rows[node_id]]))[0])
+            else:
+                return None
+        return np.asarray(rows, dtype=np.float32).reshape(len(rows), -1)
+
+    def query(self, query: VectorStoreQuery, **kwargs: Any) -> VectorStoreQueryResult:
+        if query.filters is not None:
+            raise NotImplementedError("MmapVectorStore keeps no metadata; filters are not supported.")
+        if query.mode != VectorStoreQueryMode.DEFAULT:
+            raise ValueError(f"Invalid query mode: {query.mode}")
+        if query.node_ids is not None:
+            node_ids = [node_id for node_id in query.node_ids if self.get_embeddings([node_id]) is not None]
+            if not node_ids:
+                return VectorStoreQueryResult(similarities=[], ids=[])
+            scores = self.get_embeddings(node_ids) @ _normalize(query.query_embedding)[0]
+            order = np.argsort(-scores, kind="stable")[:query.similarity_top_k]
+            return VectorStoreQueryResult(similarities=[float(scores[i]) for i in order], ids=[node_ids[i] for i in order])
+
+        results = self.search([query.query_embedding], query.similarity_top_k)[0]
+        return VectorStoreQueryResult(similarities=[s for _, s in results], ids=[node_id for node_id, _ in results])
+
+    # --- Persistence ---
+
+    def persist(self, persist_path: str, fs=None) -> None:
+        """
+        Called by StorageContext.persist with its JSON file path; writes `vectors/` beside it.
+        """
+        self.save(os.path.join(os.path.dirname(persist_path), VECTOR_DIR))
+
+    def save(self, persist_dir: str):
+        """
+        Compacts saved rows and unsaved additions into a new generation of array files
+        (training IVF lists from `ann_threshold` rows), switches `meta.json` to it,
+        removes generations before the previous one and memory-maps the result. No-op when nothing changed.
+        """
+        with self._lock:
+            if not self._dirty and self._persist_dir == persist_dir:
+                return
+            segment, delta = self._state
+            pending = delta.matrix
+            stored = np.arange(len(segment.ids)) if segment.dead is None else np.flatnonzero(~segment.dead)
+            # Keys past the saved rows refer to unsaved additions
+            keys = np.concatenate([stored, len(segment.ids) + np.arange(len(delta.ids))]).astype(np.int64)
+            ids = [segment.ids[k] for k in stored] + delta.ids
+            ref_doc_ids = [segment.ref_doc_ids[k] for k in stored] + delta.ref_doc_ids
+
+            def rows(selected: np.ndarray) -> np.ndarray:
+                saved = selected < len(segment.ids)
+                block = np.empty((len(selected), dimension), dtype=np.float32)
+                if saved.any():
+                    block[saved] = segment.gather(selected[saved])
+                if not saved.all():
+                    block[~saved] = pending[selected[~saved] - len(segment.ids)]
+                return block
+
+            os.makedirs(persist_dir, exist_ok=True)
+            generation = uuid.uuid4().hex[:12]
+
+            def path(name: str) -> str:
+                return os.path.join(persist_dir, f"{generation}.{name}.npy")
+
+            meta = {"generation": generation, "dtype": self.dtype}
+            if len(ids):
+                dimension = segment.codes.shape[1] if segment.codes is not None and len(segment.ids) else pending.shape[1]
+                if len(ids) >= self.ann_threshold:
+                    lists = self.lists or max(1, int(np.sqrt(len(ids))))
+                    rng = np.random.default_rng(0)
+                    sample = np.sort(rng.choice(len(keys), min(len(keys), lists * KMEANS_SAMPLE_PER_LIST), replace=False))
+                    centroids = train_centroids(rows(keys[sample]), lists)
+                    assignment = np.concatenate([
+                        _assign(rows(keys[start:start + BLOCK_ROWS]), centroids)
+                        for start in range(0, len(keys), BLOCK_ROWS)
+                    ])
+                    order = np.argsort(assignment, kind="stable")
+                    list_offsets = np.zeros(len(centroids) + 1, dtype=np.int64)
+                    np.cumsum(np.bincount(assignment, minlength=len(centroids)), out=list_offsets[1:])
+                    keys, ids, ref_doc_ids = keys[order], [ids[i] for i in order], [ref_doc_ids[i] for i in order]
+                    meta["lists"] = len(centroids)
+                    np.save(path("centroids"), centroids)
+                    np.save(path("list_offsets"), list_offsets)
+
+                codes = np.lib.format.open_memmap(path("codes"), mode="w+", dtype=DTYPES[self.dtype], shape=(len(ids), dimension))
+                scales = np.empty(len(ids), dtype=np.float32) if self.dtype == "int8" else None
+                for start in range(0, len(ids), BLOCK_ROWS):
+                    block_codes, block_scales = _quantize(rows(keys[start:start + BLOCK_ROWS]), self.dtype)
+                    codes[start:start + len(block_codes)] = block_codes
+                    if scales is not None:
+                        scales[start:start + len(block_scales)] = block_scales
+                codes.flush()
+                del codes
+                if scales is not None:
+                    np.save(path("scales"), scales)
+            meta.update(ids=ids, ref_doc_ids=ref_doc_ids)
+
+            # meta.json names the live generation; replacing it is the switch-over
+            tmp_path = os.path.join(persist_dir, META_FILE + ".tmp")
+            with open(tmp_path, "w") as f:
+                json.dump(meta, f)
+            os.replace(tmp_path, os.path.join(persist_dir, META_FILE))
+            self._remove_old_generations(persist_dir, generation)
+
+            self._state = (self._open(persist_dir, meta), Delta())
+            self._persist_dir, self._dirty = persist_dir, False
+
+    @staticmethod
+    def _remove_old_generations(persist_dir: str, generation: str):
+        """
+        Deletes the array files of all but the live and the previous generation. Another
+        process may have read the previous meta.json and not yet opened its arrays; by the
+        next save it has (mappings of deleted files stay valid until their readers finish).
+        """
+        files = {}
+        for name in os.listdir(persist_dir):
+            if name.endswith(".npy") and not name.startswith(f"{generation}."):
+                path = os.path.join(persist_dir, name)
+                files.setdefault(name.split(".", 1)[0], []).append((os.path.getmtime(path), path))
+        older = sorted(files.values(), key=max)[:-1]
+        for paths in older:
+            for _, path in paths:
+                os.remove(path)
+
+    def snapshot(self, persist_dir: str):
+        """
+        Read-only copy of the saved generation in `persist_dir`, for index snapshots: the
+        array files are hard-linked (copied across file systems) and the IDs written as
+        StringTables rather than into meta.json. Unsaved changes are not included.
+        """
+        with open(os.path.join(self._persist_dir, META_FILE), "r") as f:
+            meta = json.load(f)
+        generation = meta["generation"]
+        os.makedirs(persist_dir, exist_ok=True)
+        for name in os.listdir(self._persist_dir):
+            if name.startswith(f"{generation}.") and name.endswith(".npy"):
+                source, target = os.path.join(self._persist_dir, name), os.path.join(persist_dir, name)
+                try:
+                    # Generation files are never rewritten, so sharing the inode is safe
+                    os.link(source, target)
+                except OSError:
+                    shutil.copyfile(source, target)
+        for name in ("ids", "ref_doc_ids"):
+            StringTable.save(os.path.join(persist_dir, f"{generation}.{name}"), meta.pop(name))
+        with open(os.path.join(persist_dir, META_FILE), "w") as f:
+            json.dump(meta, f)
+
+    @staticmethod
+    def _open(persist_dir: str, meta: dict, mmap: bool = True) -> Segment:
+        generation = meta["generation"]
+
+        def load(name: str) -> Optional[np.ndarray]:
+            path = os.path.join(persist_dir, f"{generation}.{name}.npy")
+            if not os.path.exists(path):
+                return None
+            # Plain ndarray view of the mapping: same pages, without np.memmap's per-slice overhead
+            return np.asarray(np.load(path, mmap_mode="r" if mmap else None))
+
+        centroids = load("centroids")
+        if "ids" in meta:
+            ids, ref_doc_ids = meta["ids"], meta["ref_doc_ids"]
+            rows = {node_id: i for i, node_id in enumerate(ids)}
+        else:
+            ids, ref_doc_ids = (
+                StringTable.load(os.path.join(persist_dir, f"{generation}.{name}"), mmap) for name in ("ids", "ref_doc_ids")
+            )
+            rows = ids.positions()
+        return Segment(
+            ids=ids,
+            ref_doc_ids=ref_doc_ids,
+            rows=rows,
+            codes=load("codes"),
+            scales=load("scales"),
+            # Small and read by every IVF query; keep in memory
+            centroids=np.array(centroids) if centroids is not None else None,
+            list_offsets=load("list_offsets"),
+        )
+
+    @classmethod
+    def load(cls, persist_dir: str, mmap: bool = True, **params: Any) -> "MmapVectorStore":
+        """
+        Memory-maps the generation named in `persist_dir/meta.json`. A store saved with a
+        different dtype or search layout than `params` ask for is marked `needs_save`.
+        """
+        with open(os.path.join(persist_dir, META_FILE), "r") as f:
+            meta = json.load(f)
+        store = cls(**params)
+        store._state = (cls._open(persist_dir, meta, mmap), Delta())
+        store._persist_dir = persist_dir
+        ivf = len(store._state[0].ids) >= store.ann_threshold
+        store._dirty = (
+            meta["dtype"] != store.dtype
+            or ivf != ("lists" in meta)
+            or (ivf and bool(store.lists) and store.lists != meta["lists"])
+        )
+        return store
+
+
+class VectorRetriever(BaseRetriever):
+    """
+    Thin retriever over a shared MmapVectorStore; cheap to construct per request.
+    Embeds the query with `embed` unless the bundle already carries an embedding.
+    """
+
+    def __init__(
+        self,
+        vector_store: MmapVectorStore,
+        node_map: Dict[str, BaseNode],
+        embed: Callable[[str], List[float]],
+        similarity_top_k: int = 3,
+    ):
+        self.vector_store = vector_store
+        self.node_map = node_map
+        self.embed = embed
+        self.similarity_top_k = similarity_top_k
+        super().__init__()
+
+    def _retrieve(self, query_bundle: QueryBundle) -> List[NodeWithScore]:
+        embedding = query_bundle.embedding or self.embed(query_bundle.query_str)
+        results = self.vector_store.search([embedding], self.similarity_top_k)[0]
+        return [
+            NodeWithScore(node=self.node_map[node_id], score=score)
+            for node_id, score in results
+            if node_id in self.node_map
+        ]
@@ -1,8 +1,69 @@
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
 from app.api.v1.endpoints import router as api_router
+from app.core.audit_logger import audit_sink, backfill_store
+from app.core.cache import query_cache
+from app.core.config import config
+from app.core.llm import llm_gateway
+from app.core.metrics import metrics
+from app.core.retrieval import hybrid_retrieve
+from app.core.semantic_cache import embed_question
+from app.ingestion.index import ingestion_manager
 
-app = FastAPI(title="Regulatory Compliance RAG System")
+logging.basicConfig(level=config.LOG_LEVEL, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+logger = logging.getLogger(__name__)
+
+async def warm_up(started: float):
+    """
+    Waits for the background index load, then runs a few queries to prime the
+    embedding model, memory-mapped indexes and stage caches. Reports the startup time.
+    """
+    ready = await ingestion_manager.wait_ready(config.INDEX_READY_TIMEOUT_SECONDS)
+    if not ready:
+        logger.error("Startup: index %s: %s", ingestion_manager.status, ingestion_manager.error)
+        return
+
+    for question in config.WARMUP_QUERIES:
+        try:
+            embedding = await asyncio.to_thread(embed_question, question)
+            await hybrid_retrieve(question, query_embedding=embedding)
+        except Exception as e:
+            logger.warning("Startup: warm-up query failed: %s", e)
+
+    elapsed = time.perf_counter() - started
+    budget = config.STARTUP_BUDGET_SECONDS
+    logger.info(
+        "Startup: %s in %.1fs (index load %.1fs, %d warm-up queries, budget %.0fs)",
+        ingestion_manager.status, elapsed, ingestion_manager.load_seconds, len(config.WARMUP_QUERIES), budget,
+    )
+    if elapsed > budget:
+        logger.warning("Startup: over budget by %.1fs", elapsed - budget)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Load in the background so uvicorn accepts connections (and /ready) immediately
+    started = time.perf_counter()
+    ingestion_manager.start_background_load()
+    warm_up_task = asyncio.create_task(warm_up(started))
+    # First start with an existing JSONL log: index it so /audit/logs sees history
+    backfill_task = asyncio.create_task(asyncio.to_thread(backfill_store, only_if_empty=True))
+    yield
+    warm_up_task.cancel()
+    try:
+        await backfill_task
+    except Exception as e:
+        logger.error("Startup: audit store backfill failed: %s", e)
+    query_cache.stop()
+    await llm_gateway.aclose()
+    # Drain queued audit entries before the worker exits
+    audit_sink.close()
+
+app = FastAPI(title="Regulatory Compliance RAG System", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -19,6 +80,22 @@ app.include_router(api_router, prefix="/api/v1")
 def read_root():
     return {"message": "Regulatory Compliance RAG API is running."}
 
+@app.get("/ready")
+def readiness():
+    """
+    503 until the index has loaded; 200 once queries can be served (status may be "degraded").
+    """
+    state = ingestion_manager.state()
+    status_code = 200 if state["status"] in ("ready", "degraded") else 503
+    return JSONResponse(state, status_code=status_code)
+
+@app.get("/metrics")
+def prometheus_metrics():
+    """
+    Stage latency histograms, query, cache, abstention and LLM counters in Prometheus text format.
+    """
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
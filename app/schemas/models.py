@@ -17,9 +17,25 @@ class Outcome(str, Enum):
     ABSTAINED = "ABSTAINED"
     ERROR = "ERROR"
 
+class FusionMode(str, Enum):
+    RRF = "rrf"
+    MIN_MAX = "min_max"
+    Z_SCORE = "z_score"
+
 class QueryRequest(BaseModel):
     question: str
     jurisdiction: Jurisdiction
+    # Optional retrieval overrides; server defaults from config apply when omitted
+    top_k: Optional[int] = Field(None, ge=1, le=20)
+    candidate_pool: Optional[int] = Field(None, ge=1, le=50)
+    fusion_mode: Optional[FusionMode] = None
+    vector_weight: Optional[float] = Field(None, ge=0.0)
+    keyword_weight: Optional[float] = Field(None, ge=0.0)
+
+class BatchQueryRequest(BaseModel):
+    queries: List[QueryRequest] = Field(..., min_length=1)
+    # Questions generated/verified at once; defaults to BATCH_CONCURRENCY
+    concurrency: Optional[int] = Field(None, ge=1, le=64)
 
 class RetrievalNode(BaseModel):
     id: str
@@ -48,3 +64,9 @@ class AuditLogEntry(BaseModel):
     outcome: Outcome
     confidence_level: ConfidenceLevel
     timestamp: datetime
+    # Set when the answer was served from the semantic cache
+    cache_similarity: Optional[float] = None
+    # The query_id of the entry whose answer was reused, for cache hits and coalesced near-duplicates
+    cached_query_id: Optional[str] = None
+    # Milliseconds per pipeline stage ("cache", "embedding", "vector", ...) and "total"
+    trace: Optional[Dict[str, float]] = None
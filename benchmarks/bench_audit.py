@@ -0,0 +1,83 @@
+"""
+Audit writes per second under concurrent load.
+
+"before" opens the log, appends one line and closes it per entry (what
+log_query used to do inside the request handler); "after" enqueues into the
+batched AuditSink, timed until every entry has reached the file. The
+per-call column is the latency a request handler actually pays.
+
+    python -m benchmarks.bench_audit --entries 20000 --threads 1 8 32
+"""
+import argparse
+import os
+import tempfile
+import threading
+import time
+import uuid
+from datetime import datetime
+
+from app.core.audit_logger import AuditSink
+from app.schemas.models import AuditLogEntry, Jurisdiction, Outcome, ConfidenceLevel
+
+def make_entry() -> AuditLogEntry:
+    return AuditLogEntry(
+        query_id=str(uuid.uuid4()),
+        question="What is the time limit for issuing a tax invoice?",
+        jurisdiction=Jurisdiction.DPDP,
+        outcome=Outcome.ANSWERED,
+        confidence_level=ConfidenceLevel.HIGH,
+        timestamp=datetime.now(),
+    )
+
+def run(write, entries: int, threads: int) -> tuple[float, float]:
+    """
+    Returns (wall seconds, mean seconds per write call).
+    """
+    per_thread = entries // threads
+    call_seconds = []
+
+    def worker():
+        start = time.perf_counter()
+        for _ in range(per_thread):
+            write(make_entry())
+        call_seconds.append((time.perf_counter() - start) / per_thread)
+
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    start = time.perf_counter()
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    return time.perf_counter() - start, sum(call_seconds) / len(call_seconds)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--entries", type=int, default=20000)
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--fsync", default="batch", choices=["batch", "interval", "never"])
+    args = parser.parse_args()
+
+    print(f"{'threads':>7} | {'before (writes/s)':>17} | {'after (writes/s)':>16} | {'before (us/call)':>16} | {'after (us/call)':>15}")
+    for threads in args.threads:
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "before.jsonl")
+
+            def append_line(entry):
+                with open(path, "a") as f:
+                    f.write(entry.model_dump_json() + "\n")
+
+            before_wall, before_call = run(append_line, args.entries, threads)
+
+            sink = AuditSink(os.path.join(tmp, "after.jsonl"), fsync=args.fsync, flush_interval=0.05)
+            start = time.perf_counter()
+            _, after_call = run(sink.write, args.entries, threads)
+            sink.close()
+            after_wall = time.perf_counter() - start
+
+        print(
+            f"{threads:>7} | {args.entries / before_wall:>17.0f} | {args.entries / after_wall:>16.0f} | "
+            f"{before_call * 1e6:>16.1f} | {after_call * 1e6:>15.1f}"
+        )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Prompt context tokens before and after packing, over the retrieval question set.
+
+For each question the retrieved clauses are rendered the old way (every clause in
+full, in retrieval order) and packed at each budget. Reports clause tokens per
+prompt, how many clauses were deduplicated, truncated or dropped, packing time,
+and how many of the question's relevant snippets still appear in the context.
+
+    python -m benchmarks.bench_context --top-k 4 8 --budgets 800 1500 3000
+"""
+import argparse
+import asyncio
+import json
+import re
+import statistics
+import time
+from pathlib import Path
+
+from app.core import context
+from app.core.config import config
+from app.core.retrieval import hybrid_retrieve
+from app.core.semantic_cache import embed_question
+from app.ingestion.index import ingestion_manager
+
+DEFAULT_QUESTIONS = Path(__file__).parent / "data" / "retrieval_eval.jsonl"
+
+def normalize(text: str) -> str:
+    return re.sub(r"\s+", " ", text).strip().lower()
+
+def recall(text: str, relevant: list[str]) -> float:
+    text = normalize(text)
+    return sum(normalize(snippet) in text for snippet in relevant) / len(relevant) if relevant else 1.0
+
+async def retrieve(questions: list[dict], top_k: int) -> list:
+    results = []
+    for item in questions:
+        embedding = None
+        if ingestion_manager.has_vectors:
+            embedding = await asyncio.to_thread(embed_question, item["question"])
+        result = await hybrid_retrieve(item["question"], top_k=top_k, query_embedding=embedding)
+        results.append(result.nodes)
+    return results
+
+def report(questions: list[dict], retrieved: list, budgets: list[int]):
+    raw_texts = [
+        "\n\n".join(f"Clause ID: {context._label(n)}\n{n.node.get_content()}" for n in nodes)
+        for nodes in retrieved
+    ]
+    raw_tokens = [context.count_tokens(text) for text in raw_texts]
+    raw_recall = statistics.mean(recall(t, q["relevant"]) for t, q in zip(raw_texts, questions))
+    print(f"{'budget':>8} | {'tokens':>7} | {'dedup':>5} | {'trunc':>5} | {'drop':>5} | {'ms/pack':>7} | {'recall':>6}")
+    print(f"{'raw':>8} | {statistics.mean(raw_tokens):>7.0f} | {'':>5} | {'':>5} | {'':>5} | {'':>7} | {raw_recall:>6.3f}")
+    for budget in budgets:
+        start = time.perf_counter()
+        packed = [context._pack(nodes, budget) for nodes in retrieved]
+        elapsed = (time.perf_counter() - start) / len(retrieved) * 1000
+        print(
+            f"{budget:>8} | {statistics.mean(p.tokens for p in packed):>7.0f} | "
+            f"{sum(p.deduplicated for p in packed):>5} | {sum(p.truncated for p in packed):>5} | "
+            f"{sum(p.dropped for p in packed):>5} | {elapsed:>7.2f} | "
+            f"{statistics.mean(recall(p.text, q['relevant']) for p, q in zip(packed, questions)):>6.3f}"
+        )
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--questions", type=Path, default=DEFAULT_QUESTIONS)
+    parser.add_argument("--top-k", type=int, nargs="+", default=[config.RETRIEVAL_TOP_K, 8])
+    parser.add_argument("--budgets", type=int, nargs="+", default=[800, config.CONTEXT_TOKEN_BUDGET, 3000])
+    args = parser.parse_args()
+
+    ingestion_manager.load()
+    with open(args.questions) as f:
+        questions = [json.loads(line) for line in f if line.strip()]
+    mode = "hybrid" if ingestion_manager.has_vectors else "keyword-only"
+    for top_k in args.top_k:
+        retrieved = asyncio.run(retrieve(questions, top_k))
+        print(f"\n{len(questions)} questions, top_k={top_k}, {mode} retrieval")
+        report(questions, retrieved, args.budgets)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Per-query keyword retrieval latency vs. corpus size.
+
+"before" rebuilds BM25Retriever from the nodes on every query (what
+get_keyword_retriever used to do); "after" searches the prebuilt,
+memory-mapped KeywordIndex.
+
+    python -m benchmarks.bench_keyword_index --sizes 1000 5000 20000
+"""
+import argparse
+import random
+import statistics
+import tempfile
+import time
+
+from llama_index.core.schema import TextNode
+from llama_index.retrievers.bm25 import BM25Retriever
+from app.ingestion.keyword_index import KeywordIndex, KeywordRetriever
+
+QUERIES = [
+    "time limit for issuing tax invoice",
+    "interest on delayed payment of tax",
+    "input tax credit blocked motor vehicles",
+    "penalty for supply without invoice",
+    "registration cancellation order",
+]
+
+def make_corpus(size: int, seed: int = 0) -> list[TextNode]:
+    rng = random.Random(seed)
+    query_words = " ".join(QUERIES).split()
+    filler = [f"term{i}" for i in range(20000)]
+    # Zipf-ish weights so a few filler terms are very common, like real legal text
+    weights = [1.0 / (i + 1) for i in range(len(filler))]
+    nodes = []
+    for i in range(size):
+        words = rng.choices(filler, weights=weights, k=110) + rng.sample(query_words, 6)
+        rng.shuffle(words)
+        nodes.append(TextNode(id_=f"node_{i}", text=" ".join(words)))
+    return nodes
+
+def time_queries(fn, repeats: int) -> float:
+    timings = []
+    for _ in range(repeats):
+        for q in QUERIES:
+            start = time.perf_counter()
+            fn(q)
+            timings.append(time.perf_counter() - start)
+    return statistics.median(timings) * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 5000, 20000])
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'nodes':>8} | {'before (ms/query)':>18} | {'after (ms/query)':>17} | {'build once (s)':>14}")
+    for size in args.sizes:
+        nodes = make_corpus(size)
+        node_map = {n.node_id: n for n in nodes}
+
+        before = time_queries(
+            lambda q: BM25Retriever.from_defaults(nodes=nodes, similarity_top_k=3).retrieve(q),
+            repeats=1,
+        )
+
+        with tempfile.TemporaryDirectory() as persist_dir:
+            start = time.perf_counter()
+            KeywordIndex.build(nodes).persist(persist_dir)
+            build_seconds = time.perf_counter() - start
+
+            retriever = KeywordRetriever(KeywordIndex.load(persist_dir), node_map, similarity_top_k=3)
+            after = time_queries(retriever.retrieve, repeats=args.repeats)
+
+        print(f"{size:>8} | {before:>18.2f} | {after:>17.3f} | {build_seconds:>14.2f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,323 @@
+"""
+End-to-end load benchmark of the API against a mock LLM and an embedding stub.
+
+Indexes the corpus in a scratch directory with a deterministic hashed embedding (no
+model download), starts benchmarks.mock_llm and the app (in-process over ASGI, or
+under uvicorn in a subprocess), and replays a workload of QueryRequest rows against
+/api/v1/query at each concurrency level. Reports latency p50/p95/p99, requests/s,
+outcomes and per-stage timings from the audit trace, and writes them as JSON;
+--compare prints the change against an earlier results file.
+
+Response, stage and semantic caches are off unless --cache is given, so every request
+runs the whole pipeline. The LLM rate limit is off unless LLM_RATE_LIMIT_PER_SECOND is set.
+
+    python -m benchmarks.bench_load --concurrency 1 8 32 --requests 100 --output load.json
+    python -m benchmarks.bench_load --server uvicorn --compare load.json
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import re
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+from typing import List
+
+import numpy as np
+from llama_index.core.embeddings import BaseEmbedding
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+DEFAULT_WORKLOAD = REPO_ROOT / "benchmarks" / "data" / "confidence_eval.jsonl"
+
+class HashEmbedding(BaseEmbedding):
+    """
+    Signed feature hashing of lowercased words, plus an equal-weight component shared by
+    every text: deterministic, dependency-free, and cosine similarities land in the range
+    the confidence features are calibrated for (bge-small: ~0.5 for unrelated text).
+    """
+    dim: int = 384
+
+    def _vector(self, text: str) -> List[float]:
+        words = np.zeros(self.dim - 1, dtype=np.float32)
+        for word in re.findall(r"\w+", text.lower()):
+            digest = hashlib.blake2b(word.encode(), digest_size=8).digest()
+            words[int.from_bytes(digest[:4], "little") % len(words)] += 1.0 if digest[4] & 1 else -1.0
+        norm = np.linalg.norm(words)
+        vector = np.concatenate([[1.0], words / norm if norm else words])
+        return (vector / np.linalg.norm(vector)).tolist()
+
+    def _embed(self, sentences: List[str], prompt_name: str = None) -> List[List[float]]:
+        # Same batch method as HuggingFaceEmbedding, which embed_questions calls
+        return [self._vector(sentence) for sentence in sentences]
+
+    def _get_query_embedding(self, query: str) -> List[float]:
+        return self._vector(query)
+
+    def _get_text_embedding(self, text: str) -> List[float]:
+        return self._vector(text)
+
+    async def _aget_query_embedding(self, query: str) -> List[float]:
+        return self._vector(query)
+
+def install_embedding_stub():
+    from llama_index.core import Settings
+    from app.core import llm
+    llm._embed_model = Settings.embed_model = HashEmbedding()
+
+def configure(workdir: Path, llm_url: str, cache: bool):
+    """
+    Environment for the app under test; must run before `app` is imported. The index
+    and audit log live under `workdir`.
+    """
+    os.environ["LLM_API_BASE"] = llm_url
+    os.environ.setdefault("OPENROUTER_API_KEY", "mock")
+    os.environ.setdefault("LLM_RATE_LIMIT_PER_SECOND", "0")
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    if not cache:
+        os.environ["CACHE_MAX_ENTRIES"] = "0"
+        os.environ["STAGE_CACHE_MAX_ENTRIES"] = "0"
+        os.environ["SEMANTIC_CACHE_ENABLED"] = "false"
+    workdir.mkdir(parents=True, exist_ok=True)
+    os.chdir(workdir)
+    sys.path.insert(0, str(REPO_ROOT))
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def start_process(args: List[str], cwd: Path) -> subprocess.Popen:
+    env = {**os.environ, "PYTHONPATH": os.pathsep.join([str(REPO_ROOT), os.environ.get("PYTHONPATH", "")])}
+    return subprocess.Popen([sys.executable, "-m", *args], cwd=cwd, env=env)
+
+async def wait_until(client, path: str, timeout: float, ok=(200,)):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if (await client.get(path)).status_code in ok:
+                return
+        except Exception:
+            pass
+        await asyncio.sleep(0.2)
+    raise TimeoutError(f"{path} not ready after {timeout:.0f}s")
+
+def percentiles(values) -> dict:
+    if not len(values):
+        return {}
+    return {
+        "p50": round(float(np.percentile(values, 50)), 2),
+        "p95": round(float(np.percentile(values, 95)), 2),
+        "p99": round(float(np.percentile(values, 99)), 2),
+        "mean": round(float(np.mean(values)), 2),
+    }
+
+async def run_level(client, workload: list, concurrency: int, requests: int) -> dict:
+    """
+    `requests` queries, cycling through the workload, from `concurrency` closed-loop clients.
+    """
+    queue = asyncio.Queue()
+    for i in range(requests):
+        queue.put_nowait(workload[i % len(workload)])
+    latencies, query_ids, outcomes = [], [], Counter()
+
+    async def worker():
+        while not queue.empty():
+            request = queue.get_nowait()
+            start = time.perf_counter()
+            response = await client.post("/api/v1/query", json=request.model_dump(mode="json", exclude_none=True))
+            latencies.append((time.perf_counter() - start) * 1000)
+            if response.status_code != 200:
+                outcomes[f"HTTP {response.status_code}"] += 1
+                continue
+            body = response.json()
+            outcomes[body.get("outcome", "UNKNOWN")] += 1
+            query_ids.append(body["query_id"])
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    return {
+        "concurrency": concurrency,
+        "requests": requests,
+        "seconds": round(elapsed, 2),
+        "requests_per_second": round(requests / elapsed, 2),
+        "latency_ms": percentiles(latencies),
+        "outcomes": dict(outcomes),
+        "query_ids": query_ids,
+    }
+
+async def fetch_traces(client, query_ids: set, timeout: float = 10.0) -> dict:
+    """
+    query_id -> stage timings from the audit store, once the writer has flushed them.
+    """
+    traces = {}
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        response = await client.get("/api/v1/audit/logs", params={"format": "ndjson"})
+        for line in response.text.splitlines():
+            entry = json.loads(line)
+            if entry["query_id"] in query_ids:
+                traces[entry["query_id"]] = entry.get("trace") or {}
+        if len(traces) == len(query_ids):
+            break
+        await asyncio.sleep(0.5)
+    return traces
+
+def stage_breakdown(query_ids: List[str], traces: dict) -> dict:
+    stages = {}
+    for query_id in query_ids:
+        for stage, ms in traces.get(query_id, {}).items():
+            stages.setdefault(stage, []).append(ms)
+    return {stage: {**percentiles(values), "count": len(values)} for stage, values in sorted(stages.items())}
+
+async def run(args, app_client) -> tuple[List[dict], dict]:
+    """
+    Results per concurrency level, and the app's LLM gateway stats (retries, errors) after all of them.
+    """
+    from app.cli import read_questions
+    workload = read_questions(str(args.workload), args.jurisdiction)
+    async with app_client as client:
+        await wait_until(client, "/ready", args.ready_timeout)
+        levels = [await run_level(client, workload, c, args.requests) for c in args.concurrency]
+        traces = await fetch_traces(client, {q for level in levels for q in level["query_ids"]})
+        llm_stats = (await client.get("/api/v1/llm/stats")).json()
+    for level in levels:
+        level["stages_ms"] = stage_breakdown(level.pop("query_ids"), traces)
+    return levels, llm_stats
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT, capture_output=True, text=True
+        ).stdout.strip()
+    except OSError:
+        return ""
+
+def report(levels: List[dict], llm_stats: dict):
+    print(f"{'concurrency':>11} | {'req/s':>7} | {'p50 ms':>8} | {'p95 ms':>8} | {'p99 ms':>8} | outcomes")
+    for level in levels:
+        latency = level["latency_ms"]
+        outcomes = ", ".join(f"{k} {v}" for k, v in sorted(level["outcomes"].items()))
+        print(
+            f"{level['concurrency']:>11} | {level['requests_per_second']:>7.2f} | {latency['p50']:>8.1f} | "
+            f"{latency['p95']:>8.1f} | {latency['p99']:>8.1f} | {outcomes}"
+        )
+    for level in levels:
+        print(f"\nstages at concurrency {level['concurrency']} (ms: p50 / p95 / p99, requests)")
+        for stage, stats in level["stages_ms"].items():
+            print(f"  {stage:<16} {stats['p50']:>9.2f} {stats['p95']:>9.2f} {stats['p99']:>9.2f} {stats['count']:>6}")
+    for model, stats in llm_stats.get("models", {}).items():
+        print(f"\nLLM {model}: {stats['requests']} requests, {stats['retries']} retries, errors {stats['errors'] or 'none'}")
+
+def change(new: float, was: float) -> str:
+    return f"{(new - was) / was * 100:+.1f}%" if was else "n/a"
+
+def compare(previous: dict, levels: List[dict]):
+    """
+    Relative change of throughput and latency per concurrency level present in both runs.
+    """
+    before = {level["concurrency"]: level for level in previous["levels"]}
+    print(f"\nchange vs {previous.get('commit') or 'previous run'} (negative latency = faster)")
+    print(f"{'concurrency':>11} | {'req/s':>8} | {'p50':>8} | {'p95':>8} | {'p99':>8}")
+    for level in levels:
+        old = before.get(level["concurrency"])
+        if old is None:
+            continue
+        print(
+            f"{level['concurrency']:>11} | {change(level['requests_per_second'], old['requests_per_second']):>8} | "
+            + " | ".join(f"{change(level['latency_ms'][p], old['latency_ms'][p]):>8}" for p in ("p50", "p95", "p99"))
+        )
+
+def serve(port: int):
+    """
+    Entry point of the uvicorn subprocess: the app with the embedding stub installed.
+    """
+    install_embedding_stub()
+    import uvicorn
+    from app.main import app
+    uvicorn.run(app, host="127.0.0.1", port=port, log_level="warning")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--server", choices=["inprocess", "uvicorn"], default="inprocess")
+    parser.add_argument("--workload", type=Path, default=DEFAULT_WORKLOAD, help="JSONL of QueryRequest rows, or CSV")
+    parser.add_argument("--jurisdiction", default="DPDP", help="For rows without one")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8])
+    parser.add_argument("--requests", type=int, default=60, help="Per concurrency level")
+    parser.add_argument("--latency-ms", type=float, default=400)
+    parser.add_argument("--jitter-ms", type=float, default=100)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--cache", action="store_true", help="Keep response, stage and semantic caches on")
+    parser.add_argument("--workdir", type=Path, help="Index and audit log location (default: a new temp dir)")
+    parser.add_argument("--ready-timeout", type=float, default=300)
+    parser.add_argument("--output", type=Path, help="Write results as JSON")
+    parser.add_argument("--compare", type=Path, help="Earlier results JSON to compare against")
+    parser.add_argument("--serve", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        return serve(args.serve)
+
+    workdir = (args.workdir or Path(tempfile.mkdtemp(prefix="bench_load_"))).resolve()
+    # Relative paths are resolved before moving into the work directory
+    for name in ("workload", "output", "compare"):
+        if getattr(args, name):
+            setattr(args, name, getattr(args, name).resolve())
+    llm_port = free_port()
+    configure(workdir, f"http://127.0.0.1:{llm_port}", args.cache)
+
+    import httpx
+    install_embedding_stub()
+    from app.ingestion.index import ingestion_manager
+    start = time.perf_counter()
+    summary = ingestion_manager.sync()
+    print(f"index: {summary['total_nodes']} nodes in {workdir} ({time.perf_counter() - start:.1f}s)")
+
+    processes = [start_process([
+        "benchmarks.mock_llm", "--port", str(llm_port), "--latency-ms", str(args.latency_ms),
+        "--jitter-ms", str(args.jitter_ms), "--failure-rate", str(args.failure_rate), "--seed", str(args.seed),
+    ], REPO_ROOT)]
+    try:
+        asyncio.run(wait_until(httpx.AsyncClient(base_url=f"http://127.0.0.1:{llm_port}"), "/docs", 30))
+        if args.server == "uvicorn":
+            app_port = free_port()
+            processes.append(start_process(["benchmarks.bench_load", "--serve", str(app_port)], workdir))
+            app_client = httpx.AsyncClient(base_url=f"http://127.0.0.1:{app_port}", timeout=None)
+            levels, llm_stats = asyncio.run(run(args, app_client))
+        else:
+            from app.main import app
+
+            async def in_process():
+                async with app.router.lifespan_context(app):
+                    transport = httpx.ASGITransport(app=app)
+                    return await run(args, httpx.AsyncClient(transport=transport, base_url="http://app", timeout=None))
+            levels, llm_stats = asyncio.run(in_process())
+    finally:
+        for process in processes:
+            process.terminate()
+            process.wait()
+
+    results = {
+        "commit": git_commit(),
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "settings": {k: str(v) if isinstance(v, Path) else v for k, v in vars(args).items() if k not in ("serve", "output", "compare")},
+        "levels": levels,
+        "llm": llm_stats,
+    }
+    report(levels, llm_stats)
+    if args.compare:
+        compare(json.loads(args.compare.read_text()), levels)
+    if args.output:
+        args.output.write_text(json.dumps(results, indent=2))
+        print(f"\nresults written to {args.output}")
+
+if __name__ == "__main__":
+    main()
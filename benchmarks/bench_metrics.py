@@ -0,0 +1,105 @@
+"""
+Cost of the per-request instrumentation and of a /metrics scrape.
+
+"request" replays what one uncached /query records: a trace, one timed block per
+pipeline stage, the cache lookup, query and abstention counters, the end-to-end
+histogram and the stage timings serialized into the audit entry (measured as the
+extra JSON over an entry without them). Threads run requests concurrently to show
+lock contention. "scrape" renders the registry once every stage has samples.
+
+    python -m benchmarks.bench_metrics --requests 20000 --threads 1 8
+"""
+import argparse
+import statistics
+import threading
+import time
+from datetime import datetime
+
+from app.core.metrics import (
+    ABSTENTIONS, CACHE_LOOKUPS, QUERIES, QUERY_SECONDS, metrics, start_trace, timed,
+)
+from app.schemas.models import AuditLogEntry, ConfidenceLevel, Jurisdiction, Outcome
+
+STAGES = ("cache", "embedding", "vector", "keyword", "fusion", "confidence", "generation", "verification", "audit")
+
+def make_entry(trace=None) -> AuditLogEntry:
+    return AuditLogEntry(
+        query_id="0" * 36,
+        question="What is the time limit for issuing a tax invoice?",
+        jurisdiction=Jurisdiction.DPDP,
+        outcome=Outcome.ANSWERED,
+        confidence_level=ConfidenceLevel.HIGH,
+        timestamp=datetime.now(),
+        trace=trace,
+    )
+
+def instrumented_request():
+    trace = start_trace()
+    for stage in STAGES:
+        with timed(stage):
+            pass
+    CACHE_LOOKUPS.inc(result="miss")
+    ABSTENTIONS.inc(reason="low_confidence")
+    QUERIES.inc(outcome="ANSWERED")
+    QUERY_SECONDS.observe(trace.elapsed(), outcome="ANSWERED")
+    stages = trace.snapshot()
+    stages["total"] = trace.elapsed() * 1000
+    return stages
+
+def time_requests(requests: int, threads: int) -> float:
+    """
+    Microseconds per request, wall clock over all threads.
+    """
+    per_thread = requests // threads
+
+    def run():
+        for _ in range(per_thread):
+            instrumented_request()
+
+    workers = [threading.Thread(target=run) for _ in range(threads)]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return (time.perf_counter() - start) / (per_thread * threads) * 1e6
+
+def time_audit_serialization(requests: int) -> float:
+    """
+    Extra microseconds to serialize an audit entry that carries a trace.
+    """
+    trace = instrumented_request()
+    plain, traced = make_entry(), make_entry(trace)
+    start = time.perf_counter()
+    for _ in range(requests):
+        plain.model_dump_json()
+    middle = time.perf_counter()
+    for _ in range(requests):
+        traced.model_dump_json()
+    end = time.perf_counter()
+    return ((end - middle) - (middle - start)) / requests * 1e6
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 8])
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'threads':>7} | {'us/request':>10}")
+    for threads in args.threads:
+        timings = [time_requests(args.requests, threads) for _ in range(args.repeats)]
+        print(f"{threads:>7} | {statistics.median(timings):>10.2f}")
+
+    serialization = statistics.median(time_audit_serialization(args.requests) for _ in range(args.repeats))
+    print(f"\naudit entry trace serialization: {serialization:.2f} us/request")
+
+    timings = []
+    for _ in range(args.repeats):
+        start = time.perf_counter()
+        text = metrics.render()
+        timings.append((time.perf_counter() - start) * 1000)
+    print(f"scrape: {statistics.median(timings):.2f} ms, {len(text.splitlines())} lines, {len(text)} bytes")
+
+if __name__ == "__main__":
+    main()
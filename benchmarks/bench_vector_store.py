@@ -0,0 +1,170 @@
+"""
+Vector store load time, memory, query latency and recall vs. corpus size.
+
+"simple" is LlamaIndex's SimpleVectorStore (JSON on disk, Python lists in memory,
+what the index used before); the others are MmapVectorStore layouts. Embeddings are
+synthetic 384-d vectors clustered around topic centres (bge-small's size), and each
+query is a perturbed copy of a stored vector, like a question close to its clause.
+
+Memory is the process's RSS growth after load and after the queries, split into
+anonymous (private heap) and file-backed pages; file-backed pages of a memory-mapped
+store are shared between workers and evictable. Recall is recall@10 against brute-force
+float32 search. The JSON baseline is skipped above --simple-max.
+
+    python -m benchmarks.bench_vector_store --sizes 10000 100000 1000000
+"""
+import argparse
+import gc
+import os
+import statistics
+import tempfile
+import time
+
+import numpy as np
+from llama_index.core.vector_stores import SimpleVectorStore
+from llama_index.core.vector_stores.types import VectorStoreQuery
+from app.ingestion.vector_store import MmapVectorStore
+
+DIMENSION = 384
+TOPICS = 2000
+CHUNK_ROWS = 100_000
+LAYOUTS = {
+    "float32": {"dtype": "float32", "ann_threshold": 1 << 62},
+    "int8": {"dtype": "int8", "ann_threshold": 1 << 62},
+    "float32-ivf": {"dtype": "float32", "ann_threshold": 0},
+    "int8-ivf": {"dtype": "int8", "ann_threshold": 0},
+}
+
+def embedding_chunks(size: int, seed: int = 0):
+    """
+    (start, rows) chunks of `size` clustered vectors, generated a chunk at a time.
+    """
+    centres = np.random.default_rng(seed).normal(size=(TOPICS, DIMENSION)).astype(np.float32)
+    for start in range(0, size, CHUNK_ROWS):
+        rng = np.random.default_rng((seed, start))
+        rows = min(CHUNK_ROWS, size - start)
+        topics = rng.integers(0, TOPICS, rows)
+        yield start, centres[topics] + rng.normal(scale=0.8, size=(rows, DIMENSION)).astype(np.float32)
+
+def make_queries(size: int, count: int, seed: int = 1) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    picks = set(rng.choice(size, count, replace=False).tolist())
+    queries = []
+    for start, rows in embedding_chunks(size):
+        queries.extend(rows[i - start] for i in sorted(picks) if start <= i < start + len(rows))
+    queries = np.asarray(queries)
+    return queries + rng.normal(scale=0.5, size=queries.shape).astype(np.float32)
+
+def exact_top_k(size: int, queries: np.ndarray, k: int = 10) -> list:
+    """
+    Brute-force float32 cosine top k, the ground truth for recall.
+    """
+    queries = queries / np.linalg.norm(queries, axis=1, keepdims=True)
+    scores = np.empty((len(queries), 0), dtype=np.float32)
+    keys = np.empty((len(queries), 0), dtype=np.int64)
+    for start, rows in embedding_chunks(size):
+        rows /= np.linalg.norm(rows, axis=1, keepdims=True)
+        scores = np.hstack([scores, queries @ rows.T])
+        keys = np.hstack([keys, np.broadcast_to(np.arange(start, start + len(rows)), (len(queries), len(rows)))])
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        scores, keys = np.take_along_axis(scores, top, axis=1), np.take_along_axis(keys, top, axis=1)
+    return [[f"n{key}" for key in row] for row in keys]
+
+def rss_mb() -> dict:
+    fields = {}
+    with open("/proc/self/status") as f:
+        for line in f:
+            name, _, value = line.partition(":")
+            if name in ("RssAnon", "RssFile"):
+                fields[name] = int(value.split()[0]) / 1024
+    return fields
+
+def memory_delta(before: dict) -> str:
+    after = rss_mb()
+    return f"{after['RssAnon'] - before['RssAnon']:>6.0f} / {after['RssFile'] - before['RssFile']:>6.0f}"
+
+def time_queries(search, queries: np.ndarray) -> tuple[float, float, list]:
+    timings, results = [], []
+    for query in queries:
+        start = time.perf_counter()
+        results.append(search(query))
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings), float(np.percentile(timings, 99)), results
+
+def recall(results: list, exact: list) -> float:
+    return statistics.mean(len(set(r) & set(e)) / len(e) for r, e in zip(results, exact))
+
+def row(size, name, build_s, load_s, memory_loaded, memory_queried, p50, p99, hit_rate):
+    print(
+        f"{size:>8} | {name:>11} | {build_s:>7.1f} | {load_s:>7.3f} | {memory_loaded} | {memory_queried} | "
+        f"{p50:>8.2f} | {p99:>8.2f} | {hit_rate:>5.3f}"
+    )
+
+def bench_simple(size: int, queries: np.ndarray, exact: list, workdir: str):
+    path = os.path.join(workdir, "default__vector_store.json")
+    start = time.perf_counter()
+    store = SimpleVectorStore()
+    for chunk_start, rows in embedding_chunks(size):
+        for i, vector in enumerate(rows.tolist()):
+            store.data.embedding_dict[f"n{chunk_start + i}"] = vector
+    store.persist(path)
+    build_s = time.perf_counter() - start
+    del store
+    gc.collect()
+
+    before = rss_mb()
+    start = time.perf_counter()
+    store = SimpleVectorStore.from_persist_path(path)
+    load_s = time.perf_counter() - start
+    loaded = memory_delta(before)
+    p50, p99, results = time_queries(
+        lambda q: store.query(VectorStoreQuery(query_embedding=q.tolist(), similarity_top_k=10)).ids, queries
+    )
+    row(size, "simple", build_s, load_s, loaded, memory_delta(before), p50, p99, recall(results, exact))
+    del store
+    gc.collect()
+    os.remove(path)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--nprobe", type=int, default=16)
+    parser.add_argument("--simple-max", type=int, default=10_000)
+    parser.add_argument("--layouts", nargs="+", default=list(LAYOUTS), choices=list(LAYOUTS))
+    args = parser.parse_args()
+
+    print(f"{'rows':>8} | {'store':>11} | {'build s':>7} | {'load s':>7} | {'loaded MB anon/file':>19} | "
+          f"{'queried MB anon/file':>20} | {'p50 ms':>8} | {'p99 ms':>8} | {'R@10':>5}")
+    for size in args.sizes:
+        queries = make_queries(size, args.queries)
+        with tempfile.TemporaryDirectory() as workdir:
+            exact = exact_top_k(size, queries)
+            for name in args.layouts:
+                persist_dir = os.path.join(workdir, name)
+                start = time.perf_counter()
+                store = MmapVectorStore(nprobe=args.nprobe, **LAYOUTS[name])
+                for chunk_start, rows in embedding_chunks(size):
+                    store.add_embeddings([f"n{chunk_start + i}" for i in range(len(rows))], rows)
+                store.save(persist_dir)
+                build_s = time.perf_counter() - start
+                del store
+                gc.collect()
+
+                before = rss_mb()
+                start = time.perf_counter()
+                store = MmapVectorStore.load(persist_dir, nprobe=args.nprobe, **LAYOUTS[name])
+                load_s = time.perf_counter() - start
+                loaded = memory_delta(before)
+                p50, p99, results = time_queries(
+                    lambda q: [node_id for node_id, _ in store.search([q], 10)[0]], queries
+                )
+                row(size, name, build_s, load_s, loaded, memory_delta(before), p50, p99, recall(results, exact))
+                del store
+                gc.collect()
+
+            if size <= args.simple_max:
+                bench_simple(size, queries, exact, workdir)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,225 @@
+"""
+Resident memory per worker and startup time of a multi-worker uvicorn deployment.
+
+Indexes the corpus in a scratch directory with bench_load's hashed embedding (no model
+download), optionally repeated --copies times to stand in for a larger corpus, then
+starts `uvicorn --workers N` for each N twice: with INDEX_SNAPSHOTS off (every worker
+loads its own copy of the index) and on (workers memory-map one published snapshot).
+Startup is the time until every worker has logged that it is ready (index loaded and
+warm-up queries run). Memory is read from /proc once all are up: RSS, PSS (shared
+pages split between the processes that map them; their sum is what the deployment
+costs) and private bytes.
+
+The app imports the HuggingFace embedding stack in every worker even though the stub
+replaces the model; a real model adds its weights to each worker's private memory.
+
+    python -m benchmarks.bench_workers --workers 1 4 8 --copies 20 --output workers.json
+"""
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import List
+
+from benchmarks.bench_load import REPO_ROOT, configure, free_port, git_commit, install_embedding_stub
+
+# Logged by app.main once a worker's index is loaded and warmed up
+STARTUP_LINE = re.compile(r"Startup: (\w+) in ([\d.]+)s \(index load ([\d.]+)s")
+
+def __getattr__(name: str):
+    # uvicorn workers import "benchmarks.bench_workers:app": the app with the embedding stub
+    if name == "app":
+        install_embedding_stub()
+        from app.main import app
+        return app
+    raise AttributeError(name)
+
+def build_index(copies: int) -> int:
+    """
+    Ingests the corpus, then adds `copies - 1` duplicates of every indexed node under new IDs.
+    """
+    from app.ingestion.index import IngestionManager
+    manager = IngestionManager(snapshots=False)
+    manager.sync()
+    leaves = list(manager.nodes)
+    for copy in range(1, copies):
+        manager.index.insert_nodes([node.model_copy(update={"id_": f"{node.node_id}-{copy}"}) for node in leaves])
+    if copies > 1:
+        manager.index.storage_context.persist(persist_dir=manager.persist_dir)
+        manager._set_nodes(manager.index.docstore.docs.values())
+        # Written once here, not raced over by workers finding it stale
+        manager._initialize_keyword_index()
+    return len(manager.nodes)
+
+def prepare(copies: int):
+    """
+    Entry point of the indexing subprocess, so this process never holds the app or the index.
+    """
+    install_embedding_stub()
+    from app.ingestion.index import IngestionManager
+    start = time.perf_counter()
+    nodes = build_index(copies)
+    built = time.perf_counter()
+    IngestionManager(snapshots=True).load()
+    print(json.dumps({"nodes": nodes, "build_seconds": built - start, "publish_seconds": time.perf_counter() - built}))
+
+def worker_pids(pid: int, workers: int) -> List[int]:
+    # One worker runs in the uvicorn process itself; more are spawned children of it
+    if workers == 1:
+        return [pid]
+    pids = []
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+            with open(f"/proc/{entry}/cmdline") as f:
+                cmdline = f.read()
+        except OSError:
+            continue
+        if ppid == pid and "multiprocessing.spawn" in cmdline and "resource_tracker" not in cmdline:
+            pids.append(int(entry))
+    return sorted(pids)
+
+def memory(pid: int) -> dict:
+    """
+    MiB of RSS, PSS, private and shared memory of process `pid`.
+    """
+    fields = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == "kB":
+                fields[parts[0].rstrip(":")] = int(parts[1]) / 1024
+    return {
+        "rss": fields["Rss"],
+        "pss": fields["Pss"],
+        "private": fields["Private_Clean"] + fields["Private_Dirty"],
+        "shared": fields["Shared_Clean"] + fields["Shared_Dirty"],
+    }
+
+def environment(**overrides) -> dict:
+    return {**os.environ, "PYTHONPATH": os.pathsep.join([str(REPO_ROOT), os.environ.get("PYTHONPATH", "")]), **overrides}
+
+def run_deployment(workdir: Path, workers: int, snapshots: bool, timeout: float) -> dict:
+    command = [
+        sys.executable, "-m", "uvicorn", "benchmarks.bench_workers:app",
+        "--port", str(free_port()), "--workers", str(workers), "--log-level", "warning",
+    ]
+    env = environment(INDEX_SNAPSHOTS=str(snapshots).lower(), LOG_LEVEL="INFO")
+    start = time.perf_counter()
+    process = subprocess.Popen(command, cwd=workdir, env=env, stderr=subprocess.PIPE, text=True)
+    ready, errors = [], []
+
+    def read_log():
+        for line in process.stderr:
+            match = STARTUP_LINE.search(line)
+            if match:
+                ready.append((time.perf_counter() - start, match.group(1), float(match.group(3))))
+            elif "ERROR" in line or "CRITICAL" in line or "Traceback" in line:
+                errors.append(line.strip())
+    reader = threading.Thread(target=read_log, daemon=True)
+    reader.start()
+    try:
+        deadline = time.monotonic() + timeout
+        while len(ready) < workers:
+            if process.poll() is not None or time.monotonic() > deadline:
+                # Typically out of memory; reported rather than aborting the other runs
+                return {
+                    "workers": workers, "snapshots": snapshots,
+                    "error": f"{len(ready)} of {workers} workers ready after {timeout:.0f}s", "log": errors[-5:],
+                }
+            time.sleep(0.1)
+        # Let the last warm-up settle before reading memory
+        time.sleep(1.0)
+        per_worker = [memory(pid) for pid in worker_pids(process.pid, workers)]
+    finally:
+        process.terminate()
+        process.wait()
+
+    def mean(key: str) -> float:
+        return round(sum(m[key] for m in per_worker) / len(per_worker), 1)
+
+    return {
+        "workers": workers,
+        "snapshots": snapshots,
+        "statuses": sorted({status for _, status, _ in ready}),
+        "startup_seconds": round(max(t for t, _, _ in ready), 2),
+        "index_load_seconds": round(max(load for _, _, load in ready), 3),
+        "rss_mib": mean("rss"),
+        "pss_mib": mean("pss"),
+        "private_mib": mean("private"),
+        "shared_mib": mean("shared"),
+        "total_pss_mib": round(sum(m["pss"] for m in per_worker), 1),
+        "per_worker": per_worker,
+    }
+
+def report(runs: List[dict]):
+    print(
+        f"{'snapshots':>9} | {'workers':>7} | {'startup s':>9} | {'index load s':>12} | "
+        f"{'RSS/worker':>10} | {'PSS/worker':>10} | {'private/worker':>14} | {'total PSS':>9}"
+    )
+    for run in runs:
+        if "error" in run:
+            print(f"{'on' if run['snapshots'] else 'off':>9} | {run['workers']:>7} | {run['error']}")
+            continue
+        print(
+            f"{'on' if run['snapshots'] else 'off':>9} | {run['workers']:>7} | {run['startup_seconds']:>9.1f} | "
+            f"{run['index_load_seconds']:>12.2f} | {run['rss_mib']:>10.1f} | {run['pss_mib']:>10.1f} | "
+            f"{run['private_mib']:>14.1f} | {run['total_pss_mib']:>9.1f}"
+        )
+    print("(memory in MiB)")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--copies", type=int, default=1, help="Index every corpus chunk this many times")
+    parser.add_argument("--workdir", type=Path, help="Index location (default: a new temp dir)")
+    parser.add_argument("--ready-timeout", type=float, default=600)
+    parser.add_argument("--output", type=Path, help="Write results as JSON")
+    parser.add_argument("--prepare", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.prepare:
+        return prepare(args.copies)
+
+    workdir = (args.workdir or Path(tempfile.mkdtemp(prefix="bench_workers_"))).resolve()
+    if args.output:
+        args.output = args.output.resolve()
+    # No LLM calls: warm-up only embeds and retrieves
+    configure(workdir, "http://127.0.0.1:9", cache=True)
+
+    command = [sys.executable, "-m", "benchmarks.bench_workers", "--prepare", "--copies", str(args.copies)]
+    prepared = subprocess.run(command, cwd=workdir, env=environment(), stdout=subprocess.PIPE, text=True, check=True)
+    index = json.loads(prepared.stdout.strip().splitlines()[-1])
+    print(f"index: {index['nodes']} nodes in {workdir} ({index['build_seconds']:.1f}s)")
+    print(f"snapshot published in {index['publish_seconds']:.1f}s")
+
+    runs = []
+    for workers in args.workers:
+        for snapshots in (False, True):
+            runs.append(run_deployment(workdir, workers, snapshots, args.ready_timeout))
+            outcome = runs[-1].get("error") or f"{runs[-1]['startup_seconds']:.1f}s"
+            print(f"{workers} workers, snapshots {'on' if snapshots else 'off'}: {outcome}")
+    print()
+    report(runs)
+
+    if args.output:
+        args.output.write_text(json.dumps({
+            "commit": git_commit(),
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "settings": {"workers": args.workers, "copies": args.copies, **index},
+            "runs": runs,
+        }, indent=2))
+        print(f"\nresults written to {args.output}")
+
+if __name__ == "__main__":
+    main()
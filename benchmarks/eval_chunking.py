@@ -0,0 +1,81 @@
+"""
+Sentence vs. structural chunking: corpus size, recall@k, nodes and tokens per query.
+
+The corpus is chunked both ways in-process (no embeddings) and each question set
+item is answered from a BM25 index over the chunks, so the comparison needs no
+model downloads. Structural results are expanded to parent rules the same way
+`hybrid_retrieve` does. A snippet counts as recalled when one retrieved node
+contains it (compared as in eval_fusion); "cited" is the share of retrieved nodes
+carrying a real citation ("Rule 46(b)") rather than a sequential clause_N ID.
+
+    python -m benchmarks.eval_chunking --k 2 4 6
+"""
+import argparse
+import json
+import statistics
+import time
+from pathlib import Path
+
+from llama_index.core.schema import NodeWithScore
+
+from app.core.config import config
+from app.ingestion.index import IngestionManager
+from app.ingestion.keyword_index import KeywordIndex, KeywordRetriever
+from app.ingestion.manifest import scan_corpus
+from app.ingestion.pipeline import IngestionPipeline
+from app.ingestion.structure import count_tokens
+from benchmarks.eval_fusion import DEFAULT_QUESTIONS, recall
+
+def chunk_corpus(chunking: str) -> tuple[IngestionManager, float]:
+    manager = IngestionManager()
+    pipeline = IngestionPipeline(
+        config.CORPUS_DIR, config.CHUNK_SIZE, config.CHUNK_OVERLAP, workers=1, chunking=chunking
+    )
+    nodes = []
+    start = time.perf_counter()
+    pipeline.run(sorted(scan_corpus(config.CORPUS_DIR)), decorate=manager._tag_node, sink=nodes.extend)
+    elapsed = time.perf_counter() - start
+    manager._set_nodes(nodes)
+    manager.node_map = {n.node_id: n for n in manager.nodes}
+    manager.keyword_index = KeywordIndex.build(manager.nodes)
+    return manager, elapsed
+
+def evaluate(questions: list[dict], ks: list[int]):
+    print(f"{'chunking':>10} | {'nodes':>5} | {'parents':>7} | {'tokens/node':>11} | {'chunk s':>7}")
+    managers = {}
+    for chunking in ("sentence", "structural"):
+        manager, elapsed = chunk_corpus(chunking)
+        managers[chunking] = manager
+        tokens = statistics.mean(count_tokens(n.get_content()) for n in manager.nodes)
+        print(f"{chunking:>10} | {len(manager.nodes):>5} | {len(manager.parents):>7} | {tokens:>11.1f} | {elapsed:>7.2f}")
+
+    print(f"\n{len(questions)} questions, keyword retrieval")
+    print(f"{'chunking':>10} | {'k':>3} | {'recall@k':>8} | {'nodes/query':>11} | {'tokens/query':>12} | {'cited':>5}")
+    for chunking, manager in managers.items():
+        for k in ks:
+            retriever = KeywordRetriever(manager.keyword_index, manager.node_map, similarity_top_k=k)
+            rows = []
+            for item in questions:
+                nodes = retriever.retrieve(item["question"])
+                nodes = manager.expand_to_parents(nodes, config.PARENT_EXPANSION_MAX_TOKENS)
+                rows.append((
+                    recall(nodes, item["relevant"]),
+                    len(nodes),
+                    sum(count_tokens(n.node.get_content()) for n in nodes),
+                    sum(not n.node.metadata["clause_id"].startswith("clause_") for n in nodes) / max(len(nodes), 1),
+                ))
+            means = [statistics.mean(column) for column in zip(*rows)]
+            print(f"{chunking:>10} | {k:>3} | {means[0]:>8.3f} | {means[1]:>11.1f} | {means[2]:>12.0f} | {means[3]:>5.2f}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--questions", type=Path, default=DEFAULT_QUESTIONS)
+    parser.add_argument("--k", type=int, nargs="+", default=[2, 4, 6])
+    args = parser.parse_args()
+
+    with open(args.questions) as f:
+        questions = [json.loads(line) for line in f if line.strip()]
+    evaluate(questions, args.k)
+
+if __name__ == "__main__":
+    main()
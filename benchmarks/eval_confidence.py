@@ -0,0 +1,109 @@
+"""
+Abstention accuracy and per-call cost of confidence scoring over a labeled question set.
+
+Each line of the question set is {"question": ..., "answerable": true|false}; a
+question is scored correct when answerable questions come out above LOW and
+unanswerable ones come out LOW. Retrieval runs once per question, then both the
+previous substring heuristic and the feature-based `assess_retrieval` score the
+same nodes. A threshold sweep over the feature score shows how much headroom the
+configured MEDIUM threshold leaves.
+
+    python -m benchmarks.eval_confidence --repeat 200
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from pathlib import Path
+
+from app.core import confidence
+from app.core.pipeline import assess_retrieval
+from app.core.retrieval import hybrid_retrieve
+from app.core.semantic_cache import embed_question
+from app.ingestion.index import ingestion_manager
+from app.schemas.models import ConfidenceLevel, Jurisdiction, QueryRequest
+
+DEFAULT_QUESTIONS = Path(__file__).parent / "data" / "confidence_eval.jsonl"
+
+def substring_baseline(query, retrieved_nodes, vector_results, keyword_results) -> ConfidenceLevel:
+    # Previous behaviour: substring term coverage over the joined node text
+    scores = [n.score for n in retrieved_nodes if n.score is not None]
+    score_strength = min(max(scores) if scores else 0, 1.0)
+    stop_words = {"what", "are", "the", "for", "is", "a", "an", "does", "do", "of", "in", "on", "to", "with", "and"}
+    query_terms = [term for term in query.lower().split() if term not in stop_words]
+    combined_text = " ".join([n.node.get_content().lower() for n in retrieved_nodes])
+    coverage = sum(1 for term in query_terms if term in combined_text) / len(query_terms) if query_terms else 1.0
+    vector_ids = {n.node.node_id for n in vector_results}
+    keyword_ids = {n.node.node_id for n in keyword_results}
+    max_len = max(len(vector_ids), len(keyword_ids))
+    agreement = len(vector_ids & keyword_ids) / max_len if max_len > 0 else 0
+    score = score_strength * 0.2 + coverage * 0.6 + agreement * 0.2
+    if score > 0.6:
+        return ConfidenceLevel.HIGH
+    if score > 0.3:
+        return ConfidenceLevel.MEDIUM
+    return ConfidenceLevel.LOW
+
+def per_call_us(fn, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1e6
+
+async def evaluate(questions: list[dict], repeat: int):
+    rows = []
+    for item in questions:
+        request = QueryRequest(question=item["question"], jurisdiction=Jurisdiction.DPDP)
+        embedding = None
+        if ingestion_manager.has_vectors:
+            embedding = await asyncio.to_thread(embed_question, request.question)
+        result = await hybrid_retrieve(request.question, query_embedding=embedding)
+        args = (request.question, result.clauses, result.vector_results, result.keyword_results)
+        assessment = assess_retrieval(request, result, embedding)
+        rows.append({
+            "answerable": item["answerable"],
+            "old": substring_baseline(*args),
+            "new": assessment,
+            "old_us": per_call_us(lambda: substring_baseline(*args), repeat),
+            "new_us": per_call_us(lambda: assess_retrieval(request, result, embedding), repeat),
+        })
+
+    def accuracy(predict) -> float:
+        return sum(predict(row) == row["answerable"] for row in rows) / len(rows)
+
+    mode = "hybrid" if ingestion_manager.has_vectors else "keyword-only"
+    print(f"{len(rows)} questions ({sum(r['answerable'] for r in rows)} answerable), {mode} retrieval")
+    print(f"{'scorer':>18} | {'accuracy':>8} | {'us/call':>8}")
+    print(f"{'substring (old)':>18} | {accuracy(lambda r: r['old'] != ConfidenceLevel.LOW):>8.3f} | "
+          f"{statistics.median(r['old_us'] for r in rows):>8.1f}")
+    print(f"{'features':>18} | {accuracy(lambda r: r['new'].level != ConfidenceLevel.LOW):>8.3f} | "
+          f"{statistics.median(r['new_us'] for r in rows):>8.1f}")
+
+    print(f"\nMEDIUM threshold sweep (configured {confidence.MEDIUM_THRESHOLD}):")
+    for step in range(1, 20):
+        threshold = step / 20
+        print(f"  > {threshold:.2f}: accuracy {accuracy(lambda r: r['new'].score > threshold):.3f}")
+
+    print("\nFeature means (answerable / unanswerable):")
+    for name in confidence.FEATURE_WEIGHTS:
+        means = []
+        for answerable in (True, False):
+            values = [r["new"].features.get(name) for r in rows if r["answerable"] == answerable]
+            values = [v for v in values if v is not None]
+            means.append(f"{statistics.mean(values):.3f}" if values else "n/a")
+        print(f"  {name:>18}: {means[0]} / {means[1]}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--questions", type=Path, default=DEFAULT_QUESTIONS)
+    parser.add_argument("--repeat", type=int, default=200, help="scoring calls per question for timing")
+    args = parser.parse_args()
+
+    ingestion_manager.load()
+    with open(args.questions) as f:
+        questions = [json.loads(line) for line in f if line.strip()]
+    asyncio.run(evaluate(questions, args.repeat))
+
+if __name__ == "__main__":
+    main()
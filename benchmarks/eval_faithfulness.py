@@ -0,0 +1,71 @@
+"""
+LLM verification calls avoided by the local grounding tier, and its agreement with the reference verdict.
+
+Each line of the answer set is {"question": ..., "answer": ..., "faithful": true|false};
+the clauses are whatever retrieval returns for the question. The reference verdict is
+the hand label, or the LLM verifier's own verdict with --llm (needs an API key). Only
+answers the local tier decides (accept/reject) count towards agreement; escalated
+answers would still go to the LLM.
+
+    python -m benchmarks.eval_faithfulness --llm
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from collections import Counter
+from pathlib import Path
+
+from app.core.faithfulness import llm_verify, local_verdict
+from app.core.grounding import ACCEPT, ESCALATE
+from app.core.retrieval import hybrid_retrieve
+from app.core.semantic_cache import embed_question
+from app.ingestion.index import ingestion_manager
+
+DEFAULT_ANSWERS = Path(__file__).parent / "data" / "faithfulness_eval.jsonl"
+
+async def evaluate(items: list[dict], use_llm: bool, verbose: bool):
+    decisions = Counter()
+    agree, false_accepts, local_ms = 0, 0, []
+    for item in items:
+        embedding = None
+        if ingestion_manager.has_vectors:
+            embedding = await asyncio.to_thread(embed_question, item["question"])
+        nodes = (await hybrid_retrieve(item["question"], query_embedding=embedding)).nodes
+
+        start = time.perf_counter()
+        verdict = local_verdict(item["answer"], nodes)
+        local_ms.append((time.perf_counter() - start) * 1000)
+
+        reference = (await llm_verify(item["answer"], nodes))[0] if use_llm else item["faithful"]
+        decisions[verdict.decision] += 1
+        if verdict.decision != ESCALATE:
+            agree += (verdict.decision == ACCEPT) == reference
+            false_accepts += verdict.decision == ACCEPT and not reference
+        if verbose:
+            print(f"{verdict.decision:>8} ref={str(reference):<5} score={verdict.score:.2f}  {item['answer'][:70]}")
+
+    decided = decisions["accept"] + decisions["reject"]
+    mode = "hybrid" if ingestion_manager.has_vectors else "keyword-only"
+    print(f"{len(items)} answers, {mode} retrieval, reference: {'LLM verifier' if use_llm else 'labels'}")
+    print(f"local decisions: {decisions['accept']} accept, {decisions['reject']} reject, {decisions['escalate']} escalate")
+    print(f"LLM calls avoided: {decided}/{len(items)} ({decided / len(items):.0%})")
+    if decided:
+        print(f"agreement on decided answers: {agree}/{decided} ({agree / decided:.0%}), false accepts: {false_accepts}")
+    print(f"local check: median {statistics.median(local_ms):.2f} ms, max {max(local_ms):.2f} ms")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--answers", type=Path, default=DEFAULT_ANSWERS)
+    parser.add_argument("--llm", action="store_true", help="compare against the LLM verifier instead of the labels")
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    ingestion_manager.load()
+    with open(args.answers) as f:
+        items = [json.loads(line) for line in f if line.strip()]
+    asyncio.run(evaluate(items, args.llm, args.verbose))
+
+if __name__ == "__main__":
+    main()
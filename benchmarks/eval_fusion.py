@@ -0,0 +1,89 @@
+"""
+Offline recall@k and latency per fusion mode over a labeled question set.
+
+Each line of the question set is {"question": ..., "relevant": [snippet, ...]};
+a snippet counts as recalled when any of the top-k fused nodes contains it
+(compared case-, whitespace- and punctuation-insensitively, since PDF
+extraction mangles spacing). Both retriever legs run once per question with
+the candidate pool, then every fusion mode ranks the same candidates.
+
+    python -m benchmarks.eval_fusion --k 3 4 --candidate-pool 10
+"""
+import argparse
+import asyncio
+import json
+import re
+import statistics
+import time
+from pathlib import Path
+
+from app.core.fusion import fuse
+from app.core.retrieval import hybrid_retrieve
+from app.schemas.models import FusionMode
+
+DEFAULT_QUESTIONS = Path(__file__).parent / "data" / "retrieval_eval.jsonl"
+
+def _normalize(text: str) -> str:
+    return re.sub(r"[^a-z0-9]", "", text.lower())
+
+def recall(nodes, relevant: list[str]) -> float:
+    texts = [_normalize(n.node.get_content()) for n in nodes]
+    found = sum(1 for snippet in relevant if any(_normalize(snippet) in t for t in texts))
+    return found / len(relevant)
+
+def union_baseline(vector_results, keyword_results, per_leg: int):
+    # Previous behaviour: top 3 of each leg, naive union by node ID
+    seen, merged = set(), []
+    for res in vector_results[:per_leg] + keyword_results[:per_leg]:
+        if res.node.node_id not in seen:
+            merged.append(res)
+            seen.add(res.node.node_id)
+    return merged
+
+async def evaluate(questions: list[dict], ks: list[int], candidate_pool: int):
+    rows = {("union (old)", None): {"recall": [], "ms": [], "nodes": []}}
+    for mode in FusionMode:
+        for k in ks:
+            rows[(mode.value, k)] = {"recall": [], "ms": [], "nodes": []}
+    retrieval_ms = []
+
+    for item in questions:
+        result = await hybrid_retrieve(item["question"], candidate_pool=candidate_pool)
+        retrieval_ms.append(result.timings.get("vector", 0.0) + result.timings.get("keyword", 0.0))
+
+        baseline = union_baseline(result.vector_results, result.keyword_results, per_leg=3)
+        row = rows[("union (old)", None)]
+        row["recall"].append(recall(baseline, item["relevant"]))
+        row["ms"].append(0.0)
+        row["nodes"].append(len(baseline))
+
+        for mode in FusionMode:
+            for k in ks:
+                start = time.perf_counter()
+                fused = fuse(result.vector_results, result.keyword_results, mode=mode, top_k=k)
+                elapsed = (time.perf_counter() - start) * 1000
+                row = rows[(mode.value, k)]
+                row["recall"].append(recall(fused, item["relevant"]))
+                row["ms"].append(elapsed)
+                row["nodes"].append(len(fused))
+
+    print(f"{len(questions)} questions, candidate pool {candidate_pool}, "
+          f"median retrieval {statistics.median(retrieval_ms):.1f} ms (both legs)")
+    print(f"{'mode':>12} | {'k':>3} | {'recall@k':>8} | {'nodes/query':>11} | {'fusion ms':>9}")
+    for (mode, k), row in rows.items():
+        print(f"{mode:>12} | {k or '-':>3} | {statistics.mean(row['recall']):>8.3f} | "
+              f"{statistics.mean(row['nodes']):>11.1f} | {statistics.mean(row['ms']):>9.3f}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--questions", type=Path, default=DEFAULT_QUESTIONS)
+    parser.add_argument("--k", type=int, nargs="+", default=[3, 4, 6])
+    parser.add_argument("--candidate-pool", type=int, default=10)
+    args = parser.parse_args()
+
+    with open(args.questions) as f:
+        questions = [json.loads(line) for line in f if line.strip()]
+    asyncio.run(evaluate(questions, args.k, args.candidate_pool))
+
+if __name__ == "__main__":
+    main()
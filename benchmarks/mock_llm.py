@@ -0,0 +1,86 @@
+"""
+Deterministic OpenAI-compatible LLM server for load benchmarks.
+
+/chat/completions answers generation prompts with the first sentence of the first
+clause in the prompt (so the local grounding check accepts it) and verification
+prompts with a faithful verdict. Each request sleeps latency +/- jitter and fails
+with a 503 at `failure-rate`; both are drawn from a generator seeded with the seed,
+the prompt and how many times that prompt was seen, so a replayed workload gets the
+same delays and failures whatever order requests arrive in.
+
+    python -m benchmarks.mock_llm --port 8100 --latency-ms 400 --jitter-ms 100 --failure-rate 0.02
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import random
+import re
+from collections import Counter
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+# The clause blocks pack_context writes between "CLAUSES:" and the instructions
+CLAUSE_BLOCK = re.compile(r"CLAUSES:\n\[[^\]]*\] (.+?)(?:\n\n|\n(?:You are|Task:))", re.S)
+
+def answer_for(prompt: str) -> str:
+    if "ANSWER TO VERIFY:" in prompt:
+        return '{"is_faithful": true, "score": 0.95, "reason": "Supported by the clauses."}'
+    match = CLAUSE_BLOCK.search(prompt)
+    if not match:
+        return "The clauses do not contain the answer."
+    sentence = re.split(r"(?<=[.;:])\s", match.group(1).strip(), maxsplit=1)[0]
+    return " ".join(sentence.split()[:60])
+
+def create_app(latency_ms: float, jitter_ms: float, failure_rate: float, seed: int = 0) -> FastAPI:
+    app = FastAPI(title="Mock LLM")
+    seen = Counter()
+
+    def draw(prompt: str) -> tuple[float, bool]:
+        digest = hashlib.sha256(prompt.encode()).hexdigest()
+        seen[digest] += 1
+        rng = random.Random(f"{seed}:{digest}:{seen[digest]}")
+        delay = max(0.0, latency_ms + rng.uniform(-jitter_ms, jitter_ms)) / 1000
+        return delay, rng.random() < failure_rate
+
+    @app.post("/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        prompt = body["messages"][-1]["content"]
+        delay, failed = draw(prompt)
+        await asyncio.sleep(delay)
+        if failed:
+            return JSONResponse({"error": {"message": "mock upstream failure"}}, status_code=503)
+
+        text = answer_for(prompt)
+        if body.get("stream"):
+            async def events():
+                for word in re.findall(r"\S+\s*", text):
+                    yield f"data: {json.dumps({'choices': [{'delta': {'content': word}}]})}\n\n"
+                yield "data: [DONE]\n\n"
+            return StreamingResponse(events(), media_type="text/event-stream")
+        return {
+            "choices": [{"message": {"role": "assistant", "content": text}}],
+            "usage": {"prompt_tokens": len(prompt) // 4, "completion_tokens": len(text.split())},
+        }
+
+    return app
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--latency-ms", type=float, default=400)
+    parser.add_argument("--jitter-ms", type=float, default=100)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    import uvicorn
+    uvicorn.run(
+        create_app(args.latency_ms, args.jitter_ms, args.failure_rate, args.seed),
+        host=args.host, port=args.port, log_level="warning",
+    )
+
+if __name__ == "__main__":
+    main()
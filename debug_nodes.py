@@ -1,5 +1,7 @@
 from app.ingestion.index import ingestion_manager
 
+ingestion_manager.load()
+
 print(f"Total Nodes: {len(ingestion_manager.nodes)}")
 if len(ingestion_manager.nodes) > 0:
     print("Sample Node Content:")
@@ -1,5 +1,6 @@
 import pytest
 from fastapi.testclient import TestClient
+from app.core.config import config
 from app.main import app
 
 client = TestClient(app)
@@ -40,3 +41,25 @@ def test_debug_retrieval():
     response = client.post("/api/v1/debug/retrieval", json=payload)
     assert response.status_code == 200
     assert isinstance(response.json(), list)
+
+def test_ready_endpoint():
+    response = client.get("/ready")
+    data = response.json()
+    assert "status" in data
+    if data["status"] in ("ready", "degraded"):
+        assert response.status_code == 200
+    else:
+        assert response.status_code == 503
+
+def test_metrics_endpoint():
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    assert "# TYPE rag_stage_seconds histogram" in response.text
+
+def test_admin_ingest_requires_a_configured_token(monkeypatch):
+    monkeypatch.setattr(config, "ADMIN_TOKEN", None)
+    assert client.post("/api/v1/admin/ingest", headers={"X-Admin-Token": ""}).status_code == 403
+    monkeypatch.setattr(config, "ADMIN_TOKEN", "s3cret")
+    assert client.post("/api/v1/admin/ingest").status_code == 403
+    assert client.post("/api/v1/admin/ingest", headers={"X-Admin-Token": "wrong"}).status_code == 403
@@ -0,0 +1,134 @@
+import json
+import os
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from app.core import audit_logger, pipeline
+from app.core.audit_logger import AuditSink, backfill_store, log_query
+from app.core.audit_store import AuditQuery, AuditStore
+from app.core.cache import query_cache
+from app.core.semantic_cache import semantic_cache
+from app.schemas.models import AnswerResponse, AuditLogEntry, Jurisdiction, Outcome, ConfidenceLevel, QueryRequest
+
+def _entry(timestamp: datetime = None) -> AuditLogEntry:
+    return AuditLogEntry(
+        query_id=str(uuid.uuid4()),
+        question="What is the time limit for issuing a tax invoice?",
+        jurisdiction=Jurisdiction.DPDP,
+        outcome=Outcome.ANSWERED,
+        confidence_level=ConfidenceLevel.HIGH,
+        timestamp=timestamp or datetime.now(),
+    )
+
+def test_concurrent_writers_lose_nothing(tmp_path):
+    sink = AuditSink(str(tmp_path / "audit.jsonl"), batch_size=32, flush_interval=0.01)
+
+    def write_many():
+        for _ in range(250):
+            sink.write(_entry())
+
+    threads = [threading.Thread(target=write_many) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    sink.close()
+
+    lines = (tmp_path / "audit.jsonl").read_text().splitlines()
+    assert len(lines) == 1000
+    assert len({json.loads(line)["query_id"] for line in lines}) == 1000
+
+def test_size_rotation_archives_and_backfill_reads_everything(tmp_path):
+    sink = AuditSink(str(tmp_path / "audit.jsonl"), batch_size=10, flush_interval=0.01, fsync="never", max_bytes=2000)
+    for _ in range(100):
+        sink.write(_entry())
+    sink.close()
+
+    assert sink.rotations > 0
+    assert len(sink.archives()) == sink.rotations
+    sink.store = AuditStore(str(tmp_path / "audit.db"))
+    assert backfill_store(sink) == 100
+    assert backfill_store(sink) == 0
+
+def test_time_rotation_on_old_first_entry(tmp_path):
+    sink = AuditSink(str(tmp_path / "audit.jsonl"), flush_interval=0.01, max_bytes=0, rotate_seconds=3600)
+    sink.write(_entry(datetime.now() - timedelta(hours=2)))
+    sink.close()
+
+    assert len(sink.archives()) == 1
+    assert not (tmp_path / "audit.jsonl").exists()
+
+def test_semantic_hits_are_audited_as_their_own_queries(tmp_path, monkeypatch):
+    store = AuditStore(str(tmp_path / "audit.db"))
+    sink = AuditSink(str(tmp_path / "audit.jsonl"), flush_interval=0.01, store=store)
+    monkeypatch.setattr(audit_logger, "audit_sink", sink)
+    query_cache.clear()
+    semantic_cache.clear()
+
+    original = QueryRequest(question="What is the time limit for issuing a tax invoice?", jurisdiction="DPDP")
+    answer = AnswerResponse(
+        query_id=str(uuid.uuid4()), answer="Thirty days.", confidence=ConfidenceLevel.HIGH,
+        grounding_nodes=[], faithfulness_score=1.0,
+    )
+    log_query(answer.query_id, original.question, original.jurisdiction, answer.outcome, answer.confidence)
+    key, namespace = pipeline.cache_key(original), pipeline.cache_namespace(original)
+    pipeline.cache_response(key, namespace, answer, [1.0, 0.0, 0.0])
+
+    for question in ("When must a tax invoice be issued?", "By when is a tax invoice due?"):
+        rephrased = QueryRequest(question=question, jurisdiction="DPDP")
+        hit = pipeline.semantic_hit(rephrased, pipeline.cache_key(rephrased), namespace, [0.99, 0.05, 0.0])
+        assert hit is answer
+    sink.close()
+    query_cache.clear()
+    semantic_cache.clear()
+
+    entries, _ = store.page(AuditQuery(descending=False))
+    assert [e["question"] for e in entries] == [
+        original.question, "When must a tax invoice be issued?", "By when is a tax invoice due?",
+    ]
+    assert len({e["query_id"] for e in entries}) == 3
+    assert [e["cached_query_id"] for e in entries] == [None, answer.query_id, answer.query_id]
+    assert entries[1]["cache_similarity"] > 0.9
+
+def test_failed_writes_are_spilled_or_retried(tmp_path):
+    path = tmp_path / "audit.jsonl"
+    sink = AuditSink(str(path), flush_interval=0.01, retry_interval=0.05)
+    # The log path is unwritable (a directory): the batch goes to audit.jsonl.failed
+    path.mkdir()
+    sink.write(_entry())
+    sink.flush()
+    assert len((tmp_path / "audit.jsonl.failed").read_text().splitlines()) == 1
+
+    # Neither writable: kept in memory and retried without waiting for new entries
+    (tmp_path / "audit.jsonl.failed").rename(tmp_path / "spilled")
+    (tmp_path / "audit.jsonl.failed").mkdir()
+    sink.write(_entry())
+    sink.flush()
+    assert len(sink.pending) == 1
+    (tmp_path / "audit.jsonl.failed").rmdir()
+    (tmp_path / "spilled").rename(tmp_path / "audit.jsonl.failed")
+    path.rmdir()
+    deadline = time.monotonic() + 5
+    while sink.pending and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert not sink.pending
+    sink.write(_entry())
+    sink.close()
+
+    # Everything reaches the log and the spill file is gone
+    assert len(path.read_text().splitlines()) == 3 and sink.failures >= 2
+    assert not (tmp_path / "audit.jsonl.failed").exists()
+
+def test_rotated_logs_left_uncompressed_are_archived(tmp_path):
+    sink = AuditSink(str(tmp_path / "audit.jsonl"), flush_interval=0.01, max_bytes=1)
+    sink.write(_entry())
+    sink.close()
+    # A worker died between rotating and compressing
+    stale = tmp_path / f"audit.jsonl.20260101T000000000000.{os.getpid()}"
+    stale.write_text(_entry().model_dump_json() + "\n")
+    (tmp_path / "audit.jsonl.lock").touch()
+
+    assert sink.archives() == [str(stale)] + [str(p) for p in sorted(tmp_path.glob("*.jsonl.gz"))]
+    sink.store = AuditStore(str(tmp_path / "audit.db"))
+    assert backfill_store(sink) == 2
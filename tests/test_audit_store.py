@@ -0,0 +1,56 @@
+import json
+import uuid
+from datetime import datetime, timedelta
+import pytest
+from app.core.audit_store import AuditStore, AuditQuery
+from app.schemas.models import AuditLogEntry, Jurisdiction, Outcome, ConfidenceLevel
+
+START = datetime(2026, 1, 1)
+
+@pytest.fixture
+def store(tmp_path):
+    store = AuditStore(str(tmp_path / "audit.db"))
+    lines = []
+    for i in range(50):
+        lines.append(AuditLogEntry(
+            query_id=str(uuid.uuid4()),
+            question=f"question {i}",
+            jurisdiction=Jurisdiction.DPDP if i % 2 else Jurisdiction.GDPR,
+            outcome=Outcome.ABSTAINED if i % 5 == 0 else Outcome.ANSWERED,
+            confidence_level=ConfidenceLevel.HIGH,
+            # Pairs share a timestamp so the cursor must break ties
+            timestamp=START + timedelta(minutes=i // 2),
+        ).model_dump_json())
+    store.insert_many(lines)
+    return store
+
+def test_cursor_pages_cover_everything_once(store):
+    seen, cursor = [], None
+    while True:
+        entries, cursor = store.page(AuditQuery(), limit=7, cursor=cursor)
+        seen.extend(e["question"] for e in entries)
+        if cursor is None:
+            break
+    assert len(seen) == len(set(seen)) == 50
+    assert seen[0] in ("question 48", "question 49")
+
+def test_filters_combine(store):
+    query = AuditQuery(
+        jurisdiction="DPDP",
+        outcome="ANSWERED",
+        since=START + timedelta(minutes=5),
+        until=START + timedelta(minutes=10),
+        descending=False,
+    )
+    entries, cursor = store.page(query, limit=100)
+    assert cursor is None
+    assert [e["question"] for e in entries] == ["question 11", "question 13", "question 17", "question 19"]
+
+def test_export_streams_ndjson(store):
+    lines = list(store.export(AuditQuery(outcome="ABSTAINED"), page_size=3))
+    assert len(lines) == 10
+    assert all(json.loads(line)["outcome"] == "ABSTAINED" for line in lines)
+
+def test_invalid_cursor_is_rejected(store):
+    with pytest.raises(ValueError):
+        store.page(AuditQuery(), cursor="not-a-cursor")
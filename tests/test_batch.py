@@ -0,0 +1,102 @@
+import asyncio
+import numpy as np
+from llama_index.core import StorageContext, VectorStoreIndex
+from llama_index.core.embeddings import MockEmbedding
+from llama_index.core.retrievers import VectorIndexRetriever
+from llama_index.core.schema import NodeWithScore, QueryBundle, TextNode
+from app.core import pipeline
+from app.core.cache import query_cache
+from app.core.ratelimit import TokenBucket, ProviderRateLimiter
+from app.core.confidence import ConfidenceAssessment
+from app.core.retrieval import RetrievalResult
+from app.ingestion.index import IngestionManager
+from app.ingestion.vector_store import MmapVectorStore
+from app.schemas.models import ConfidenceLevel, QueryRequest
+
+def _patch_pipeline(monkeypatch, state):
+    node = NodeWithScore(node=TextNode(id_="clause_0", text="Invoices are due within 30 days."), score=0.9)
+
+    def fake_embed(questions):
+        state["embed_calls"].append(len(questions))
+        return [[1.0, 0.0] for _ in questions]
+
+    async def fake_retrieve_batch(queries, embeddings, **options):
+        state["retrieve_calls"].append(len(queries))
+        return [RetrievalResult(nodes=[node], vector_results=[node], keyword_results=[node]) for _ in queries]
+
+    async def fake_generate(question, nodes):
+        state["in_flight"] += 1
+        state["max_in_flight"] = max(state["max_in_flight"], state["in_flight"])
+        await asyncio.sleep(0.01)
+        state["in_flight"] -= 1
+        return f"Answer to {question}"
+
+    async def fake_verify(answer, nodes):
+        return True, 1.0
+
+    monkeypatch.setattr(pipeline, "embed_questions", fake_embed)
+    monkeypatch.setattr(pipeline, "hybrid_retrieve_batch", fake_retrieve_batch)
+    monkeypatch.setattr(pipeline, "assess_retrieval", lambda *args: ConfidenceAssessment(ConfidenceLevel.HIGH, 1.0))
+    monkeypatch.setattr(pipeline, "generate_answer", fake_generate)
+    monkeypatch.setattr(pipeline, "verify_faithfulness", fake_verify)
+
+async def _collect(requests, concurrency):
+    return [item async for item in pipeline.run_batch(requests, concurrency)]
+
+def test_batch_dedupes_embeds_once_and_bounds_concurrency(monkeypatch):
+    state = {"embed_calls": [], "retrieve_calls": [], "in_flight": 0, "max_in_flight": 0}
+    _patch_pipeline(monkeypatch, state)
+    query_cache.clear()
+
+    questions = [f"batch question {i}" for i in range(12)] + ["batch question 0"]
+    requests = [QueryRequest(question=q, jurisdiction="DPDP") for q in questions]
+    results = asyncio.run(_collect(requests, concurrency=3))
+
+    assert state["embed_calls"] == [12]
+    assert state["retrieve_calls"] == [12]
+    assert state["max_in_flight"] <= 3
+    answered = {index: response.answer for indices, response in results for index in indices}
+    assert len(answered) == 13
+    assert answered[0] == answered[12] == "Answer to batch question 0"
+
+    # A second run is served entirely from the response cache
+    state["embed_calls"].clear()
+    asyncio.run(_collect(requests, concurrency=3))
+    assert state["embed_calls"] == []
+
+def test_vector_search_batch_matches_retriever():
+    rng = np.random.default_rng(0)
+    nodes = [TextNode(id_=f"n{i}", text=f"text {i}", embedding=rng.normal(size=8).tolist()) for i in range(50)]
+    manager = IngestionManager()
+    storage_context = StorageContext.from_defaults(vector_store=MmapVectorStore())
+    manager.index = VectorStoreIndex(nodes, storage_context=storage_context, embed_model=MockEmbedding(embed_dim=8))
+    manager.node_map = {n.node_id: n for n in nodes}
+    manager.version = "test"
+
+    # Reference: LlamaIndex's in-memory SimpleVectorStore over the same embeddings
+    reference = VectorStoreIndex(nodes, embed_model=MockEmbedding(embed_dim=8))
+    queries = rng.normal(size=(5, 8)).tolist()
+    batched = manager.vector_search_batch(queries, similarity_top_k=4)
+    retriever = VectorIndexRetriever(index=reference, similarity_top_k=4)
+    for query, results in zip(queries, batched):
+        expected = retriever.retrieve(QueryBundle(query_str="q", embedding=query))
+        assert [n.node.node_id for n in results] == [n.node.node_id for n in expected]
+        assert np.allclose([n.score for n in results], [n.score for n in expected], atol=1e-5)
+        single = manager.get_vector_retriever(similarity_top_k=4).retrieve(QueryBundle(query_str="q", embedding=query))
+        assert [n.node.node_id for n in single] == [n.node.node_id for n in results]
+
+def test_token_bucket_spaces_requests_after_burst():
+    async def take(n):
+        bucket = TokenBucket(rate=50, capacity=2)
+        start = asyncio.get_running_loop().time()
+        for _ in range(n):
+            await bucket.acquire()
+        return asyncio.get_running_loop().time() - start
+
+    # 2 immediate, then 4 more at 50/s
+    assert asyncio.run(take(6)) >= 0.07
+
+def test_rate_limiter_keys_on_provider():
+    limiter = ProviderRateLimiter(default_rate=10, burst=5, rates={"anthropic": 1})
+    assert limiter.bucket("openai/gpt-4o-mini") is limiter.bucket("openai/gpt-4o")
+    assert limiter.bucket("anthropic/claude-3-haiku").rate == 1
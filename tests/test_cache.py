@@ -0,0 +1,66 @@
+import pickle
+import time
+from typing import Union
+from app.core.cache import ResponseCache
+from app.schemas.models import AbstainResponse, AnswerResponse, ConfidenceLevel
+
+QueryResponse = Union[AnswerResponse, AbstainResponse]
+
+def test_lru_evicts_least_recently_used():
+    cache = ResponseCache(max_entries=2, sweep_interval=0)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.stats()["evictions"] == 1
+
+def test_byte_budget_is_enforced():
+    cache = ResponseCache(max_entries=100, max_bytes=300, sweep_interval=0)
+    for i in range(10):
+        cache.set(f"k{i}", "x" * 100)
+    stats = cache.stats()
+    assert stats["bytes"] <= 300
+    assert stats["entries"] < 10
+
+def test_sweep_removes_expired_entries():
+    cache = ResponseCache(ttl_seconds=0.05, sweep_interval=0)
+    cache.set("a", 1)
+    time.sleep(0.1)
+    assert cache.sweep() == 1
+    assert cache.stats()["entries"] == 0
+
+def test_stats_count_hits_and_misses():
+    cache = ResponseCache(sweep_interval=0)
+    cache.set("a", 1)
+    cache.get("a")
+    cache.get("missing")
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"]) == (1, 1)
+
+def test_disk_tier_survives_new_instance(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    response = AbstainResponse(query_id="q1", reason="No relevant regulatory clauses found in the corpus.")
+    ResponseCache(sweep_interval=0, disk_path=path, disk_type=QueryResponse).set("DPDP:q", response)
+
+    restarted = ResponseCache(sweep_interval=0, disk_path=path, disk_type=QueryResponse)
+    assert restarted.get("DPDP:q") == response
+    assert restarted.stats()["disk_hits"] == 1
+
+def test_disk_tier_stores_json_and_misses_on_anything_else(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    cache = ResponseCache(sweep_interval=0, disk_path=path, disk_type=QueryResponse)
+    answer = AnswerResponse(
+        query_id="q2", answer="Within 30 days.", confidence=ConfidenceLevel.HIGH, grounding_nodes=[], faithfulness_score=1.0
+    )
+    cache.set("DPDP:answer", answer)
+    assert cache.disk.get("DPDP:answer")[0] == answer.model_dump_json().encode()
+    # A pickle planted in the shared file, and an entry from before a field was added
+    cache.disk.set("DPDP:pickle", pickle.dumps(answer), time.time())
+    cache.disk.set("DPDP:old", b'{"query_id": "q3", "answer": "Within 30 days."}', time.time())
+
+    restarted = ResponseCache(sweep_interval=0, disk_path=path, disk_type=QueryResponse)
+    assert restarted.get("DPDP:answer") == answer
+    assert restarted.get("DPDP:pickle") is None and restarted.get("DPDP:old") is None
+    assert restarted.stats()["misses"] == 2
@@ -0,0 +1,38 @@
+import numpy as np
+from llama_index.core.schema import NodeWithScore, TextNode
+from app.core.confidence import assess_confidence
+from app.ingestion.keyword_index import KeywordIndex
+from app.schemas.models import ConfidenceLevel
+
+def _setup(texts):
+    nodes = [TextNode(id_=f"n{i}", text=text) for i, text in enumerate(texts)]
+    return [NodeWithScore(node=n, score=1.0) for n in nodes], KeywordIndex.build(nodes)
+
+def test_coverage_is_token_level_not_substring():
+    results, index = _setup(["The syntax of taxable supplies.", "Registration of persons."])
+    assessment = assess_confidence("tax", results, results, results, keyword_index=index)
+    assert assessment.features["term_coverage"] == 0.0
+
+    assessment = assess_confidence("taxable supply", results, results, results, keyword_index=index)
+    assert assessment.features["term_coverage"] == 1.0
+
+def test_similarity_features_from_embeddings():
+    results, index = _setup(["Interest on delayed payment of tax.", "Registration of persons."])
+    node_embeddings = np.array([[1.0, 0.0], [0.0, 1.0]], dtype=np.float32)
+    assessment = assess_confidence(
+        "interest on delayed payment", results, results, results,
+        query_embedding=[1.0, 0.0], node_embeddings=node_embeddings, keyword_index=index,
+    )
+    assert assessment.features["top_similarity"] == 1.0
+    assert assessment.features["mean_similarity"] == 0.5
+    assert assessment.level == ConfidenceLevel.HIGH
+
+def test_unavailable_features_drop_out():
+    results, index = _setup(["Registration of persons."])
+    assessment = assess_confidence("cricket world cup winner", results, [], results, keyword_index=index)
+    assert assessment.features["top_similarity"] is None
+    assert assessment.features["agreement"] is None
+    assert assessment.level == ConfidenceLevel.LOW
+
+def test_no_nodes_is_low():
+    assert assess_confidence("anything", [], [], []).level == ConfidenceLevel.LOW
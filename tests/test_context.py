@@ -0,0 +1,46 @@
+from llama_index.core.schema import NodeWithScore, TextNode
+from app.core import faithfulness, generation
+from app.core.context import CONTEXT_PREFIX, count_tokens, pack_context
+
+OVERLAP = "the invoice shall be prepared in triplicate, in the case of supply of goods"
+
+def _node(node_id: str, text: str, score: float) -> NodeWithScore:
+    return NodeWithScore(node=TextNode(id_=node_id, text=text, metadata={"clause_id": node_id}), score=score)
+
+def test_overlap_between_adjacent_chunks_is_sent_once():
+    first = _node("rule_48_a", f"48. Manner of issuing invoice.   (1)\n\n  Subject to sub-rule (2), {OVERLAP}", 0.9)
+    second = _node("rule_48_b", f"{OVERLAP}, namely: the original copy being marked ORIGINAL FOR RECIPIENT.", 0.7)
+    packed = pack_context([second, first], budget=1000)
+
+    assert packed.node_ids == ["rule_48_a", "rule_48_b"]
+    assert packed.text.count(OVERLAP) == 1
+    assert "ORIGINAL FOR RECIPIENT" in packed.text
+    assert "  " not in packed.text
+    assert packed.deduplicated == 1
+    assert packed.tokens < packed.raw_tokens
+
+    # A chunk wholly contained in a kept one adds nothing
+    assert pack_context([first, _node("dup", OVERLAP, 0.5)], budget=1000).node_ids == ["rule_48_a"]
+
+def test_budget_keeps_best_scored_clauses():
+    filler = " ".join(f"Condition {i} of the rule applies to the registered person." for i in range(40))
+    nodes = [_node(f"rule_{i}", f"Rule {i}. {filler}", score) for i, score in enumerate([0.2, 0.9, 0.5])]
+    packed = pack_context(nodes, budget=500)
+
+    assert packed.tokens <= 500
+    assert packed.node_ids[0] == "rule_1"
+    assert "rule_0" not in packed.node_ids
+    assert packed.truncated + packed.dropped == 2
+    assert count_tokens(packed.text) == packed.tokens
+
+def test_generation_and_verification_prompts_share_the_context_prefix():
+    nodes = [_node("rule_47", "47. The invoice shall be issued within thirty days.", 1.0)]
+    generation_prompt = generation.build_prompt("When is the invoice due?", nodes)
+    verification_prompt = faithfulness.VERIFICATION_PROMPT.format(
+        context_str=pack_context(nodes).text, answer="Within thirty days."
+    )
+    prefix = CONTEXT_PREFIX.format(context_str=pack_context(nodes).text)
+
+    assert generation_prompt.startswith(prefix)
+    assert verification_prompt.startswith(prefix)
+    assert "[rule_47] 47. The invoice shall be issued within thirty days." in prefix
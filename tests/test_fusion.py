@@ -0,0 +1,34 @@
+import pytest
+from llama_index.core.schema import NodeWithScore, TextNode
+from app.core.fusion import fuse
+from app.schemas.models import FusionMode
+
+def _hits(*pairs):
+    return [NodeWithScore(node=TextNode(id_=node_id, text=node_id), score=score) for node_id, score in pairs]
+
+VECTOR = _hits(("a", 0.82), ("b", 0.80), ("c", 0.40))
+KEYWORD = _hits(("b", 9.5), ("d", 7.0), ("a", 1.0))
+
+@pytest.mark.parametrize("mode", list(FusionMode))
+def test_fused_scores_are_normalized_and_ranked(mode):
+    fused = fuse(VECTOR, KEYWORD, mode=mode, top_k=4)
+    scores = [n.score for n in fused]
+    assert all(0.0 <= s <= 1.0 for s in scores)
+    assert scores == sorted(scores, reverse=True)
+    # "b" ranks high in both legs
+    assert fused[0].node.node_id == "b"
+
+def test_top_k_limits_results():
+    assert len(fuse(VECTOR, KEYWORD, mode=FusionMode.RRF, top_k=2)) == 2
+
+def test_zero_weight_drops_leg():
+    fused = fuse(VECTOR, KEYWORD, mode=FusionMode.MIN_MAX, top_k=5, keyword_weight=0.0)
+    assert [n.node.node_id for n in fused] == ["a", "b", "c"]
+
+def test_single_leg_still_fuses():
+    fused = fuse([], KEYWORD, mode=FusionMode.Z_SCORE, top_k=3)
+    assert [n.node.node_id for n in fused] == ["b", "d", "a"]
+
+def test_inputs_are_not_mutated():
+    fuse(VECTOR, KEYWORD, mode=FusionMode.RRF, top_k=4)
+    assert VECTOR[0].score == 0.82
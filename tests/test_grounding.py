@@ -0,0 +1,99 @@
+import asyncio
+import uuid
+import numpy as np
+from llama_index.core.llms import CompletionResponse
+from llama_index.core.schema import NodeWithScore, TextNode
+from app.core import faithfulness
+from app.core.grounding import ACCEPT, ESCALATE, REJECT, check_grounding, split_claims
+
+NODES = [
+    NodeWithScore(node=TextNode(id_="rule_47", text=(
+        "47. Time limit for issuing tax invoice. The invoice referred to in rule 46, in the case of "
+        "the taxable supply of services, shall be issued within a period of thirty days from the date "
+        "of the supply of service."
+    )), score=1.0),
+    NodeWithScore(node=TextNode(id_="rule_48", text=(
+        "48. Manner of issuing invoice. The invoice shall be prepared in triplicate, in the case of supply of goods."
+    )), score=0.8),
+]
+
+def test_split_claims_drops_fragments():
+    assert split_claims("Yes.\n- The invoice is prepared in triplicate; a copy goes to the transporter.") == [
+        "The invoice is prepared in triplicate;", "a copy goes to the transporter.",
+    ]
+
+def test_grounded_answer_is_accepted_and_ungrounded_rejected():
+    grounded = check_grounding("Based on the provided clauses: a tax invoice for services shall be issued within a "
+                               "period of 30 days from the date of the supply of service. "
+                               "The invoice is prepared in triplicate for supply of goods.", NODES)
+    assert grounded.decision == ACCEPT
+
+    ungrounded = check_grounding("Penalties under GDPR can reach 4% of annual worldwide turnover.", NODES)
+    assert ungrounded.decision == REJECT
+
+def test_unsupported_number_or_weak_similarity_escalates():
+    # Every word is in the context, but the number is not
+    assert check_grounding("The invoice shall be issued within 45 days.", NODES).decision == ESCALATE
+
+    # Lexically covered, but the embeddings disagree
+    node_embeddings = np.array([[1.0, 0.0, 0.0], [0.0, 1.0, 0.0]], dtype=np.float32)
+    verdict = check_grounding("The invoice shall be prepared in triplicate.", NODES, [[0.5, 0.5, 1.0]], node_embeddings)
+    assert verdict.decision == ESCALATE
+    assert verdict.claims[0]["similarity"] < 0.7
+
+def test_local_verdict_skips_llm_and_llm_errors_fail_closed(monkeypatch):
+    def failing_llm():
+        raise RuntimeError("provider down")
+    monkeypatch.setattr(faithfulness, "get_llm", failing_llm)
+
+    is_faithful, score = asyncio.run(faithfulness.verify_faithfulness("The invoice is prepared in triplicate for supply of goods.", NODES))
+    assert is_faithful and score >= 0.8
+
+    # Ambiguous answers go to the LLM; when it fails the answer is rejected, not waved through
+    is_faithful, score = asyncio.run(faithfulness.verify_faithfulness("The invoice shall be issued within 45 days.", NODES))
+    assert (is_faithful, score) == (False, 0.0)
+
+class ChainLLM:
+    """
+    Gateway stand-in whose completions are served by the last model of its chain.
+    """
+    def __init__(self, models):
+        self.models = models
+        self.calls = 0
+
+    async def acomplete(self, prompt):
+        self.calls += 1
+        return CompletionResponse(text='{"is_faithful": true}', additional_kwargs={"model": self.models[-1]})
+
+def test_llm_verdicts_are_cached_per_serving_model(monkeypatch):
+    answer = f"The invoice shall be issued within 45 days. {uuid.uuid4()}"
+    served_by_fallback = ChainLLM(["primary/model", "backup/model"])
+    monkeypatch.setattr(faithfulness, "get_llm", lambda: served_by_fallback)
+    assert asyncio.run(faithfulness.llm_verify(answer, NODES)) == (True, 1.0)
+    assert asyncio.run(faithfulness.llm_verify(answer, NODES)) == (True, 1.0)
+    assert served_by_fallback.calls == 1
+
+    # The backup model's verdict is not reused once it is out of the chain
+    primary_only = ChainLLM(["primary/model"])
+    monkeypatch.setattr(faithfulness, "get_llm", lambda: primary_only)
+    asyncio.run(faithfulness.llm_verify(answer, NODES))
+    assert primary_only.calls == 1
+
+REGISTRATION = [NodeWithScore(node=TextNode(id_="section_22", text=(
+    "22. Persons liable for registration. Every supplier shall be liable to be registered under this Act "
+    "in the State from where he makes a taxable supply of goods or services."
+)), score=1.0)]
+
+def test_negated_or_modal_flipped_claims_escalate():
+    affirmed = check_grounding("Every supplier shall be liable to be registered in the State from where he makes a taxable supply.", REGISTRATION)
+    assert affirmed.decision == ACCEPT
+
+    for flipped in (
+        "A supplier is not liable to be registered in the State from where he makes a taxable supply.",
+        "No supplier shall be liable to be registered in the State from where he makes a taxable supply.",
+        "A supplier isn't liable to be registered in the State from where he makes a taxable supply.",
+        "Every supplier may be registered in the State from where he makes a taxable supply.",
+    ):
+        verdict = check_grounding(flipped, REGISTRATION)
+        assert verdict.decision == ESCALATE, flipped
+        assert verdict.claims[0]["polarity_mismatch"]
@@ -0,0 +1,44 @@
+from llama_index.core.schema import TextNode
+from app.ingestion.keyword_index import KeywordIndex, KeywordRetriever, load_or_build
+
+NODES = [
+    TextNode(id_="n0", text="A tax invoice shall be issued before or at the time of removal of goods."),
+    TextNode(id_="n1", text="Interest at eighteen percent per annum is payable on delayed payment of tax."),
+    TextNode(id_="n2", text="Input tax credit is available on the basis of an invoice or debit note."),
+]
+
+def test_search_ranks_matching_clause_first():
+    index = KeywordIndex.build(NODES)
+    results = index.search("interest on delayed payment", top_k=2)
+    assert results[0][0] == "n1"
+    assert all(score > 0 for _, score in results)
+
+def test_search_unknown_terms_returns_nothing():
+    index = KeywordIndex.build(NODES)
+    assert index.search("zzzz qqqq", top_k=3) == []
+
+def test_persisted_index_matches_in_memory(tmp_path):
+    index = KeywordIndex.build(NODES)
+    index.persist(str(tmp_path))
+    loaded = KeywordIndex.load(str(tmp_path))
+    assert loaded.search("invoice", top_k=3) == index.search("invoice", top_k=3)
+
+def test_load_or_build_rebuilds_when_nodes_change(tmp_path):
+    load_or_build(str(tmp_path), NODES[:2])
+    index = load_or_build(str(tmp_path), NODES)
+    assert set(index.node_ids) == {"n0", "n1", "n2"}
+
+def test_retriever_returns_nodes_with_scores():
+    index = KeywordIndex.build(NODES)
+    retriever = KeywordRetriever(index, {n.node_id: n for n in NODES}, similarity_top_k=1)
+    results = retriever.retrieve("credit")
+    assert len(results) == 1
+    assert results[0].node.node_id == "n2"
+
+def test_node_term_sets_and_doc_freqs():
+    index = KeywordIndex.build(NODES)
+    tax, invoic = index.term_ids["tax"], index.term_ids["invoic"]
+    assert {tax, invoic} <= index.node_term_set("n0")
+    assert invoic not in index.node_term_set("n1")
+    assert index.node_term_set("missing") is None
+    assert index.doc_freqs([tax, invoic]) == [3, 2]
@@ -0,0 +1,166 @@
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+from app.core.llm_gateway import LLMGateway, LLMUnavailableError
+from app.core.ratelimit import ProviderRateLimiter
+
+class StubHandler(BaseHTTPRequestHandler):
+    """
+    OpenAI-compatible /chat/completions whose behaviour depends on the model name:
+    "limited/*" answers 429, "slow/*" sleeps, "slow-once/*" sleeps on its first request only,
+    "garbled/*" answers 200 with a body that is not JSON and "empty/*" one without choices.
+    """
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        server = self.server
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        model = body["model"]
+        with server.lock:
+            server.calls[model] = server.calls.get(model, 0) + 1
+            first_call = server.calls[model] == 1
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+        try:
+            if model.startswith("limited/"):
+                return self._send(429, {"error": {"message": "rate limited"}}, {"Retry-After": "0"})
+            if model.startswith("slow/") or (model.startswith("slow-once/") and first_call):
+                time.sleep(server.delay)
+            if model.startswith("garbled/"):
+                data = b"data: <html>Bad gateway</html>\n\n" if body.get("stream") else b"<html>Bad gateway</html>"
+                return self._send_raw(200, data, "text/event-stream" if body.get("stream") else "text/html")
+            if model.startswith("empty/"):
+                return self._send(200, {"choices": []})
+            if body.get("stream"):
+                return self._stream(["Invoices ", "are due ", "in 30 days."])
+            self._send(200, {
+                "choices": [{"message": {"role": "assistant", "content": f"answer from {model}"}}],
+                "usage": {"prompt_tokens": 10, "completion_tokens": 3},
+            })
+        finally:
+            with server.lock:
+                server.in_flight -= 1
+
+    def _send(self, status, payload, headers=None):
+        self._send_raw(status, json.dumps(payload).encode(), "application/json", headers)
+
+    def _send_raw(self, status, data, content_type, headers=None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _stream(self, deltas):
+        events = [f"data: {json.dumps({'choices': [{'delta': {'content': d}}]})}\n\n" for d in deltas]
+        data = ("".join(events) + "data: [DONE]\n\n").encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+class StubServer(ThreadingHTTPServer):
+    def handle_error(self, request, client_address):
+        # The losing hedged request's connection is closed mid-response
+        pass
+
+@pytest.fixture
+def stub():
+    server = StubServer(("127.0.0.1", 0), StubHandler)
+    server.lock = threading.Lock()
+    server.calls, server.in_flight, server.max_in_flight, server.delay = {}, 0, 0, 0.2
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+def _gateway(stub, models, **kwargs):
+    kwargs.setdefault("backoff_base", 0.0)
+    return LLMGateway(
+        f"http://127.0.0.1:{stub.server_address[1]}", "test-key", models,
+        ProviderRateLimiter(0, 1), **kwargs
+    )
+
+def _run(gateway, coro):
+    async def main():
+        try:
+            return await coro
+        finally:
+            await gateway.aclose()
+    return asyncio.run(main())
+
+def test_retries_429_then_falls_back_to_next_model(stub):
+    gateway = _gateway(stub, ["limited/primary", "ok/backup"], max_retries=1)
+    response = _run(gateway, gateway.acomplete("When is an invoice due?"))
+
+    assert response.text == "answer from ok/backup"
+    assert response.additional_kwargs["model"] == "ok/backup"
+    stats = gateway.snapshot()
+    assert stats["limited/primary"]["errors"] == {"429": 2}
+    assert stats["limited/primary"]["retries"] == 1
+    assert stats["ok/backup"]["fallbacks"] == 1
+    assert stats["ok/backup"]["successes"] == 1
+    assert stats["ok/backup"]["prompt_tokens"] == 10
+
+def test_raises_unavailable_when_every_model_fails(stub):
+    gateway = _gateway(stub, ["limited/a", "limited/b"], max_retries=0)
+    with pytest.raises(LLMUnavailableError):
+        _run(gateway, gateway.acomplete("When is an invoice due?"))
+    assert stub.calls == {"limited/a": 1, "limited/b": 1}
+
+def test_malformed_200_responses_fall_through_to_the_next_model(stub):
+    gateway = _gateway(stub, ["garbled/a", "empty/b", "ok/c"], max_retries=0)
+    response = _run(gateway, gateway.acomplete("When is an invoice due?"))
+
+    assert response.text == "answer from ok/c"
+    stats = gateway.snapshot()
+    assert stats["garbled/a"]["errors"] == stats["empty/b"]["errors"] == {"bad_response": 1}
+
+    async def stream():
+        return [chunk.delta async for chunk in await gateway.astream_complete("When is an invoice due?")]
+    gateway = _gateway(stub, ["garbled/a", "ok/b"], max_retries=0)
+    assert "".join(_run(gateway, stream())) == "Invoices are due in 30 days."
+    assert gateway.snapshot()["garbled/a"]["errors"] == {"bad_response": 1}
+
+def test_hedges_a_slow_request(stub):
+    stub.delay = 2.0
+    gateway = _gateway(stub, ["slow-once/a"], hedge_after=0.1)
+    start = time.perf_counter()
+    response = _run(gateway, gateway.acomplete("When is an invoice due?"))
+
+    assert response.text == "answer from slow-once/a"
+    assert time.perf_counter() - start < 1.5
+    assert gateway.snapshot()["slow-once/a"]["hedges"] == 1
+
+def test_concurrency_limit_and_streaming(stub):
+    gateway = _gateway(stub, ["slow/a"], max_concurrency=2)
+
+    async def many():
+        return await asyncio.gather(*(gateway.acomplete(f"question {i}") for i in range(6)))
+    _run(gateway, many())
+    assert stub.max_in_flight == 2
+
+    async def stream():
+        return [chunk.delta async for chunk in await gateway.astream_complete("When is an invoice due?")]
+    assert "".join(_run(gateway, stream())) == "Invoices are due in 30 days."
+
+def test_client_of_a_previous_event_loop_is_closed(stub):
+    gateway = _gateway(stub, ["ok/model"])
+    assert asyncio.run(gateway.acomplete("q")).text == "answer from ok/model"
+    first = gateway._client
+
+    async def second_loop():
+        await gateway.acomplete("q")
+        await asyncio.sleep(0.05)
+    _run(gateway, second_loop())
+    assert first.is_closed and not gateway._closing
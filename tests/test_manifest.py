@@ -0,0 +1,75 @@
+import pytest
+from llama_index.core import Settings
+from llama_index.core.embeddings import MockEmbedding
+from app.core.config import config
+from app.ingestion import index as index_module
+from app.ingestion.index import IngestionManager
+from app.ingestion.manifest import Manifest, scan_corpus
+
+def test_diff_detects_added_changed_removed(tmp_path):
+    (tmp_path / "a.txt").write_text("Section 16")
+    (tmp_path / "b.txt").write_text("Section 17")
+    manifest = Manifest()
+    for rel_path, sha256 in scan_corpus(tmp_path).items():
+        manifest.record(rel_path, sha256, [f"{rel_path}-node"])
+
+    (tmp_path / "a.txt").write_text("Section 16 (amended)")
+    (tmp_path / "b.txt").unlink()
+    (tmp_path / "c.txt").write_text("Section 50")
+
+    changes = manifest.diff(scan_corpus(tmp_path))
+    assert changes.added == ["c.txt"]
+    assert changes.changed == ["a.txt"]
+    assert changes.removed == ["b.txt"]
+    assert manifest.node_ids(changes.changed + changes.removed) == ["a.txt-node", "b.txt-node"]
+
+def test_scan_skips_hidden_files_and_recurses(tmp_path):
+    (tmp_path / ".DS_Store").write_text("x")
+    (tmp_path / "gst").mkdir()
+    (tmp_path / "gst" / "rules.txt").write_text("Rule 46")
+    assert list(scan_corpus(tmp_path)) == ["gst/rules.txt"]
+
+def test_clause_ids_are_never_reused(tmp_path):
+    manifest = Manifest()
+    assert [manifest.allocate_clause_id() for _ in range(2)] == ["clause_0", "clause_1"]
+    path = str(tmp_path / "manifest.json")
+    manifest.save(path)
+    assert Manifest.load(path).allocate_clause_id() == "clause_2"
+
+def test_sync_swaps_in_a_separately_built_index(tmp_path, monkeypatch):
+    corpus = tmp_path / "corpus"
+    corpus.mkdir()
+    (corpus / "a.txt").write_text("A tax invoice shall be issued within thirty days of the supply of services.")
+    monkeypatch.setattr(Settings, "_embed_model", MockEmbedding(embed_dim=8))
+    monkeypatch.setattr(index_module, "get_embed_model", lambda: Settings.embed_model)
+    monkeypatch.setattr(config, "CORPUS_DIR", corpus)
+    monkeypatch.setattr(config, "INGEST_WORKERS", 1)
+    monkeypatch.setattr(config, "CHUNKING_MODE", "sentence")
+    manager = IngestionManager(persist_dir=str(tmp_path / "storage"), snapshots=False)
+    manager.load()
+    old_index, old_version = manager.index, manager.version
+    retriever = manager.get_keyword_retriever(similarity_top_k=5)
+
+    (corpus / "b.txt").write_text("Interest on delayed payment of tax is eighteen per cent per annum.")
+    summary = manager.sync()
+    assert summary["added"] == ["b.txt"] and summary["version"] == manager.version != old_version
+    assert manager.index is not old_index and len(old_index.docstore.docs) == 1
+    assert len(manager.index.docstore.docs) == len(manager.node_map) == 2
+    # A retriever handed out before the sync still reads the old index
+    assert len(retriever.retrieve("tax")) == 1
+    assert len(manager.get_keyword_retriever(similarity_top_k=5).retrieve("tax")) == 2
+
+    # A full rebuild numbers clauses after the ones it replaces
+    clause_ids = {n.metadata["clause_id"] for n in manager.nodes}
+    manager.sync(full=True)
+    assert clause_ids.isdisjoint(n.metadata["clause_id"] for n in manager.nodes)
+    assert manager.manifest.next_clause == 2 * len(clause_ids)
+
+    # A failed rebuild leaves the serving index alone
+    def fail(self, changes):
+        raise RuntimeError("embedding service down")
+    monkeypatch.setattr(IngestionManager, "_apply_changes", fail)
+    new_index, new_version = manager.index, manager.version
+    with pytest.raises(RuntimeError):
+        manager.sync(full=True)
+    assert (manager.index, manager.version, manager.status) == (new_index, new_version, "ready")
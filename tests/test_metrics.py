@@ -0,0 +1,43 @@
+import asyncio
+from app.core import audit_logger
+from app.core.metrics import Registry, current_trace, observe_stage, start_trace, timed
+from app.schemas.models import ConfidenceLevel, Jurisdiction, Outcome
+
+def test_histograms_and_counters_render_in_prometheus_format():
+    registry = Registry()
+    stages = registry.histogram("stage_seconds", "Stage time.", ("stage",), buckets=(0.01, 0.1))
+    lookups = registry.counter("lookups_total", "Lookups.", ("result",))
+    for seconds in (0.005, 0.05, 0.5):
+        stages.observe(seconds, stage="vector")
+    lookups.inc(result="hit")
+    lookups.inc(2, result="miss")
+    registry.register_collector(lambda: [("tokens_total", "counter", "Tokens.", [({"model": 'a"b'}, 7)])])
+
+    text = registry.render()
+    assert 'stage_seconds_bucket{stage="vector",le="0.01"} 1' in text
+    assert 'stage_seconds_bucket{stage="vector",le="0.1"} 2' in text
+    assert 'stage_seconds_bucket{stage="vector",le="+Inf"} 3' in text
+    assert 'stage_seconds_count{stage="vector"} 3' in text
+    assert 'lookups_total{result="miss"} 2' in text
+    assert 'tokens_total{model="a\\"b"} 7' in text
+
+def test_stage_timings_are_attached_to_the_audit_entry(monkeypatch):
+    entries = []
+    monkeypatch.setattr(audit_logger.audit_sink, "write", entries.append)
+
+    async def request():
+        start_trace()
+        with timed("generation"):
+            await asyncio.sleep(0.01)
+        # Stages timed in worker threads land in the same trace
+        await asyncio.to_thread(observe_stage, "vector", 0.002)
+        audit_logger.log_query("q1", "question", Jurisdiction.DPDP, Outcome.ANSWERED, ConfidenceLevel.HIGH)
+
+    asyncio.run(request())
+    trace = entries[0].trace
+    assert set(trace) == {"generation", "vector", "total"}
+    assert trace["generation"] >= 10
+    assert trace["vector"] == 2.0
+    assert trace["total"] >= trace["generation"]
+    # Each request (task) has its own trace
+    assert current_trace.get() is None
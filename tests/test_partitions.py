@@ -0,0 +1,118 @@
+import asyncio
+import threading
+from llama_index.core.schema import NodeWithScore, TextNode
+from app.core import pipeline, retrieval
+from app.core.cache import ResponseCache
+from app.core.confidence import assess_confidence
+from app.core.semantic_cache import SemanticCache
+from app.ingestion import index as index_module
+from app.ingestion.index import IngestionManager, PartitionedIndex
+from app.ingestion.keyword_index import KeywordIndex
+from app.ingestion.partitions import parse_routes, partition_of, route
+from app.schemas.models import QueryRequest
+
+CORPUS = {
+    "shared": ["A tax invoice shall be issued for every taxable supply."],
+    "gdpr": ["The data subject has the right to erasure of personal data.", "Personal data breaches shall be notified."],
+    "dpdp": ["A data fiduciary shall protect personal data with reasonable security safeguards."],
+}
+
+def _index(tmp_path) -> PartitionedIndex:
+    partitioned = PartitionedIndex()
+    for name, texts in CORPUS.items():
+        manager = IngestionManager(name, persist_dir=str(tmp_path / name))
+        manager._set_nodes(TextNode(id_=f"{name}_{i}", text=text, metadata={"partition": name}) for i, text in enumerate(texts))
+        manager.node_map = {n.node_id: n for n in manager.nodes}
+        manager.keyword_index = KeywordIndex.build(manager.nodes)
+        manager._update_version()
+        manager.status = "ready"
+        partitioned.managers[name] = manager
+    return partitioned
+
+def test_partitions_follow_top_level_directories_and_routes():
+    assert partition_of("gst_act_sections.txt") == "shared"
+    assert partition_of("GDPR/articles/17.pdf") == "gdpr"
+
+    routes = parse_routes("DPDP=dpdp|it_rules; GDPR = gdpr")
+    assert routes == {"DPDP": ["dpdp", "it_rules"], "GDPR": ["gdpr"]}
+    available = ["shared", "gdpr", "dpdp"]
+    assert route("DPDP", routes, available) == ["dpdp", "shared"]
+    # Unmapped jurisdictions use the partition named after them, if any
+    assert route("CCPA", routes, available) == ["shared"]
+    assert route("gdpr", {}, available) == ["gdpr", "shared"]
+
+def test_queries_only_search_their_jurisdictions_partitions(tmp_path, monkeypatch):
+    partitioned = _index(tmp_path)
+    monkeypatch.setattr(retrieval, "ingestion_manager", partitioned)
+
+    result = asyncio.run(retrieval.hybrid_retrieve("personal data", jurisdiction="GDPR"))
+    assert result.partitions == ["gdpr", "shared"]
+    assert {n.node.metadata["partition"] for n in result.keyword_results} == {"gdpr"}
+    assert len(result.keyword_results) == 2
+
+    result = asyncio.run(retrieval.hybrid_retrieve("personal data", jurisdiction="DPDP"))
+    assert [n.node.node_id for n in result.keyword_results] == ["dpdp_0"]
+    # Partitions are versioned separately, so a change to one leaves the others' cache keys alone
+    assert partitioned.version_for(["gdpr", "shared"]) != partitioned.version_for(["dpdp", "shared"])
+
+def test_semantic_cache_drops_namespaces_of_a_replaced_index(tmp_path, monkeypatch):
+    partitioned = _index(tmp_path)
+    cache = SemanticCache(threshold=0.9)
+    monkeypatch.setattr(pipeline, "ingestion_manager", partitioned)
+    monkeypatch.setattr(pipeline, "semantic_cache", cache)
+    monkeypatch.setattr(pipeline, "query_cache", ResponseCache(sweep_interval=0))
+    dpdp, gdpr = QueryRequest(question="q", jurisdiction="DPDP"), QueryRequest(question="q", jurisdiction="GDPR")
+
+    def answer(request):
+        pipeline.cache_response(pipeline.cache_key(request), pipeline.cache_namespace(request), "answer", [1.0, 0.0])
+
+    answer(dpdp)
+    answer(gdpr)
+    old_dpdp = pipeline.cache_namespace(dpdp)
+    manager = partitioned.managers["dpdp"]
+    manager.node_map["dpdp_1"] = TextNode(id_="dpdp_1", text="Consent shall be free and specific.")
+    manager._update_version()
+    answer(dpdp)
+    assert set(cache.keys) == {pipeline.cache_namespace(dpdp), pipeline.cache_namespace(gdpr)}
+    assert old_dpdp not in cache.keys
+
+def test_coverage_across_partitions_matches_a_single_index(tmp_path):
+    partitioned = _index(tmp_path)
+    nodes = [n for name in ("gdpr", "shared") for n in partitioned.managers[name].nodes]
+    hits = [NodeWithScore(node=n, score=1.0) for n in nodes]
+    question = "right to erasure of a tax invoice for cricket"
+    merged = assess_confidence(question, hits, [], hits, keyword_index=partitioned.keyword_indexes(["gdpr", "shared"]))
+    single = assess_confidence(question, hits, [], hits, keyword_index=KeywordIndex.build(nodes))
+    assert merged.features == single.features
+
+def test_waiting_requests_hold_no_threads_and_a_failed_load_is_retried(tmp_path, monkeypatch):
+    manager = IngestionManager(persist_dir=str(tmp_path), snapshots=False)
+    attempts, release = [], threading.Event()
+
+    def initialize():
+        attempts.append(threading.active_count())
+        release.wait(5)
+        if len(attempts) == 1:
+            raise RuntimeError("storage not mounted")
+    monkeypatch.setattr(index_module, "get_embed_model", lambda: None)
+    monkeypatch.setattr(manager, "_initialize", initialize)
+    monkeypatch.setattr(manager, "_initialize_keyword_index", lambda: None)
+
+    def executor_threads():
+        return [t for t in threading.enumerate() if t.name.startswith("asyncio")]
+
+    async def main():
+        waiters = [asyncio.create_task(manager.wait_ready(5)) for _ in range(20)]
+        await asyncio.sleep(0.05)
+        # One loader thread, and nobody waiting in the executor
+        assert executor_threads() == [] and len(attempts) == 1
+        release.set()
+        assert not any(await asyncio.gather(*waiters))
+        assert manager.status == "failed"
+
+        assert await manager.wait_ready(5)
+        assert (len(attempts), manager.status) == (2, "ready")
+        # Ready: answered without starting anything
+        assert await manager.wait_ready(0) and len(attempts) == 2
+
+    asyncio.run(main())
@@ -0,0 +1,27 @@
+from llama_index.core.embeddings import MockEmbedding
+from app.ingestion.pipeline import IngestionPipeline, plan_tasks
+
+def _corpus(tmp_path):
+    (tmp_path / "a.txt").write_text("SECTION 16: INPUT TAX CREDIT\n" + "Every registered person shall be entitled to credit. " * 40)
+    (tmp_path / "b.txt").write_text("SECTION 50: INTEREST\n" + "Interest at eighteen percent per annum is payable. " * 40)
+    return tmp_path
+
+def test_text_files_are_single_tasks(tmp_path):
+    tasks = plan_tasks(_corpus(tmp_path), ["a.txt", "b.txt"], pages_per_task=16)
+    assert [(t.rel_path, t.last_page) for t in tasks] == [("a.txt", None), ("b.txt", None)]
+
+def test_run_embeds_in_batches_and_streams_to_sink(tmp_path):
+    pipeline = IngestionPipeline(_corpus(tmp_path), chunk_size=64, chunk_overlap=8, workers=1, embed_batch_size=4)
+    batches = []
+    decorated = []
+    stats = pipeline.run(
+        ["a.txt", "b.txt"], decorate=decorated.append, sink=batches.append, embed_model=MockEmbedding(embed_dim=4)
+    )
+    nodes = [n for batch in batches for n in batch]
+    assert len(nodes) == stats.chunks == stats.embeddings == len(decorated)
+    assert all(len(batch) <= 4 for batch in batches)
+    assert all(n.embedding is not None for n in nodes)
+    # Corpus order is preserved and every node knows its source file
+    assert nodes[0].metadata["corpus_path"] == "a.txt"
+    assert nodes[-1].metadata["corpus_path"] == "b.txt"
+    assert stats.as_dict()["files"] == 2
@@ -0,0 +1,42 @@
+from app.core.semantic_cache import SemanticCache
+
+def test_near_duplicate_hits_above_threshold():
+    cache = SemanticCache(threshold=0.9)
+    cache.add("DPDP", "DPDP:time limit to issue invoice?", [1.0, 0.1, 0.0])
+    hit = cache.lookup("DPDP", [0.98, 0.12, 0.01])
+    assert hit is not None
+    key, similarity = hit
+    assert key == "DPDP:time limit to issue invoice?"
+    assert similarity >= 0.9
+
+def test_dissimilar_question_misses():
+    cache = SemanticCache(threshold=0.9)
+    cache.add("DPDP", "a", [1.0, 0.0, 0.0])
+    assert cache.lookup("DPDP", [0.0, 1.0, 0.0]) is None
+
+def test_namespaces_are_isolated():
+    cache = SemanticCache(threshold=0.9)
+    cache.add("DPDP", "a", [1.0, 0.0])
+    assert cache.lookup("GDPR", [1.0, 0.0]) is None
+
+def test_oldest_entry_dropped_when_full():
+    cache = SemanticCache(threshold=0.99, max_entries=2)
+    cache.add("DPDP", "a", [1.0, 0.0, 0.0])
+    cache.add("DPDP", "b", [0.0, 1.0, 0.0])
+    cache.add("DPDP", "c", [0.0, 0.0, 1.0])
+    assert cache.lookup("DPDP", [1.0, 0.0, 0.0]) is None
+    assert cache.lookup("DPDP", [0.0, 0.0, 1.0])[0] == "c"
+
+def test_remove_forgets_key():
+    cache = SemanticCache(threshold=0.9)
+    cache.add("DPDP", "a", [1.0, 0.0])
+    cache.remove("DPDP", "a")
+    assert cache.lookup("DPDP", [1.0, 0.0]) is None
+
+def test_retain_drops_rejected_namespaces():
+    cache = SemanticCache(threshold=0.9)
+    cache.add("v1:DPDP", "a", [1.0, 0.0])
+    cache.add("v2:DPDP", "b", [1.0, 0.0])
+    cache.retain(lambda namespace: namespace.startswith("v2:"))
+    assert cache.lookup("v1:DPDP", [1.0, 0.0]) is None
+    assert cache.stats()["entries"] == {"v2:DPDP": 1}
@@ -0,0 +1,111 @@
+import asyncio
+import uuid
+from collections import Counter
+import pytest
+from llama_index.core.schema import NodeWithScore, TextNode
+from app.core import pipeline
+from app.core.cache import query_cache
+from app.core.confidence import ConfidenceAssessment
+from app.core.metrics import COALESCED
+from app.core.retrieval import RetrievalResult
+from app.core.semantic_cache import semantic_cache
+from app.core.singleflight import SingleFlight
+from app.schemas.models import AbstainResponse, AnswerResponse, ConfidenceLevel, QueryRequest
+
+def test_burst_makes_one_llm_call_per_unique_question(monkeypatch):
+    run = uuid.uuid4().hex
+    topics = {f"invoice deadline {run}": [1.0, 0.0, 0.0], f"e-way bill {run}": [0.0, 1.0, 0.0], f"abstain {run}": [0.0, 0.0, 1.0]}
+    calls = Counter()
+    node = NodeWithScore(node=TextNode(id_="clause_0", text="Invoices are due within 30 days."), score=0.9)
+
+    def fake_embed(question):
+        return next(vector for topic, vector in topics.items() if topic in question)
+
+    async def fake_retrieve(question, **kwargs):
+        calls["retrieve"] += 1
+        return RetrievalResult(nodes=[node], vector_results=[node], keyword_results=[node])
+
+    def fake_assess(request, retrieval, query_embedding=None):
+        level = ConfidenceLevel.LOW if "abstain" in request.question else ConfidenceLevel.HIGH
+        return ConfidenceAssessment(level, 1.0)
+
+    async def fake_generate(question, nodes):
+        calls["llm"] += 1
+        await asyncio.sleep(0.05)
+        return f"Answer to {question}"
+
+    async def fake_verify(answer, nodes):
+        calls["llm"] += 1
+        return True, 1.0
+
+    monkeypatch.setattr(pipeline, "embed_question", fake_embed)
+    monkeypatch.setattr(pipeline, "hybrid_retrieve", fake_retrieve)
+    monkeypatch.setattr(pipeline, "assess_retrieval", fake_assess)
+    monkeypatch.setattr(pipeline, "generate_answer", fake_generate)
+    monkeypatch.setattr(pipeline, "verify_faithfulness", fake_verify)
+    audited = []
+    monkeypatch.setattr(pipeline, "log_query", lambda query_id, *args, **kwargs: audited.append((query_id, kwargs)))
+    query_cache.clear()
+    semantic_cache.clear()
+    coalesced_before = COALESCED.value(match="exact") + COALESCED.value(match="semantic")
+
+    # Six identical requests per question, plus a rephrasing of the first that embeds identically
+    questions = [topic for topic in topics for _ in range(6)] + [f"When are invoices due? ({next(iter(topics))})"]
+
+    async def burst():
+        return await asyncio.gather(*(pipeline.run_query(QueryRequest(question=q, jurisdiction="DPDP")) for q in questions))
+
+    responses = asyncio.run(burst())
+
+    # Generation + verification for the two answerable questions; the third abstains before the LLM
+    assert calls == {"retrieve": 3, "llm": 4}
+    by_question = {}
+    for question, response in zip(questions, responses):
+        by_question.setdefault(question, set()).add(response.query_id)
+    assert all(len(ids) == 1 for ids in by_question.values())
+    assert responses[-1].query_id == responses[0].query_id
+    # The rephrasing is audited under its own id, pointing at the answer it shared
+    query_id, fields = next((query_id, fields) for query_id, fields in audited if "cached_query_id" in fields)
+    assert query_id != responses[0].query_id and fields["cached_query_id"] == responses[0].query_id
+    assert isinstance(responses[0], AnswerResponse)
+    assert all(isinstance(r, AbstainResponse) for r in responses[12:18])
+    assert COALESCED.value(match="exact") + COALESCED.value(match="semantic") - coalesced_before == 16
+
+def test_duplicates_share_the_leaders_error_and_the_key_is_released():
+    flights = SingleFlight(timeout=5.0)
+    runs = Counter()
+
+    async def failing():
+        runs["failing"] += 1
+        await asyncio.sleep(0.02)
+        raise RuntimeError("LLM exploded")
+
+    async def main():
+        results = await asyncio.gather(*(flights.do("key", failing) for _ in range(5)), return_exceptions=True)
+        assert all(isinstance(r, RuntimeError) for r in results)
+        assert runs["failing"] == 1
+        assert flights.flights == {}
+        # A later request runs again rather than replaying the failure
+        with pytest.raises(RuntimeError):
+            await flights.do("key", failing)
+        assert runs["failing"] == 2
+
+    asyncio.run(main())
+
+def test_duplicates_stop_waiting_for_a_stuck_flight():
+    flights = SingleFlight(timeout=0.05)
+    runs = Counter()
+
+    async def work():
+        runs["work"] += 1
+        await asyncio.sleep(1.0 if runs["work"] == 1 else 0.0)
+        return runs["work"]
+
+    async def main():
+        stuck = asyncio.create_task(flights.do("key", work))
+        await asyncio.sleep(0.01)
+        # Joins the stuck flight, gives up at its deadline and runs its own
+        assert await flights.do("key", work) == 2
+        stuck.cancel()
+
+    asyncio.run(main())
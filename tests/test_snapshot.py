@@ -0,0 +1,99 @@
+import os
+import numpy as np
+import pytest
+from llama_index.core import Settings, StorageContext, VectorStoreIndex
+from llama_index.core.embeddings import MockEmbedding
+from llama_index.core.schema import NodeRelationship, NodeWithScore, RelatedNodeInfo, TextNode
+from app.core.config import config
+from app.ingestion import index as index_module
+from app.ingestion.index import IngestionManager
+from app.ingestion.keyword_index import KeywordIndex
+from app.ingestion.snapshot import SNAPSHOTS_DIR, publish_snapshot
+from app.ingestion.string_table import StringTable
+from app.ingestion.vector_store import MmapVectorStore
+
+TEXTS = [
+    "A tax invoice shall be issued before or at the time of removal of goods.",
+    "A tax invoice for services shall be issued within thirty days of the supply.",
+    "Interest on delayed payment of tax is eighteen per cent per annum.",
+    "An e-way bill is required for the movement of goods worth more than fifty thousand rupees.",
+]
+
+def _builder(persist_dir: str, texts=TEXTS) -> IngestionManager:
+    # Rule 46 (the parent) holds the two invoice clauses; stands in for a loaded index
+    parent = TextNode(id_="rule_46", text=" ".join(texts[:2]), metadata={"tokens": 40})
+    nodes = [TextNode(id_=f"clause_{i}", text=text) for i, text in enumerate(texts)]
+    for node in nodes[:2]:
+        node.relationships[NodeRelationship.PARENT] = RelatedNodeInfo(node_id=parent.node_id)
+    parent.relationships[NodeRelationship.CHILD] = [RelatedNodeInfo(node_id=n.node_id) for n in nodes[:2]]
+
+    manager = IngestionManager(persist_dir=persist_dir, snapshots=False)
+    vector_store = MmapVectorStore()
+    vector_store.add_embeddings([n.node_id for n in nodes], np.eye(len(nodes), 8) + 0.1)
+    vector_store.save(manager.vector_persist_dir)
+    manager.index = VectorStoreIndex([], storage_context=StorageContext.from_defaults(vector_store=vector_store))
+    manager._set_nodes([*nodes, parent])
+    manager.node_map = {n.node_id: n for n in manager.nodes}
+    manager.keyword_index = KeywordIndex.build(manager.nodes)
+    manager._update_version()
+    return manager
+
+@pytest.fixture(autouse=True)
+def embed_model(monkeypatch):
+    monkeypatch.setattr(Settings, "_embed_model", MockEmbedding(embed_dim=8))
+    monkeypatch.setattr(index_module, "get_embed_model", lambda: Settings.embed_model)
+    monkeypatch.setattr(config, "SNAPSHOT_POLL_SECONDS", 0)
+
+def _serving(persist_dir: str) -> IngestionManager:
+    manager = IngestionManager(persist_dir=persist_dir, snapshots=True)
+    manager.load()
+    return manager
+
+def test_string_table_round_trip(tmp_path):
+    strings = ["node-b", "node-a", "ünïcode", "node-a-long"]
+    StringTable.save(str(tmp_path / "ids"), strings)
+    table = StringTable.load(str(tmp_path / "ids"))
+    assert list(table) == strings and table[1:3] == strings[1:3]
+    positions = table.positions()
+    assert {s: positions[s] for s in strings} == {s: i for i, s in enumerate(strings)}
+    assert "node" not in positions and positions.get("node-c") is None
+
+    StringTable.save(str(tmp_path / "empty"), [])
+    assert len(StringTable.load(str(tmp_path / "empty"))) == 0
+
+def test_workers_serve_the_published_snapshot(tmp_path):
+    persist_dir = str(tmp_path / "storage")
+    builder = _builder(persist_dir)
+    name = publish_snapshot(builder, builder._source_stamp())
+
+    serving = _serving(persist_dir)
+    # Attached, not rebuilt: the snapshot was taken from the index on disk
+    assert (serving.status, serving.snapshot, serving.version) == ("ready", name, builder.version)
+    query = np.eye(1, 8, 2)
+    assert [(n.node.node_id, n.score) for n in serving.vector_search_batch(query, 3)[0]] == \
+        [(n.node.node_id, n.score) for n in builder.vector_search_batch(query, 3)[0]]
+    assert serving.keyword_index.search("tax invoice", 3) == builder.keyword_index.search("tax invoice", 3)
+    assert serving.node_map["clause_2"].get_content() == TEXTS[2]
+
+    hits = [NodeWithScore(node=serving.node_map[f"clause_{i}"], score=1.0 - i / 10) for i in range(3)]
+    expanded = serving.expand_to_parents(hits, max_tokens=100)
+    assert [n.node.node_id for n in expanded] == ["rule_46", "clause_2"]
+
+def test_a_new_snapshot_replaces_the_attached_one(tmp_path):
+    persist_dir = str(tmp_path / "storage")
+    builder = _builder(persist_dir)
+    old = publish_snapshot(builder, builder._source_stamp())
+    serving = _serving(persist_dir)
+    retriever = serving.get_keyword_retriever(similarity_top_k=2)
+    assert serving.refresh_snapshot() is False
+
+    # An ingest run elsewhere publishes an index with one more clause
+    builder = _builder(persist_dir, TEXTS + ["Input tax credit is available on tax invoices."])
+    new = publish_snapshot(builder, builder._source_stamp())
+    assert sorted(os.listdir(os.path.join(persist_dir, SNAPSHOTS_DIR))) == sorted(["CURRENT", new])
+
+    assert serving.refresh_snapshot() is True
+    assert (serving.snapshot, serving.version) == (new, builder.version)
+    assert "clause_4" in serving.node_map and not old.startswith(serving.version)
+    # A request that started on the old snapshot still reads it after its files are deleted
+    assert sorted(n.node.node_id for n in retriever.retrieve("tax invoice")) == ["clause_0", "clause_1"]
@@ -0,0 +1,21 @@
+from app.core.stage_cache import StageCaches, content_key, prompt_version
+
+def test_content_key_depends_on_every_part():
+    base = content_key("question", ["n1", "n2"], "v1", "model")
+    assert base == content_key("question", ["n1", "n2"], "v1", "model")
+    assert base != content_key("question", ["n1", "n3"], "v1", "model")
+    assert base != content_key("question", ["n1", "n2"], "v2", "model")
+
+def test_prompt_version_changes_with_template():
+    assert prompt_version("A {x}") != prompt_version("B {x}")
+
+def test_invalidate_index_only_drops_retrieval():
+    caches = StageCaches()
+    caches.set("retrieval", "k", "nodes")
+    caches.set("generation", "k", "answer")
+    caches.invalidate_index()
+    assert caches.get("retrieval", "k") is None
+    assert caches.get("generation", "k") == "answer"
+    stats = caches.stats()
+    assert stats["generation"]["hits"] == 1
+    assert stats["retrieval"]["misses"] == 1
@@ -0,0 +1,90 @@
+import json
+import uuid
+from typing import Any, List
+import pytest
+from fastapi.testclient import TestClient
+from llama_index.core.llms import CompletionResponse, CustomLLM, LLMMetadata
+from llama_index.core.llms.callbacks import llm_completion_callback
+from llama_index.core.schema import NodeWithScore, TextNode
+from app.api.v1 import endpoints
+from app.core import faithfulness, generation
+from app.core.config import config
+from app.core.confidence import ConfidenceAssessment
+from app.core.retrieval import RetrievalResult
+from app.main import app
+from app.schemas.models import ConfidenceLevel
+
+class StreamingMockLLM(CustomLLM):
+    """
+    Streams fixed answer tokens; `complete` (used for verification) returns a fixed verdict.
+    """
+    tokens: List[str] = ["A tax ", "invoice is ", "due within ", "30 days."]
+    verdict: str = '{"is_faithful": true, "score": 1.0, "reason": "supported"}'
+    # Mirrors LLMGateway: the model chain, and the serving model on each response
+    models: List[str] = ["mock/model"]
+
+    @property
+    def metadata(self) -> LLMMetadata:
+        return LLMMetadata()
+
+    @llm_completion_callback()
+    def complete(self, prompt: str, formatted: bool = False, **kwargs: Any) -> CompletionResponse:
+        return CompletionResponse(text=self.verdict, additional_kwargs={"model": self.models[0]})
+
+    @llm_completion_callback()
+    def stream_complete(self, prompt: str, formatted: bool = False, **kwargs: Any):
+        def gen():
+            text = ""
+            for token in self.tokens:
+                text += token
+                yield CompletionResponse(text=text, delta=token)
+        return gen()
+
+def parse_events(body: str) -> list[tuple[str, dict]]:
+    events = []
+    for block in body.strip().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((fields["event"], json.loads(fields["data"])))
+    return events
+
+@pytest.fixture
+def client(monkeypatch):
+    nodes = [NodeWithScore(node=TextNode(id_=f"clause_{uuid.uuid4()}", text="Invoices are due within 30 days."), score=0.9)]
+
+    async def fake_retrieve(question, **kwargs):
+        return RetrievalResult(nodes=nodes, vector_results=nodes, keyword_results=nodes)
+
+    monkeypatch.setattr(config, "SEMANTIC_CACHE_ENABLED", False)
+    monkeypatch.setattr(endpoints, "hybrid_retrieve", fake_retrieve)
+    monkeypatch.setattr(endpoints, "assess_retrieval", lambda *args: ConfidenceAssessment(ConfidenceLevel.HIGH, 1.0))
+    app.dependency_overrides[endpoints.require_index] = lambda: None
+    yield TestClient(app)
+    app.dependency_overrides.clear()
+
+def _use_llm(monkeypatch, llm):
+    monkeypatch.setattr(generation, "get_llm", lambda: llm)
+    monkeypatch.setattr(faithfulness, "get_llm", lambda: llm)
+
+def test_stream_sends_retrieval_then_tokens_then_verdict(client, monkeypatch):
+    _use_llm(monkeypatch, StreamingMockLLM())
+    response = client.post("/api/v1/query/stream", json={"question": f"invoice deadline {uuid.uuid4()}", "jurisdiction": "DPDP"})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+
+    events = parse_events(response.text)
+    names = [name for name, _ in events]
+    assert names == ["retrieval", "confidence", "token", "token", "token", "token", "verdict", "done"]
+    assert "".join(data["delta"] for name, data in events if name == "token") == "A tax invoice is due within 30 days."
+    done = events[-1][1]
+    assert done["outcome"] == "ANSWERED"
+    assert done["answer"] == "A tax invoice is due within 30 days."
+
+def test_failed_verification_retracts_streamed_answer(client, monkeypatch):
+    # The answer is lexically grounded, so the local tier would accept it before the LLM verifier
+    monkeypatch.setattr(config, "LOCAL_VERIFIER_ENABLED", False)
+    _use_llm(monkeypatch, StreamingMockLLM(verdict='{"is_faithful": false, "score": 0.0}'))
+    response = client.post("/api/v1/query/stream", json={"question": f"invoice deadline {uuid.uuid4()}", "jurisdiction": "DPDP"})
+
+    events = parse_events(response.text)
+    assert [name for name, _ in events][-3:] == ["verdict", "retraction", "done"]
+    assert events[-1][1]["outcome"] == "ABSTAINED"
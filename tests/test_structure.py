@@ -0,0 +1,67 @@
+from llama_index.core import Document
+from llama_index.core.schema import NodeWithScore
+from app.ingestion.index import IngestionManager
+from app.ingestion.structure import chunk_structured, clean_page, is_parent
+
+FILLER = " ".join(f"the particular number {i} of the invoice;" for i in range(12))
+
+PAGE_ONE = f"""Page 50 of 164
+46. Tax invoice.-Subject to rule 54, a tax invoice shall be issued by the registered person
+containing the following particulars, namely,-
+(a) name, address and Goods and Services Tax Identification Number of the supplier; {FILLER}
+(b) a consecutive serial number not exceeding sixteen characters, referred to in sub-rule
+(2) of rule 48; {FILLER}
+[(c) date of its issue;]105 {FILLER}
+{" " * 40}
+105Inserted vide Notf no. 72/2020-CT dt. 30.09.2020
+"""
+PAGE_TWO = f"""Provided that the Board may, by notification, specify the number of digits. {FILLER}
+47. Time limit for issuing tax invoice.-The invoice referred to in rule 46, in the case of the
+taxable supply of services, shall be issued within a period of thirty days from the date of supply.
+"""
+
+def _nodes():
+    documents = [
+        Document(text=PAGE_ONE, metadata={"page_label": "50", "source": "rules.pdf"}),
+        Document(text=PAGE_TWO, metadata={"page_label": "51", "source": "rules.pdf"}),
+    ]
+    return chunk_structured(documents, chunk_size=512, chunk_overlap=50)
+
+def test_clean_page_drops_headers_and_footnotes():
+    cleaned = clean_page(PAGE_ONE)
+    assert "Page 50" not in cleaned
+    assert "Notf no" not in cleaned
+    assert "[(c) date of its issue;]" in cleaned
+
+def test_rules_split_into_cited_clauses_with_parent_links():
+    nodes = _nodes()
+    leaves = [n for n in nodes if not is_parent(n)]
+    parents = {n.node_id: n for n in nodes if is_parent(n)}
+
+    assert [n.metadata["clause_id"] for n in leaves] == [
+        "Rule 46(a)", "Rule 46(b)", "Rule 46(c)", "Rule 46, proviso", "Rule 47",
+    ]
+    # A wrapped "(2) of rule 48" is not a new sub-rule
+    assert "(2) of rule 48" in leaves[1].text
+    # Clauses carry the rule heading and its short lead-in
+    assert leaves[2].text.startswith("46. Tax invoice.-\nSubject to rule 54")
+    assert leaves[3].metadata["page_label"] == "51"
+
+    rule_46 = parents[leaves[0].parent_node.node_id]
+    assert rule_46.metadata["clause_id"] == "Rule 46"
+    assert {child.node_id for child in rule_46.child_nodes} == {n.node_id for n in leaves[:4]}
+    assert leaves[4].parent_node is None
+
+def test_siblings_expand_to_their_parent_and_single_clauses_do_not():
+    nodes = _nodes()
+    manager = IngestionManager()
+    manager._set_nodes(nodes)
+    leaves = {n.metadata["clause_id"]: n for n in manager.nodes}
+
+    hits = [NodeWithScore(node=leaves[c], score=s) for c, s in [("Rule 46(b)", 0.9), ("Rule 47", 0.8), ("Rule 46(c)", 0.7)]]
+    expanded = manager.expand_to_parents(hits, max_tokens=2048)
+    assert [(n.node.metadata["clause_id"], n.score) for n in expanded] == [("Rule 46", 0.9), ("Rule 47", 0.8)]
+
+    assert manager.expand_to_parents(hits[:2], max_tokens=2048) == hits[:2]
+    # Parents over the limit stay as clauses
+    assert manager.expand_to_parents(hits, max_tokens=100) == hits
@@ -0,0 +1,79 @@
+import json
+import os
+import numpy as np
+from app.ingestion.vector_store import MmapVectorStore
+
+rng = np.random.default_rng(0)
+EMBEDDINGS = rng.normal(size=(400, 16)).astype(np.float32)
+IDS = [f"n{i}" for i in range(len(EMBEDDINGS))]
+QUERIES = rng.normal(size=(5, 16))
+
+def _exact(query, k):
+    matrix = EMBEDDINGS / np.linalg.norm(EMBEDDINGS, axis=1, keepdims=True)
+    scores = matrix @ (query / np.linalg.norm(query))
+    order = np.argsort(-scores)[:k]
+    return [IDS[i] for i in order], scores[order]
+
+def _store(**params):
+    store = MmapVectorStore(**params)
+    store.add_embeddings(IDS, EMBEDDINGS)
+    return store
+
+def test_exact_search_matches_brute_force_before_and_after_save(tmp_path):
+    store = _store()
+    unsaved = store.search(QUERIES, top_k=5)
+    store.save(str(tmp_path))
+    loaded = MmapVectorStore.load(str(tmp_path))
+    for query, before, after in zip(QUERIES, unsaved, loaded.search(QUERIES, top_k=5)):
+        ids, scores = _exact(query, 5)
+        assert [i for i, _ in before] == [i for i, _ in after] == ids
+        assert np.allclose([s for _, s in after], scores, atol=1e-5)
+    assert loaded.layout == "float32/exact"
+
+def test_quantized_rows_keep_the_ranking(tmp_path):
+    for dtype in ("float16", "int8"):
+        store = _store(dtype=dtype)
+        store.save(str(tmp_path / dtype))
+        for query, results in zip(QUERIES, store.search(QUERIES, top_k=10)):
+            ids, scores = _exact(query, 10)
+            assert len({i for i, _ in results[:5]} & set(ids[:5])) >= 4
+            assert abs(results[0][1] - scores[0]) < 0.02
+
+def test_ivf_probing_every_list_is_exact(tmp_path):
+    store = _store(ann_threshold=100, lists=8, nprobe=8)
+    store.save(str(tmp_path))
+    assert store.layout == "float32/ivf8/nprobe8"
+    for query, results in zip(QUERIES, store.search(QUERIES, top_k=5)):
+        assert [i for i, _ in results] == _exact(query, 5)[0]
+    # Fewer probes scan a subset of the rows
+    narrow = MmapVectorStore.load(str(tmp_path), ann_threshold=100, lists=8, nprobe=2)
+    assert all(len(results) == 5 for results in narrow.search(QUERIES, top_k=5))
+
+def test_changes_after_save_are_searched_then_compacted(tmp_path):
+    store = MmapVectorStore()
+    store.add_embeddings(IDS[:300], EMBEDDINGS[:300])
+    store.save(str(tmp_path))
+    first_generation = set(os.listdir(tmp_path))
+
+    store.add_embeddings(IDS[300:], EMBEDDINGS[300:])
+    best = _exact(QUERIES[0], 1)[0][0]
+    store.delete_nodes([best])
+    assert store.num_rows == 399
+    assert best not in [i for i, _ in store.search(QUERIES[:1], top_k=20)[0]]
+    assert store.get_embeddings([best]) is None
+
+    with open(tmp_path / "meta.json") as f:
+        first_meta = json.load(f)
+    store.save(str(tmp_path))
+    # A reader that read meta.json just before the switch can still open its arrays
+    assert MmapVectorStore._open(str(tmp_path), first_meta).codes.shape[0] == 300
+    loaded = MmapVectorStore.load(str(tmp_path))
+    assert loaded.num_rows == 399
+    assert loaded.search(QUERIES[:1], top_k=4) == store.search(QUERIES[:1], top_k=4)
+    # Only the live and the previous generation are kept
+    store.add_embeddings(["extra"], EMBEDDINGS[:1])
+    store.save(str(tmp_path))
+    npy_files = {name for name in os.listdir(tmp_path) if name.endswith(".npy")}
+    assert not first_generation & npy_files and len({name.split(".")[0] for name in npy_files}) == 2
+    # A different dtype is rewritten on the next save
+    assert MmapVectorStore.load(str(tmp_path), dtype="int8").needs_save